@@ -0,0 +1,235 @@
+"""
+BM25 top-k benchmark: exhaustive term-at-a-time vs WAND / Block-Max WAND
+
+Runs every query with each method of src.ranking.bm25 over an index built
+by src.indexer.spimi and reports per method: latency (mean, p50, p95,
+p99, max), documents fully scored against postings touched, and speedup
+over exhaustive scoring. Every pruned result list is checked against the
+exhaustive one (same docnos, same scores); mismatches are counted.
+
+Queries come from --queries (one per line) or are sampled from the index
+vocabulary: 1-4 terms drawn with probability proportional to sqrt(df), so
+queries mix frequent terms with rarer ones like real searches do. One
+untimed exhaustive pass first pulls the postings into the page cache so
+no method pays for cold reads. Methods are compared on plain BM25.
+
+On an index built with --positions, two more rows: 'proximity' (bmw plus
+the proximity rerank, same queries) and 'phrase', quoted 2-3 term phrases
+cut from stored documents (needs --store-docs) so every one matches.
+
+With --filter (indexes built with --filters), every method also runs the
+same queries restricted to the filter ('bmw+filter' rows), checked against
+filtered exhaustive scoring.
+
+Usage:
+    python benchmarks/bench_bm25.py data/index
+    python benchmarks/bench_bm25.py data/index --num-queries 500 -k 10 --output results/bm25.json
+    python benchmarks/bench_bm25.py data/index --queries queries.txt --methods exhaustive bmw
+    python benchmarks/bench_bm25.py data/index --num-phrases 500
+    python benchmarks/bench_bm25.py data/index --filter forum=xe-may.175 --filter since=2024-06-01
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from src.indexer.doc_store import DocStore  # noqa: E402
+from src.indexer.index_reader import InvertedIndex  # noqa: E402
+from src.ranking.bm25 import BM25, METHODS  # noqa: E402
+
+
+def sample_queries(index: InvertedIndex, count: int, min_terms: int, max_terms: int,
+                   min_df: int, seed: int) -> list:
+    """Random queries from the vocabulary, terms weighted by sqrt(df)"""
+    terms, weights = [], []
+    for term, df in index.iter_terms():
+        if df >= min_df:
+            terms.append(term)
+            weights.append(df ** 0.5)
+    rng = random.Random(seed)
+    return [' '.join(rng.choices(terms, weights, k=rng.randint(min_terms, max_terms))) for _ in range(count)]
+
+
+def sample_phrases(index: InvertedIndex, store: DocStore, count: int, seed: int) -> list:
+    """Quoted runs of 2-3 consecutive terms from random stored documents"""
+    rng = random.Random(seed)
+    field = index.meta.get('field', 'content_clean')
+    phrases = []
+    while len(phrases) < count:
+        terms = [term for _, term in index.analyze_phrase(store.get(rng.randrange(len(store))).get(field) or '')]
+        size = rng.randint(2, 3)
+        if len(terms) > size:
+            start = rng.randrange(len(terms) - size + 1)
+            phrases.append('"%s"' % ' '.join(terms[start:start + size]))
+    return phrases
+
+
+def parse_filters(specs: list) -> dict:
+    """['forum=a', 'forum=b', 'since=2024-06-01'] -> {'forum': ['a', 'b'], 'since': '2024-06-01'}"""
+    filters = {}
+    for spec in specs:
+        field, _, value = spec.partition('=')
+        if field in ('since', 'until'):
+            filters[field] = value
+        else:
+            filters.setdefault(field, []).append(value)
+    return filters
+
+
+def time_queries(ranker: BM25, queries: list, k: int, method: str, filters: dict = None) -> dict:
+    latencies, scored, postings = [], [], []
+    for query in queries:
+        stats = {}
+        start = time.perf_counter()
+        ranker.search(query, k, method, stats, filters)
+        latencies.append((time.perf_counter() - start) * 1000)
+        scored.append(stats['scored'])
+        postings.append(stats['postings'])
+    return summarize(latencies, scored, postings)
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def summarize(latencies: list, scored: list, postings: list) -> dict:
+    ordered = sorted(latencies)
+    return {
+        'mean_ms': round(sum(ordered) / len(ordered), 3),
+        'p50_ms': round(_percentile(ordered, 0.50), 3),
+        'p95_ms': round(_percentile(ordered, 0.95), 3),
+        'p99_ms': round(_percentile(ordered, 0.99), 3),
+        'max_ms': round(ordered[-1], 3),
+        'mean_scored': round(sum(scored) / len(scored), 1),
+        'scored_fraction': round(sum(scored) / max(sum(postings), 1), 4),
+    }
+
+
+def same_results(expected: list, hits: list) -> bool:
+    return (len(expected) == len(hits) and
+            all(a.docno == b.docno and abs(a.score - b.score) <= 1e-9 * max(1.0, a.score)
+                for a, b in zip(expected, hits)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark exhaustive vs pruned BM25 top-k retrieval')
+    parser.add_argument('index', help='Index directory (src.indexer.spimi output)')
+    parser.add_argument('--queries', default=None, help='Query file, one per line (default: sampled)')
+    parser.add_argument('--num-queries', '-n', type=int, default=200, help='Sampled queries (default 200)')
+    parser.add_argument('--min-terms', type=int, default=1)
+    parser.add_argument('--max-terms', type=int, default=4)
+    parser.add_argument('--min-df', type=int, default=2, help='Skip rarer terms when sampling')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('-k', type=int, default=10, help='Results per query (default 10)')
+    parser.add_argument('--methods', nargs='+', choices=METHODS, default=['exhaustive', 'wand', 'bmw'])
+    parser.add_argument('--num-phrases', type=int, default=200,
+                        help='Sampled phrase queries on positional indexes (default 200, 0 = skip)')
+    parser.add_argument('--proximity', type=float, default=0.5, help='Proximity weight of the proximity row')
+    parser.add_argument('--filter', action='append', default=[], metavar='FIELD=VALUE',
+                        help='Also time filtered queries, e.g. forum=xe-may.175 or since=2024-06-01 (repeatable)')
+    parser.add_argument('--output', '-o', default=None, help='Write results JSON here (default: stdout)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = InvertedIndex(args.index)
+    ranker = BM25(index, proximity=0.0)
+    load_ms = (time.perf_counter() - start) * 1000
+    print(f"📂 {args.index}: {index.num_docs:,} docs, {index.num_terms:,} terms "
+          f"(ranker ready in {load_ms:.0f} ms)", file=sys.stderr)
+
+    if args.queries:
+        with open(args.queries, encoding='utf-8') as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = sample_queries(index, args.num_queries, args.min_terms, args.max_terms, args.min_df, args.seed)
+
+    # Untimed pass: reference results, and postings paged in for every method alike
+    reference = [ranker.search(query, args.k, 'exhaustive') for query in queries]
+
+    methods = {}
+    for method in args.methods:
+        latencies, scored, postings = [], [], []
+        mismatches = 0
+        for query, expected in zip(queries, reference):
+            stats = {}
+            start = time.perf_counter()
+            hits = ranker.search(query, args.k, method, stats)
+            latencies.append((time.perf_counter() - start) * 1000)
+            scored.append(stats['scored'])
+            postings.append(stats['postings'])
+            if not same_results(expected, hits):
+                mismatches += 1
+        methods[method] = {**summarize(latencies, scored, postings), 'mismatches': mismatches}
+
+    if index.has_positions:
+        methods['proximity'] = {**time_queries(BM25(index, proximity=args.proximity), queries, args.k, 'bmw'),
+                                'mismatches': 0}
+        if args.num_phrases and os.path.exists(os.path.join(args.index, 'docs.json')):
+            with DocStore(args.index) as store:
+                phrases = sample_phrases(index, store, args.num_phrases, args.seed)
+            ranker.search(phrases[0], args.k)
+            methods['phrase'] = {**time_queries(ranker, phrases, args.k, 'bmw'), 'mismatches': 0}
+
+    filters = parse_filters(args.filter)
+    if filters:
+        filtered_reference = [ranker.search(query, args.k, 'exhaustive', None, filters) for query in queries]
+        for method in args.methods:
+            result = time_queries(ranker, queries, args.k, method, filters)
+            result['mismatches'] = sum(not same_results(expected, ranker.search(query, args.k, method, None, filters))
+                                       for query, expected in zip(queries, filtered_reference))
+            methods[f'{method}+filter'] = result
+
+    if 'exhaustive' in methods:
+        baseline = methods['exhaustive']['mean_ms']
+        for method in args.methods:
+            result = methods[method]
+            result['speedup'] = round(baseline / max(result['mean_ms'], 1e-9), 2)
+
+    for method, result in methods.items():
+        print(f"   {method:<17} mean {result['mean_ms']:8.2f} ms  p50 {result['p50_ms']:8.2f}  "
+              f"p99 {result['p99_ms']:8.2f}  scored {result['scored_fraction']:6.1%}"
+              f"{'  x%.2f' % result['speedup'] if 'speedup' in result else ''}"
+              f"{'  ❌ %d mismatches' % result['mismatches'] if result['mismatches'] else ''}", file=sys.stderr)
+
+    report = {
+        'benchmark': 'bm25',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'index': {
+            'path': args.index,
+            'documents': index.num_docs,
+            'terms': index.num_terms,
+            'avg_doc_len': round(index.avg_doc_len, 2),
+        },
+        'queries': len(queries),
+        'k': args.k,
+        'filters': filters,
+        'ranker_load_ms': round(load_ms, 1),
+        'methods': methods,
+    }
+    index.close()
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        if os.path.dirname(args.output):
+            os.makedirs(os.path.dirname(args.output), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        print(f"📊 Results saved to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Crawl throughput benchmark against a local XenForo stand-in
+
+Starts xenforo_stub.StubServer, then runs VozProductionCrawler ('1m',
+threads and/or async engine) and VozCrawler ('lightning') against it for
+every worker count given. Each run is a fresh subprocess in a temporary
+directory (no shared checkpoints, clean logging), which also isolates its
+CPU time and peak RSS. Reported per run: docs/s, requests/s, p50/p99
+fetch latency (from the crawler's rate controller), the share of time per
+crawl stage (crawler metrics), CPU seconds and peak RSS, plus the status
+codes the server sent.
+
+Usage:
+    python benchmarks/bench_crawl.py                                  # defaults
+    python benchmarks/bench_crawl.py --workers 10 20 40 --latency-ms 80 --jitter-ms 40
+    python benchmarks/bench_crawl.py --crawler 1m --engine async --throttle 0.02 \\
+        --challenge 0.005 --output results/crawl.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.xenforo_stub import StubForum, StubServer  # noqa: E402
+
+
+def _rusage_summary(usage) -> dict:
+    return {
+        'cpu_seconds': round(usage.ru_utime + usage.ru_stime, 2),
+        'peak_rss_mb': round(usage.ru_maxrss / 1024, 1),  # KiB on Linux
+    }
+
+
+def run_child(config: dict) -> dict:
+    """Benchmark body, runs inside the per-run subprocess (cwd = temp dir)"""
+    from src.crawler.voz_crawler_1m import VozProductionCrawler
+    from src.crawler.voz_crawler_lightning import VozCrawler
+
+    base_url, forums = config['base_url'], config['forums']
+    delay_range = (config['delay'], config['delay'])
+
+    if config['crawler'] == '1m':
+        crawler = VozProductionCrawler(
+            num_workers=config['workers'],
+            delay_range=delay_range,
+            min_word_count=config['min_words'],
+            engine=config['engine'],
+            parse_workers=config['parse_workers'],
+            parser_backend=config['parser'],
+            max_rate=config['max_rate']
+        )
+        crawler.BASE_URL = base_url
+        crawler.FORUMS = {f'f{i + 1}': path for i, path in enumerate(forums)}
+        start = time.perf_counter()
+        report = crawler.crawl(target_docs=config['target'], output_file='data/bench.jsonl', resume=False)
+        elapsed = time.perf_counter() - start
+        docs, requests = report['total_documents'], report['requests_made']
+    else:
+        crawler = VozCrawler(
+            num_workers=config['workers'],
+            delay_range=delay_range,
+            min_word_count=config['min_words'],
+            max_rate=config['max_rate']
+        )
+        crawler.BASE_URL = base_url
+        crawler.FORUMS = list(forums)
+        start = time.perf_counter()
+        crawler.crawl(target_docs=config['target'], output_file='data/bench.jsonl')
+        elapsed = time.perf_counter() - start
+        docs, requests = crawler.total_docs, crawler.requests_made
+
+    rate = crawler.rate.snapshot()
+    return {
+        'seconds': round(elapsed, 2),
+        'docs': docs,
+        'requests': requests,
+        'docs_per_sec': round(docs / max(elapsed, 1e-9), 1),
+        'requests_per_sec': round(requests / max(elapsed, 1e-9), 1),
+        'latency_p50_ms': rate['latency_p50_ms'],
+        'latency_p99_ms': rate['latency_p99_ms'],
+        'final_rate': rate['rate'],
+        'final_concurrency': rate['concurrency'],
+        'stage_share': {stage: info['share'] for stage, info in crawler.metrics.snapshot()['stages'].items()},
+    }
+
+
+def run_scenario(server: StubServer, config: dict, verbose: bool = False) -> dict:
+    """Run one crawler configuration in a fresh subprocess"""
+    server.reset_counts()
+    with tempfile.TemporaryDirectory(prefix='bench_crawl_') as workdir:
+        process = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--run-child', json.dumps(config)],
+            cwd=workdir,
+            stdout=subprocess.PIPE,
+            stderr=None if verbose else subprocess.DEVNULL,
+            text=True
+        )
+    if process.returncode != 0:
+        return {'error': f'exit code {process.returncode}'}
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result['server_status_counts'] = {str(k): v for k, v in sorted(server.counts.items())}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the crawlers against a local XenForo stub')
+    parser.add_argument('--crawler', nargs='+', choices=['1m', 'lightning'], default=['1m', 'lightning'])
+    parser.add_argument('--engine', nargs='+', choices=['threads', 'async'], default=['threads'],
+                        help='Engines for the 1m crawler')
+    parser.add_argument('--workers', '-w', type=int, nargs='+', default=[10, 20])
+    parser.add_argument('--target', '-t', type=int, default=5000, help='Documents per run')
+    parser.add_argument('--delay', type=float, default=0.0,
+                        help='Crawler delay_range (both ends), sets the starting rate')
+    parser.add_argument('--max-rate', type=float, default=1000.0)
+    parser.add_argument('--parser', choices=['bs4', 'lxml'], default='lxml', help='1m crawler parser backend')
+    parser.add_argument('--parse-workers', type=int, default=0, help='1m crawler parser processes')
+    parser.add_argument('--min-words', type=int, default=10)
+    parser.add_argument('--forums', type=int, default=4)
+    parser.add_argument('--listing-pages', type=int, default=5)
+    parser.add_argument('--thread-pages', type=int, default=3)
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Server latency per response')
+    parser.add_argument('--jitter-ms', type=float, default=10.0, help='Extra random server latency')
+    parser.add_argument('--throttle', type=float, default=0.0, help='Fraction of 429 responses')
+    parser.add_argument('--challenge', type=float, default=0.0, help='Fraction of Cloudflare challenge pages')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After sent with a 429')
+    parser.add_argument('--output', '-o', default=None, help='Write results JSON here (default: stdout)')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Show crawler logs')
+    parser.add_argument('--run-child', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_child:
+        result = run_child(json.loads(args.run_child))
+        result.update(_rusage_summary(resource.getrusage(resource.RUSAGE_SELF)))
+        # Parser pool processes count towards CPU, peak RSS is the largest process
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        result['cpu_seconds'] = round(result['cpu_seconds'] + children.ru_utime + children.ru_stime, 2)
+        result['peak_rss_mb'] = max(result['peak_rss_mb'], round(children.ru_maxrss / 1024, 1))
+        print(json.dumps(result))
+        return
+
+    shape = StubForum(forums=args.forums, listing_pages=args.listing_pages, thread_pages=args.thread_pages)
+    server = StubServer(shape, latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                        throttle_rate=args.throttle, challenge_rate=args.challenge,
+                        retry_after=args.retry_after)
+
+    runs = []
+    with server:
+        print(f"🧪 Stub forum on {server.base_url}: {shape.total_posts():,} posts", file=sys.stderr)
+        for crawler in args.crawler:
+            for engine in (args.engine if crawler == '1m' else [None]):
+                for workers in args.workers:
+                    config = {
+                        'crawler': crawler,
+                        'engine': engine,
+                        'workers': workers,
+                        'target': args.target,
+                        'delay': args.delay,
+                        'max_rate': args.max_rate,
+                        'parser': args.parser,
+                        'parse_workers': args.parse_workers,
+                        'min_words': args.min_words,
+                        'base_url': server.base_url,
+                        'forums': shape.forum_paths(),
+                    }
+                    name = f"{crawler}{'/' + engine if engine else ''} x{workers}"
+                    print(f"🚀 {name} ...", file=sys.stderr)
+                    result = run_scenario(server, config, args.verbose)
+                    if 'error' in result:
+                        print(f"   ❌ {result['error']}", file=sys.stderr)
+                    else:
+                        print(f"   {result['docs_per_sec']:,.0f} docs/s, {result['requests_per_sec']:,.0f} req/s, "
+                              f"p50 {result['latency_p50_ms']} ms, p99 {result['latency_p99_ms']} ms, "
+                              f"{result['cpu_seconds']}s CPU, {result['peak_rss_mb']} MB", file=sys.stderr)
+                    runs.append({'name': name, 'config': {k: v for k, v in config.items()
+                                                          if k not in ('base_url', 'forums')},
+                                 **result})
+
+    report = {
+        'benchmark': 'crawl',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'server': {
+            'forums': shape.forums,
+            'listing_pages': shape.listing_pages,
+            'threads': shape.total_threads(),
+            'posts': shape.total_posts(),
+            'latency_ms': args.latency_ms,
+            'jitter_ms': args.jitter_ms,
+            'throttle_rate': args.throttle,
+            'challenge_rate': args.challenge,
+        },
+        'runs': runs,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        if os.path.dirname(args.output):
+            os.makedirs(os.path.dirname(args.output), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        print(f"📊 Results saved to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Parser micro-benchmark: bs4 vs lxml backends of page_parser
+
+Parses saved XenForo thread pages with both backends, checks that they
+produce identical documents and reports posts/second.
+
+Usage:
+    python benchmarks/bench_parser.py                      # bundled fixtures
+    python benchmarks/bench_parser.py pages/*.html -n 50   # your own saved pages
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.crawler.page_parser import PARSER_BACKENDS, parse_thread_page  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+THREAD = {'thread_id': '123456', 'title': 'Benchmark thread', 'url': 'https://voz.vn/t/bench.123456/'}
+
+
+def bench_backend(pages, backend: str, iterations: int) -> dict:
+    """Parse every page `iterations` times, returns timing summary"""
+    posts = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for html in pages:
+            parsed, _ = parse_thread_page(html, THREAD, 0, backend=backend)
+            posts += len(parsed)
+    elapsed = time.perf_counter() - start
+    return {
+        'backend': backend,
+        'posts': posts,
+        'seconds': round(elapsed, 3),
+        'posts_per_sec': round(posts / max(elapsed, 1e-9), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark XenForo page parser backends')
+    parser.add_argument('files', nargs='*', help='Saved HTML pages (default: bundled fixtures)')
+    parser.add_argument('-n', '--iterations', type=int, default=20, help='Passes over the pages')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html')))
+    pages = []
+    for path in files:
+        with open(path, encoding='utf-8') as f:
+            pages.append(f.read())
+
+    # Both backends must agree before their speed means anything
+    for path, html in zip(files, pages):
+        outputs = [parse_thread_page(html, THREAD, 0, backend=b) for b in PARSER_BACKENDS]
+        if any(out != outputs[0] for out in outputs[1:]):
+            sys.exit(f"Backends disagree on {path}")
+
+    results = [bench_backend(pages, backend, args.iterations) for backend in PARSER_BACKENDS]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{len(pages)} pages x {args.iterations} iterations, outputs identical")
+    baseline = results[0]['posts_per_sec']
+    for r in results:
+        print(f"  {r['backend']:5s} {r['posts_per_sec']:>10,.0f} posts/s "
+              f"({r['seconds']:.2f}s, x{r['posts_per_sec'] / baseline:.1f})")
+
+
+if __name__ == "__main__":
+    main()
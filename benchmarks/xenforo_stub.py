@@ -0,0 +1,284 @@
+"""
+Local XenForo stand-in for crawl benchmarks
+
+Serves synthetic voz.vn-shaped pages, deterministic per URL, so crawler
+throughput can be measured without touching the real forum:
+
+- /                               home page (connection test)
+- /f/<slug>.<id>/[page-N]         forum listings: structItem rows with reply
+                                  counts, page jumps and latest-post time
+- /t/<slug>.<id>/[page-N]         thread pages: article.message posts with
+                                  bbWrapper bodies, quotes and pageNav
+
+Fault injection: `latency`/`jitter` delay every response, `throttle_rate`
+answers that fraction of requests with 429 + Retry-After, `challenge_rate`
+with a Cloudflare "Just a moment..." page.
+
+Standalone:
+    python benchmarks/xenforo_stub.py --port 8800 --latency-ms 50 --throttle 0.01
+"""
+
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, NamedTuple, Optional
+
+FORUM_RE = re.compile(r'^/f/[^/]*?\.(\d+)/(?:page-(\d+))?$')
+THREAD_RE = re.compile(r'^/t/[^/]*?\.(\d+)/(?:page-(\d+))?$')
+
+WORDS = ('mình thấy cái này cũng được nhưng giá hơi cao so với mặt bằng chung anh em '
+         'có ai dùng rồi cho xin review với tại vì đang phân vân giữa hai con máy này '
+         'công nhận năm nay kinh tế khó khăn thật lương không tăng mà giá nhà đất cứ lên '
+         'thôi thì cứ từ từ tích lũy đợi thời cơ chứ vay ngân hàng lãi suất cao quá '
+         'chơi game cả tối mệt quá mai còn đi làm sớm bác nào có kinh nghiệm chia sẻ '
+         'điện thoại pin trâu chụp ảnh đẹp màn hình sáng xe máy đi làm hằng ngày tiết kiệm xăng').split()
+AUTHORS = [f'member_{i}' for i in range(500)]
+
+CHALLENGE_PAGE = ('<!DOCTYPE html><html><head><title>Just a moment...</title></head>'
+                  '<body>Checking your browser before accessing voz.vn.</body></html>')
+
+
+class StubForum(NamedTuple):
+    """Shape of the synthetic forum"""
+    forums: int = 4
+    listing_pages: int = 5          # listing pages per forum
+    threads_per_page: int = 20
+    thread_pages: int = 3           # pages per thread
+    posts_per_page: int = 20
+    min_words: int = 20
+    max_words: int = 200
+
+    def forum_paths(self) -> List[str]:
+        return [f'/f/bench-forum.{i + 1}/' for i in range(self.forums)]
+
+    def thread_id(self, forum: int, page: int, slot: int) -> int:
+        return ((forum - 1) * self.listing_pages + page - 1) * self.threads_per_page + slot + 1
+
+    def total_threads(self) -> int:
+        return self.forums * self.listing_pages * self.threads_per_page
+
+    def total_posts(self) -> int:
+        return self.total_threads() * self.thread_pages * self.posts_per_page
+
+
+def _page_nav(base: str, current: int, last: int) -> str:
+    if last <= 1:
+        return ''
+    items = ''.join(
+        f'<li class="pageNav-page {"pageNav-page--current" if i == current else ""}">'
+        f'<a href="{base}page-{i}">{i}</a></li>' for i in range(1, last + 1))
+    next_link = (f'<a href="{base}page-{current + 1}" class="pageNav-jump pageNav-jump--next">Next</a>'
+                 if current < last else '')
+    return f'<div class="pageNav"><ul class="pageNav-main">{items}</ul>{next_link}</div>'
+
+
+def render_listing(shape: StubForum, forum: int, page: int) -> str:
+    rows = []
+    if 1 <= forum <= shape.forums and page <= shape.listing_pages:
+        for slot in range(shape.threads_per_page):
+            tid = shape.thread_id(forum, page, slot)
+            replies = shape.thread_pages * shape.posts_per_page - 1
+            jumps = ''.join(f'<a href="/t/bench-thread.{tid}/page-{p}">{p}</a>'
+                            for p in range(2, shape.thread_pages + 1))
+            rows.append(
+                f'<div class="structItem structItem--thread js-inlineModContainer">'
+                f'<div class="structItem-cell structItem-cell--main"><div class="structItem-title">'
+                f'<a href="/t/bench-thread.{tid}/">Chủ đề thử nghiệm số {tid}</a></div>'
+                f'<span class="structItem-pageJump">{jumps}</span></div>'
+                f'<div class="structItem-cell structItem-cell--meta"><dl><dt>Replies</dt><dd>{replies:,}</dd></dl></div>'
+                f'<div class="structItem-cell structItem-cell--latest">'
+                f'<time class="structItem-latestDate u-dt" data-time="{1700000000 + tid}">Today</time></div></div>')
+    return (f'<!DOCTYPE html><html><head><title>Forum {forum} | VOZ</title></head><body>'
+            f'<div class="block-body">{"".join(rows)}</div></body></html>')
+
+
+def render_thread(shape: StubForum, tid: int, page: int) -> Optional[str]:
+    if not 1 <= tid <= shape.total_threads() or page > shape.thread_pages:
+        return None
+    base = f'/t/bench-thread.{tid}/'
+    posts = []
+    for slot in range(shape.posts_per_page):
+        post_id = (tid * shape.thread_pages + page - 1) * shape.posts_per_page + slot
+        rng = random.Random(post_id)
+        author = rng.choice(AUTHORS)
+        body = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(shape.min_words, shape.max_words)))
+        quote = ''
+        if rng.random() < 0.2:
+            quote = (f'<blockquote class="bbCodeBlock bbCodeBlock--expandable bbCodeBlock--quote">'
+                     f'<div class="bbCodeBlock-title"><a class="bbCodeBlock-sourceJump">{rng.choice(AUTHORS)} said:</a></div>'
+                     f'<div class="bbCodeBlock-content"><div class="bbCodeBlock-expandContent">'
+                     f'{" ".join(rng.choice(WORDS) for _ in range(15))}</div></div></blockquote>')
+        posts.append(
+            f'<article class="message message--post js-post" data-author="{author}" '
+            f'data-content="post-{post_id}" id="js-post-{post_id}"><div class="message-inner">'
+            f'<div class="message-cell message-cell--user"><h4 class="message-name">'
+            f'<a href="/u/{author}.1/" class="username">{author}</a></h4></div>'
+            f'<div class="message-cell message-cell--main"><header class="message-attribution">'
+            f'<a href="{base}post-{post_id}"><time class="u-dt" datetime="2024-01-{post_id % 28 + 1:02d}T10:00:00+0700" '
+            f'data-time="{1704078000 + post_id}">Jan 2024</time></a></header>'
+            f'<article class="message-body js-selectToQuote"><div class="bbWrapper">{quote}{body}</div></article>'
+            f'</div></div></article>')
+    nav = _page_nav(base, page, shape.thread_pages)
+    return (f'<!DOCTYPE html><html><head><title>Chủ đề thử nghiệm số {tid} | VOZ</title></head><body>'
+            f'<h1 class="p-title-value">Chủ đề thử nghiệm số {tid}</h1>'
+            f'<div class="block-outer">{nav}</div>'
+            f'<div class="block-body js-replyNewMessageContainer">{"".join(posts)}</div>'
+            f'<div class="block-outer">{nav}</div></body></html>')
+
+
+class StubServer:
+    """Threaded HTTP server for a StubForum, running in a background thread"""
+
+    def __init__(self,
+                 shape: StubForum = StubForum(),
+                 host: str = '127.0.0.1',
+                 port: int = 0,
+                 latency: float = 0.0,
+                 jitter: float = 0.0,
+                 throttle_rate: float = 0.0,
+                 challenge_rate: float = 0.0,
+                 retry_after: float = 1.0,
+                 seed: int = 0):
+        """
+        Args:
+            shape: Forum/thread/post counts
+            host: Bind address
+            port: Bind port (0 = any free port, see `base_url`)
+            latency: Seconds added to every response
+            jitter: Extra uniform random delay, 0..jitter seconds
+            throttle_rate: Fraction of requests answered with 429
+            challenge_rate: Fraction of requests answered with a Cloudflare challenge
+            retry_after: Retry-After seconds sent with a 429
+            seed: Seed for the fault/jitter random stream
+        """
+        self.shape = shape
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.challenge_rate = challenge_rate
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts: Dict[int, int] = {}
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real site
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                status, body, headers = server.respond(self.path)
+                data = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            request_queue_size = 1024
+
+        self._server = Server((host, port), Handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def respond(self, path: str):
+        """(status, body, extra headers) for a request path"""
+        with self._lock:
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0)
+            roll = self._rng.random()
+        if delay > 0:
+            time.sleep(delay)
+
+        if roll < self.throttle_rate:
+            status, body, headers = 429, '', {'Retry-After': f'{self.retry_after:g}'}
+        elif roll < self.throttle_rate + self.challenge_rate:
+            status, body, headers = 403, CHALLENGE_PAGE, {}
+        else:
+            status, body, headers = self._page(path.split('?', 1)[0])
+
+        with self._lock:
+            self.counts[status] = self.counts.get(status, 0) + 1
+        return status, body, headers
+
+    def _page(self, path: str):
+        if path == '/':
+            links = ''.join(f'<a href="{p}">{p}</a>' for p in self.shape.forum_paths())
+            return 200, f'<!DOCTYPE html><html><head><title>VOZ</title></head><body>{links}</body></html>', {}
+
+        match = FORUM_RE.match(path)
+        if match:
+            return 200, render_listing(self.shape, int(match.group(1)), int(match.group(2) or 1)), {}
+
+        match = THREAD_RE.match(path)
+        if match:
+            html = render_thread(self.shape, int(match.group(1)), int(match.group(2) or 1))
+            if html is not None:
+                return 200, html, {}
+        return 404, '<html><body>Not found</body></html>', {}
+
+    def reset_counts(self):
+        with self._lock:
+            self.counts = {}
+
+    def start(self) -> 'StubServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='xenforo-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Serve a synthetic XenForo forum for crawl benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--forums', type=int, default=4)
+    parser.add_argument('--listing-pages', type=int, default=5)
+    parser.add_argument('--thread-pages', type=int, default=3)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--throttle', type=float, default=0.0, help='Fraction of requests answered with 429')
+    parser.add_argument('--challenge', type=float, default=0.0, help='Fraction answered with a Cloudflare page')
+    args = parser.parse_args()
+
+    shape = StubForum(forums=args.forums, listing_pages=args.listing_pages, thread_pages=args.thread_pages)
+    server = StubServer(shape, args.host, args.port, args.latency_ms / 1000, args.jitter_ms / 1000,
+                        args.throttle, args.challenge)
+    print(f"🧪 Stub forum on {server.base_url}: {shape.total_threads():,} threads, "
+          f"{shape.total_posts():,} posts")
+    for path in shape.forum_paths():
+        print(f"   {server.base_url}{path}")
+    try:
+        server.start()._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -12,11 +12,30 @@ Usage:
     # Local crawling
     python voz_crawler_1m.py --target 1000000 --workers 15
 
+    # Async engine (one event loop, shared connection pool)
+    python voz_crawler_1m.py --target 1000000 --engine async --per-host 64
+
+    # Sharded: 8 local processes, then one deduplicated corpus
+    python shard_coordinator.py run --shards 8 --target 1000000 -- --workers 10
+
+    # Keep raw pages (conditional revisits), re-parse them offline later
+    python voz_crawler_1m.py --target 1000000 --page-cache data/page_cache
+    python page_cache.py replay data/page_cache data/replay.jsonl --parser lxml
+
     # Lightning AI (no Cloudflare blocks)
     python voz_crawler_lightning.py --target 1200000 --workers 15
 """
 
-from .voz_crawler_1m import VozProductionCrawler
-from .voz_crawler_lightning import VozCrawler
-
 __all__ = ['VozProductionCrawler', 'VozCrawler']
+
+
+def __getattr__(name):
+    # Crawlers load on first use, so the indexer can import corpus_io and
+    # text_normalizer without the HTTP stack
+    if name == 'VozProductionCrawler':
+        from .voz_crawler_1m import VozProductionCrawler
+        return VozProductionCrawler
+    if name == 'VozCrawler':
+        from .voz_crawler_lightning import VozCrawler
+        return VozCrawler
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,107 @@
+"""
+Async fetch engine for the Voz crawlers
+
+One asyncio event loop (running in a background thread) drives every page
+request over a single pooled aiohttp session, instead of one cloudscraper
+session per forum thread. Connection reuse and the per-host limit live in
+the aiohttp connector, so thousands of requests can be in flight while
+only `per_host_limit` sockets are open to voz.vn at any time.
+
+Coroutines are submitted from the synchronous crawl loop with `submit()`,
+which returns a `concurrent.futures.Future` - so the existing
+`as_completed` loops work unchanged for both engines.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Dict, Mapping, Optional, Tuple
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncFetcher:
+    """Shared aiohttp client driven by a background event loop"""
+
+    def __init__(self,
+                 max_connections: int = 500,
+                 per_host_limit: int = 64,
+                 timeout: int = 30,
+                 headers: Optional[Dict[str, str]] = None,
+                 cookies: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            max_connections: Total open sockets across all hosts
+            per_host_limit: Open sockets per host (voz.vn)
+            timeout: Total request timeout in seconds
+            headers: Default headers (e.g. User-Agent of a cloudscraper session)
+            cookies: Initial cookies (e.g. cf_clearance from a cloudscraper session)
+        """
+        if aiohttp is None:
+            raise ImportError("The async engine requires aiohttp: pip install aiohttp")
+
+        self.max_connections = max_connections
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.headers = headers or {}
+        self.cookies = cookies or {}
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session = None
+
+    def start(self):
+        """Start the event loop thread and open the shared session"""
+        if self.loop is not None:
+            return
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever,
+                                        name='async-fetcher', daemon=True)
+        self._thread.start()
+        self.submit(self._open_session()).result()
+
+    async def _open_session(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.max_connections,
+            limit_per_host=self.per_host_limit,
+            ttl_dns_cache=300
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers=self.headers,
+            cookies=self.cookies,
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+
+    def submit(self, coro) -> Future:
+        """Schedule a coroutine on the fetcher loop from any thread"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> Tuple[int, str, Mapping[str, str]]:
+        """Fetch a URL (extra request headers optional), returns (status_code, body, response_headers)"""
+        async with self._session.get(url, headers=headers) as response:
+            text = await response.text(errors='replace')
+            return response.status, text, response.headers
+
+    async def _cancel_pending(self):
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self):
+        """Close the session and stop the event loop thread"""
+        if self.loop is None:
+            return
+        # Requests still pending (e.g. target reached mid-crawl) are abandoned
+        self.submit(self._cancel_pending()).result()
+        if self._session is not None:
+            self.submit(self._session.close()).result()
+            self._session = None
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+        self.loop = None
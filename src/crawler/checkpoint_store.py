@@ -0,0 +1,298 @@
+"""
+Compact, incremental checkpoint store
+
+Replaces pickling whole Python sets of id strings on every save:
+- ids are kept as 64-bit integers in sorted arrays (8 bytes per id instead
+  of a str object plus set slot)
+- each id set is persisted as an append-only log, so a save only writes
+  the ids added since the previous one
+- small scalar state (total_docs, last page, ...) goes into meta.json,
+  replaced atomically; it records how many log bytes were committed, so a
+  crash mid-save never leaves a half-written id visible on load
+
+Optional mark logs keep a small fixed record per id (e.g. a thread's
+crawl high-water mark); records are appended on change, the last record
+of an id wins, and the log is compacted on load once it is mostly stale.
+
+Layout of a checkpoint directory:
+    meta.json       committed scalar state + committed log lengths
+    <name>.ids      little-endian int64 ids, append-only
+    <name>.marks    little-endian (int64 id, MARK_FIELDS) records, append-only
+
+Existing crawl_checkpoint.pkl files are converted once by migrate_pickle().
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import pickle
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+ID_SIZE = 8
+
+
+class Mark(NamedTuple):
+    """Crawl high-water mark of a thread"""
+    last_page: int = 0       # last thread page fetched
+    replies: int = 0         # reply count shown in the forum listing
+    last_post_id: int = 0    # highest post id written
+    latest_time: int = 0     # listing's last-post timestamp (unix seconds)
+
+
+MARK_RECORD = struct.Struct('<qiiqq')  # id + Mark fields
+
+
+def to_int_id(value) -> int:
+    """Map a thread/post id ('12345', 't12345') to a 63-bit integer"""
+    if isinstance(value, int):
+        return value
+    digits = value[1:] if value[:1] == 't' else value
+    if digits.isdigit() and len(digits) < 19:
+        return int(digits)
+    # Non-numeric ids (e.g. md5 fallback ids) get a stable hash
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], 'little') >> 1 | (1 << 62)
+
+
+class IntIdSet:
+    """
+    Membership set of integer ids backed by a sorted array('q')
+
+    New ids go to a small pending set which is merged into the sorted array
+    once it reaches `merge_threshold`. Readers may run concurrently with a
+    single writer: the writer swaps in the merged array before clearing the
+    pending set, and readers check pending first.
+    """
+
+    def __init__(self, ids: Iterable[int] = (), merge_threshold: int = 65536):
+        self.merge_threshold = merge_threshold
+        self._sorted = array('q', sorted(set(ids)))
+        self._pending = set()
+
+    def __contains__(self, value: int) -> bool:
+        if value in self._pending:
+            return True
+        arr = self._sorted
+        i = bisect.bisect_left(arr, value)
+        return i < len(arr) and arr[i] == value
+
+    def __len__(self) -> int:
+        return len(self._sorted) + len(self._pending)
+
+    def __iter__(self) -> Iterator[int]:
+        self._merge()
+        return iter(self._sorted)
+
+    def add(self, value: int) -> bool:
+        """Add an id, returns False if it was already present"""
+        if value in self:
+            return False
+        self._pending.add(value)
+        if len(self._pending) >= self.merge_threshold:
+            self._merge()
+        return True
+
+    def _merge(self):
+        if not self._pending:
+            return
+        # Timsort merges the two sorted runs in linear time
+        merged = array('q', sorted(self._sorted.tolist() + list(self._pending)))
+        self._sorted = merged
+        self._pending = set()
+
+
+class CheckpointStore:
+    """Append-only id logs plus an atomically replaced meta.json"""
+
+    def __init__(self, directory: str, set_names: Iterable[str] = ('threads', 'posts'),
+                 mark_names: Iterable[str] = ()):
+        self.directory = directory
+        self.meta_path = os.path.join(directory, 'meta.json')
+        self.sets: Dict[str, IntIdSet] = {name: IntIdSet() for name in set_names}
+        self._unsaved: Dict[str, List[int]] = {name: [] for name in set_names}
+        self.marks: Dict[str, Dict[int, Mark]] = {name: {} for name in mark_names}
+        self._unsaved_marks: Dict[str, Dict[int, Mark]] = {name: {} for name in mark_names}
+        self._log_lengths: Dict[str, int] = {name: 0 for name in [*self.sets, *self.marks]}
+
+    def _log_path(self, name: str) -> str:
+        if name in self.marks:
+            return os.path.join(self.directory, f'{name}.marks')
+        return os.path.join(self.directory, f'{name}.ids')
+
+    def exists(self) -> bool:
+        return os.path.exists(self.meta_path)
+
+    def contains(self, name: str, value) -> bool:
+        return to_int_id(value) in self.sets[name]
+
+    def add(self, name: str, value) -> bool:
+        """Add an id to a set; it is persisted by the next commit()"""
+        int_id = to_int_id(value)
+        if not self.sets[name].add(int_id):
+            return False
+        self._unsaved[name].append(int_id)
+        return True
+
+    def get_mark(self, name: str, value) -> Optional[Mark]:
+        return self.marks[name].get(to_int_id(value))
+
+    def set_mark(self, name: str, value, mark: Mark):
+        """Record a mark; it is persisted by the next commit()"""
+        int_id = to_int_id(value)
+        if self.marks[name].get(int_id) == mark:
+            return
+        self.marks[name][int_id] = mark
+        self._unsaved_marks[name][int_id] = mark
+
+    def load(self) -> Optional[dict]:
+        """Load committed state. Returns the meta dict, or None if no checkpoint"""
+        if not self.exists():
+            return None
+
+        with open(self.meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+
+        committed = meta.pop('_log_lengths', {})
+        for name in self.sets:
+            length = committed.get(name, 0)
+            ids = array('q')
+            path = self._log_path(name)
+            if length and os.path.exists(path):
+                with open(path, 'rb') as f:
+                    ids.frombytes(f.read(length))
+                if sys.byteorder == 'big':
+                    ids.byteswap()
+            # Drop bytes appended after the last commit (crash mid-save)
+            if os.path.exists(path) and os.path.getsize(path) > length:
+                with open(path, 'r+b') as f:
+                    f.truncate(length)
+            self.sets[name] = IntIdSet(ids)
+            self._unsaved[name] = []
+            self._log_lengths[name] = length
+
+        compacted = False
+        for name in self.marks:
+            length = committed.get(name, 0)
+            path = self._log_path(name)
+            marks = {}
+            if length and os.path.exists(path):
+                with open(path, 'rb') as f:
+                    data = f.read(length)
+                usable = len(data) - len(data) % MARK_RECORD.size
+                for int_id, *fields in MARK_RECORD.iter_unpack(data[:usable]):
+                    marks[int_id] = Mark(*fields)
+            if os.path.exists(path) and os.path.getsize(path) > length:
+                with open(path, 'r+b') as f:
+                    f.truncate(length)
+            self.marks[name] = marks
+            self._unsaved_marks[name] = {}
+            self._log_lengths[name] = length
+
+            # Rewrite a log that is mostly superseded records
+            if length > 2 * MARK_RECORD.size * len(marks) + (1 << 20):
+                self._rewrite_marks(name)
+                compacted = True
+
+        if compacted:
+            self.commit(meta)
+        return meta
+
+    def _rewrite_marks(self, name: str):
+        path = self._log_path(name)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            for int_id, mark in self.marks[name].items():
+                f.write(MARK_RECORD.pack(int_id, *mark))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self._log_lengths[name] = len(self.marks[name]) * MARK_RECORD.size
+
+    def commit(self, meta: dict):
+        """Append new ids to the logs, fsync, then atomically replace meta.json"""
+        os.makedirs(self.directory, exist_ok=True)
+
+        for name, unsaved in self._unsaved.items():
+            if not unsaved:
+                continue
+            ids = array('q', unsaved)
+            if sys.byteorder == 'big':
+                ids.byteswap()
+            with open(self._log_path(name), 'ab') as f:
+                f.write(ids.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self._log_lengths[name] += len(unsaved) * ID_SIZE
+            self._unsaved[name] = []
+
+        for name, unsaved_marks in self._unsaved_marks.items():
+            if not unsaved_marks:
+                continue
+            with open(self._log_path(name), 'ab') as f:
+                f.write(b''.join(MARK_RECORD.pack(int_id, *mark) for int_id, mark in unsaved_marks.items()))
+                f.flush()
+                os.fsync(f.fileno())
+            self._log_lengths[name] += len(unsaved_marks) * MARK_RECORD.size
+            self._unsaved_marks[name] = {}
+
+        data = dict(meta)
+        data['_log_lengths'] = dict(self._log_lengths)
+        tmp_path = self.meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.meta_path)
+
+
+def migrate_pickle(pickle_path: str, store: CheckpointStore,
+                   set_keys: Optional[Dict[str, str]] = None) -> dict:
+    """
+    One-time conversion of a pickled checkpoint into a CheckpointStore
+
+    set_keys maps pickle keys to store set names (default crawled_threads ->
+    threads, crawled_posts -> posts). All other keys become meta. The pickle
+    is renamed to *.migrated afterwards. Returns the meta dict.
+    """
+    set_keys = set_keys or {'crawled_threads': 'threads', 'crawled_posts': 'posts'}
+
+    with open(pickle_path, 'rb') as f:
+        data = pickle.load(f)
+
+    meta = {}
+    for key, value in data.items():
+        if key in set_keys:
+            for item in value:
+                store.add(set_keys[key], item)
+        elif isinstance(value, set):
+            meta[key] = sorted(value)
+        else:
+            meta[key] = value
+
+    store.commit(meta)
+    os.replace(pickle_path, pickle_path + '.migrated')
+    return meta
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert a pickled crawl checkpoint')
+    parser.add_argument('pickle_path', help='e.g. data/crawl_checkpoint.pkl')
+    parser.add_argument('directory', nargs='?', help='Store directory (default: pickle path without .pkl)')
+    args = parser.parse_args()
+
+    directory = args.directory or os.path.splitext(args.pickle_path)[0]
+    store = CheckpointStore(directory)
+    if store.exists():
+        sys.exit(f"{directory} already holds a checkpoint")
+    meta = migrate_pickle(args.pickle_path, store)
+    counts = ', '.join(f"{len(ids):,} {name}" for name, ids in store.sets.items())
+    print(f"✅ Migrated {args.pickle_path} -> {directory} ({counts}, total_docs={meta.get('total_docs', 0):,})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""
+Corpus output for the crawlers
+
+JsonlDocWriter is the crawler's writer stage: documents are serialized
+into an in-memory batch and written with one syscall per batch instead of
+a write + flush per document. Durability is tied to checkpoint commits:
+commit() flushes (and optionally fsyncs) and returns the byte offset that
+the checkpoint records. On resume the file is truncated back to that
+offset, so documents written after the last checkpoint are neither lost
+(their posts were not committed as crawled, so they are fetched again)
+nor duplicated.
+
+ParquetDocWriter (--output-format parquet) has the same interface. It
+streams documents into zstd-compressed row groups of `batch_size` rows
+with dictionary-encoded string columns, in a directory of
+part-NNNNN.parquet files. A Parquet file is only readable once its
+footer is written, so the open part's rows are also appended to a JSONL
+journal; a commit fsyncs the journal and only closes the part once it
+holds `part_rows` rows, so checkpoints neither cut row groups short nor
+leave a trail of small files. The checkpoint records the committed row
+count: on resume, later rows are dropped and the open part is rebuilt
+from its journal.
+
+iter_documents() reads either format back, optionally projecting columns
+(e.g. doc_id/content_clean for indexing without decoding the rest).
+"""
+
+import glob
+import json
+import os
+import time
+from typing import Iterator, List, Optional, Sequence
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+FSYNC_POLICIES = ('commit', 'flush', 'never')
+OUTPUT_FORMATS = ('jsonl', 'parquet')
+
+# Columns written by VozProductionCrawler (fields missing from a doc become null)
+DOC_COLUMNS = [
+    ('doc_id', 'string'),
+    ('thread_id', 'string'),
+    ('thread_title', 'string'),
+    ('content', 'string'),
+    ('author', 'string'),
+    ('timestamp', 'string'),
+    ('has_quote', 'bool_'),
+    ('quoted_author', 'string'),
+    ('quoted_content', 'string'),
+    ('source', 'string'),
+    ('forum', 'string'),
+    ('url', 'string'),
+    ('content_clean', 'string'),
+    ('word_count', 'int32'),
+    ('content_segmented', 'string'),  # filled in post-processing by indexer.segment_corpus
+]
+
+# Low-cardinality / heavily repeated columns worth dictionary encoding
+DICTIONARY_COLUMNS = ['thread_id', 'thread_title', 'author', 'timestamp', 'source', 'forum', 'quoted_author']
+
+
+def dumps_line(doc: dict) -> bytes:
+    """Serialize one document as a UTF-8 JSON line (orjson when installed)"""
+    if orjson is not None:
+        return orjson.dumps(doc) + b'\n'
+    return (json.dumps(doc, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+class JsonlDocWriter:
+    """Batched, buffered JSONL writer with a configurable fsync policy"""
+
+    def __init__(self,
+                 path: str,
+                 append: bool = False,
+                 resume_offset: Optional[int] = None,
+                 batch_size: int = 1000,
+                 flush_interval: float = 1.0,
+                 fsync: str = 'commit'):
+        """
+        Args:
+            path: Output JSONL file
+            append: Keep existing content (resume) instead of truncating
+            resume_offset: Committed size from the checkpoint; anything after it is dropped
+            batch_size: Documents buffered before a write
+            flush_interval: Max seconds a document stays buffered
+            fsync: 'commit' (fsync on checkpoint), 'flush' (every batch) or 'never'
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+
+        self._file = open(path, 'ab' if append else 'wb')
+        if append and resume_offset is not None and self._file.tell() > resume_offset:
+            self._file.truncate(resume_offset)
+            self._file.seek(resume_offset)
+
+        self._batch = []
+        self._last_flush = time.monotonic()
+        self.docs_written = 0
+
+    def write(self, doc: dict):
+        """Buffer a document, flushing when the batch is full or too old"""
+        self._batch.append(dumps_line(doc))
+        if (len(self._batch) >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Write the current batch to the OS"""
+        if self._batch:
+            self._file.write(b''.join(self._batch))
+            self.docs_written += len(self._batch)
+            self._batch = []
+        self._file.flush()
+        if self.fsync == 'flush':
+            os.fsync(self._file.fileno())
+        self._last_flush = time.monotonic()
+
+    def commit(self) -> int:
+        """Make everything written so far durable, returns the committed offset"""
+        self.flush()
+        if self.fsync == 'commit':
+            os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self):
+        self.commit()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ParquetDocWriter:
+    """Streams documents into full row groups of Parquet part files, journaled until a part closes"""
+
+    def __init__(self,
+                 path: str,
+                 append: bool = False,
+                 resume_offset: Optional[int] = None,
+                 batch_size: int = 50000,
+                 flush_interval: float = 0,
+                 fsync: str = 'commit',
+                 compression: str = 'zstd',
+                 part_rows: int = 500000):
+        """
+        Args:
+            path: Output directory of part-NNNNN.parquet files
+            append: Keep committed rows (resume) instead of clearing the directory
+            resume_offset: Committed row count from the checkpoint; later rows are dropped
+            batch_size: Rows per row group
+            flush_interval: Unused, row groups are cut by size only
+            fsync: 'commit' fsyncs the journal on commit, 'flush' on every row group
+                too, 'never' skips it; closed parts are fsynced unless 'never'
+            compression: Parquet codec (zstd)
+            part_rows: Rows after which a commit closes the open part
+        """
+        if pa is None:
+            raise ImportError("Parquet output requires pyarrow: pip install pyarrow")
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+
+        self.path = path
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.compression = compression
+        self.part_rows = part_rows
+        self.schema = pa.schema([(name, getattr(pa, type_name)()) for name, type_name in DOC_COLUMNS])
+
+        self._rows: List[dict] = []
+        self._journaled = 0  # rows of self._rows already in the journal
+        self._writer = None
+        self._tmp_path = None
+        self._part_size = 0  # rows in the open part (row groups + self._rows)
+        self._closed_rows = 0  # rows in part files
+        self.docs_written = 0
+
+        os.makedirs(path, exist_ok=True)
+        for stale in glob.glob(os.path.join(path, '*.tmp')):
+            os.remove(stale)
+        if not append:
+            for part in self._part_paths():
+                os.remove(part)
+        self.parts_committed = self._recover_parts(resume_offset)
+        # Journals of closed parts (crash between closing a part and dropping
+        # its journal) and of dropped parts are stale
+        journal_path = self._journal_path(self.parts_committed)
+        for journal in glob.glob(os.path.join(path, 'part-*.journal.jsonl')):
+            if journal != journal_path:
+                os.remove(journal)
+        if not append and os.path.exists(journal_path):
+            os.remove(journal_path)
+        self._journal = open(journal_path, 'ab')
+        if self._journal.tell():
+            self._recover_journal(None if resume_offset is None else resume_offset - self._closed_rows)
+
+    def _part_paths(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.path, 'part-*.parquet')))
+
+    def _journal_path(self, part: int) -> str:
+        """JSONL copy of the rows of an open part, which is unreadable until its footer is written"""
+        return os.path.join(self.path, f'part-{part:05d}.journal.jsonl')
+
+    def _recover_parts(self, resume_offset: Optional[int]) -> int:
+        """Keep the part files holding the first resume_offset rows, returns their number"""
+        parts = self._part_paths()
+        for kept, part in enumerate(parts):
+            num_rows = pq.ParquetFile(part).metadata.num_rows
+            if resume_offset is not None and self._closed_rows + num_rows > resume_offset:
+                # Closed after the last checkpoint: keep its committed head only
+                table = pq.read_table(part).slice(0, resume_offset - self._closed_rows)
+                for later in parts[kept:]:
+                    os.remove(later)
+                if not table.num_rows:
+                    return kept
+                pq.write_table(table, part, compression=self.compression,
+                               use_dictionary=DICTIONARY_COLUMNS, row_group_size=self.batch_size)
+                self._closed_rows += table.num_rows
+                return kept + 1
+            self._closed_rows += num_rows
+        return len(parts)
+
+    def _recover_journal(self, keep: Optional[int]):
+        """Rebuild the open part from its journal, dropping rows after the first `keep`"""
+        loads = orjson.loads if orjson is not None else json.loads
+        offset = rows = 0
+        with open(self._journal.name, 'rb') as f:
+            for line in f:
+                if (keep is not None and rows >= keep) or not line.endswith(b'\n'):
+                    break  # uncommitted or torn
+                offset += len(line)
+                rows += 1
+        self._journal.truncate(offset)
+        with open(self._journal.name, 'rb') as f:
+            for _ in range(rows):
+                self._rows.append(loads(f.readline()))
+                self._journaled += 1
+                self._part_size += 1
+                if len(self._rows) >= self.batch_size:
+                    self._write_row_group()
+
+    def write(self, doc: dict):
+        """Buffer a document, writing a row group when the batch is full"""
+        self._rows.append(doc)
+        self._part_size += 1
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def _write_journal(self):
+        """Append buffered rows not journaled yet"""
+        if self._journaled < len(self._rows):
+            self._journal.write(b''.join(dumps_line(doc) for doc in self._rows[self._journaled:]))
+            self._journaled = len(self._rows)
+        self._journal.flush()
+
+    def _write_row_group(self):
+        if self._writer is None:
+            self._tmp_path = os.path.join(self.path, f'part-{self.parts_committed:05d}.parquet.tmp')
+            self._writer = pq.ParquetWriter(
+                self._tmp_path,
+                self.schema,
+                compression=self.compression,
+                use_dictionary=DICTIONARY_COLUMNS
+            )
+        table = pa.Table.from_pylist(self._rows, schema=self.schema)
+        self._writer.write_table(table, row_group_size=len(self._rows))
+        self.docs_written += len(self._rows)
+        self._rows = []
+        self._journaled = 0
+
+    def flush(self):
+        """Journal buffered rows and write them as one row group of the open part"""
+        if not self._rows:
+            return
+        self._write_journal()
+        if self.fsync == 'flush':
+            os.fsync(self._journal.fileno())
+        self._write_row_group()
+
+    def _close_part(self):
+        """Write the open part's footer, making it readable, and reset the journal"""
+        self.flush()
+        if self._writer is None:
+            return
+        self._writer.close()
+        if self.fsync != 'never':
+            with open(self._tmp_path, 'rb') as f:
+                os.fsync(f.fileno())
+        os.replace(self._tmp_path, self._tmp_path[:-len('.tmp')])
+        self._writer = None
+        self.parts_committed += 1
+        self._closed_rows += self._part_size
+        self._part_size = 0
+        self._journal.close()
+        os.remove(self._journal.name)
+        self._journal = open(self._journal_path(self.parts_committed), 'ab')
+
+    def commit(self) -> int:
+        """Make every row written so far durable, returns the committed row count"""
+        if self._part_size >= self.part_rows:
+            self._close_part()
+        else:
+            self._write_journal()
+            if self.fsync != 'never':
+                os.fsync(self._journal.fileno())
+        return self._closed_rows + self._part_size
+
+    def close(self):
+        self._close_part()
+        self._journal.close()
+        os.remove(self._journal.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_doc_writer(output_format: str, path: str, **kwargs):
+    """Create the writer stage for an output format ('jsonl' or 'parquet')"""
+    if output_format == 'parquet':
+        return ParquetDocWriter(path, **kwargs)
+    if output_format == 'jsonl':
+        return JsonlDocWriter(path, **kwargs)
+    raise ValueError(f"Unknown output format: {output_format}")
+
+
+def iter_documents(path: str, columns: Optional[Sequence[str]] = None,
+                   batch_size: int = 10000) -> Iterator[dict]:
+    """
+    Stream documents from a crawler output (JSONL file or Parquet file/directory)
+
+    With `columns`, Parquet only decodes those columns; JSONL rows are
+    reduced to the same keys so callers see one shape for both formats.
+    """
+    if os.path.isdir(path) or path.endswith('.parquet'):
+        if pq is None:
+            raise ImportError("Reading Parquet requires pyarrow: pip install pyarrow")
+        files = sorted(glob.glob(os.path.join(path, 'part-*.parquet'))) if os.path.isdir(path) else [path]
+        for file_path in files:
+            parquet_file = pq.ParquetFile(file_path)
+            # Parts written before a column was added lack it: read it as None
+            present = columns
+            if columns is not None:
+                names = set(parquet_file.schema_arrow.names)
+                present = [name for name in columns if name in names]
+            for batch in parquet_file.iter_batches(batch_size=batch_size, columns=present):
+                if present is columns:
+                    yield from batch.to_pylist()
+                else:
+                    for doc in batch.to_pylist():
+                        yield {name: doc.get(name) for name in columns}
+        return
+
+    loads = orjson.loads if orjson is not None else json.loads
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            doc = loads(line)
+            if columns is not None:
+                doc = {key: doc.get(key) for key in columns}
+            yield doc
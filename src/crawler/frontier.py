@@ -0,0 +1,205 @@
+"""
+Streaming crawl frontier
+
+The crawl loops used to list one forum page, submit its first 20 threads,
+wait for all of them, then list the next page: workers idled while the
+slowest thread drained and threads 21+ of every page were dropped.
+
+ListingFrontier instead lists forum pages ahead in a background thread
+and feeds every new thread into a bounded queue; the crawl loop keeps its
+worker pool full by pulling from it as futures complete. When the queue is
+full the lister blocks, so at most `max_queued` threads wait in memory.
+
+Resume bookkeeping: each queued thread counts against its listing page
+until task_done(). resume_pages() reports, per forum, the lowest page that
+still has unfinished threads (or the next page to list), which is where a
+resumed crawl has to start listing again so no thread is skipped.
+"""
+
+import logging
+import queue
+from threading import Event, Lock, Thread
+from typing import Callable, Dict, Hashable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+try:
+    from .shard_coordinator import PageSlice
+except ImportError:  # running as a script
+    from shard_coordinator import PageSlice
+
+
+class FrontierItem(NamedTuple):
+    forum: Hashable
+    page: int
+    thread: dict
+
+
+class ListingFrontier:
+    """Background forum lister feeding a bounded queue of threads to crawl"""
+
+    _DONE = object()
+
+    def __init__(self,
+                 fetch_listing: Callable[[Hashable, int], Tuple[List[dict], int]],
+                 forums: Sequence[Tuple[Hashable, PageSlice, int, Optional[int]]],
+                 max_queued: int = 500,
+                 pages_per_turn: int = 0,
+                 max_idle_pages: int = 0,
+                 logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            fetch_listing: (forum, page) -> (new threads, total threads on page);
+                total 0 means the forum has no more pages
+            forums: (forum, page slice, first page, last page or None) in crawl order
+            max_queued: Threads buffered ahead of the workers
+            pages_per_turn: Pages listed per forum before moving to the next one
+                round-robin (0 = finish each forum before the next)
+            max_idle_pages: Finish a forum after this many consecutive listing pages
+                without threads to crawl (0 = list until the end); for refreshes,
+                where the listing is ordered by latest activity
+            logger: Logger for end-of-forum messages
+        """
+        self.fetch_listing = fetch_listing
+        self.forums = list(forums)
+        self.pages_per_turn = pages_per_turn
+        self.max_idle_pages = max_idle_pages
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queued)
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+        self.exhausted = False
+
+        # forum -> next page to list / {listing page: unfinished threads}
+        self._next_page: Dict[Hashable, int] = {forum: first for forum, _, first, _ in self.forums}
+        self._pending: Dict[Hashable, Dict[int, int]] = {forum: {} for forum, _, _, _ in self.forums}
+        self._finished: Set[Hashable] = set()
+        self._idle_pages: Dict[Hashable, int] = {forum: 0 for forum, _, _, _ in self.forums}
+        self._queued_ids: Set[str] = set()  # queued or in flight (a bumped thread can be listed twice)
+
+        self.pages_listed = 0
+        self.threads_queued = 0
+
+    def start(self):
+        self._thread = Thread(target=self._produce, name='listing-frontier', daemon=True)
+        self._thread.start()
+
+    def _produce(self):
+        try:
+            active = list(self.forums)
+            while active and not self._stop.is_set():
+                for entry in list(active):
+                    if not self._list_forum(*entry):
+                        active.remove(entry)
+                        with self._lock:
+                            self._finished.add(entry[0])
+                    if self._stop.is_set():
+                        break
+        except Exception as e:
+            self.logger.error(f"Listing frontier failed: {e}")
+        finally:
+            self._put(self._DONE)
+
+    def _list_forum(self, forum: Hashable, page_slice: PageSlice, first_page: int,
+                    last_page: Optional[int]) -> bool:
+        """List up to pages_per_turn pages of a forum, returns False once it has no more pages"""
+        listed = 0
+        while not self._stop.is_set():
+            if self.pages_per_turn and listed >= self.pages_per_turn:
+                return True
+            page = self._next_page[forum]
+            if last_page is not None and page > last_page:
+                return False
+
+            threads, total_on_page = self.fetch_listing(forum, page)
+            if total_on_page == 0:
+                # No threads on page = end of forum
+                self.logger.info(f"   End of forum {forum} at page {page}")
+                return False
+
+            with self._lock:
+                new = [t for t in threads if t['thread_id'] not in self._queued_ids]
+                for thread in new:
+                    self._queued_ids.add(thread['thread_id'])
+                if new:
+                    self._pending[forum][page] = len(new)
+                self._next_page[forum] = page + page_slice.stride
+            self.pages_listed += 1
+            listed += 1
+
+            self._idle_pages[forum] = 0 if new else self._idle_pages[forum] + 1
+            if self.max_idle_pages and self._idle_pages[forum] >= self.max_idle_pages:
+                self.logger.info(f"   No new activity in {forum} after page {page}")
+                return False
+
+            for thread in new:
+                if not self._put(FrontierItem(forum, page, thread)):
+                    break
+                self.threads_queued += 1
+        return True  # stopped, the forum is not finished
+
+    def _put(self, item) -> bool:
+        """Blocking put that gives up when the frontier is stopped"""
+        while True:
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                if self._stop.is_set():
+                    return False
+
+    def get(self, timeout: Optional[float] = None) -> Optional[FrontierItem]:
+        """
+        Next thread to crawl
+
+        Returns None if nothing arrives within `timeout` (None waits) or the
+        frontier is exhausted - check `exhausted` to tell the two apart.
+        """
+        if self.exhausted:
+            return None
+        try:
+            item = self._queue.get(timeout=timeout) if timeout != 0 else self._queue.get_nowait()
+        except queue.Empty:
+            return None
+        if item is self._DONE:
+            self.exhausted = True
+            return None
+        return item
+
+    @property
+    def queued(self) -> int:
+        """Threads waiting in the queue"""
+        return self._queue.qsize()
+
+    def task_done(self, item: FrontierItem):
+        """Mark a thread from get() as finished (written or given up)"""
+        with self._lock:
+            pending = self._pending[item.forum]
+            pending[item.page] -= 1
+            if not pending[item.page]:
+                del pending[item.page]
+            self._queued_ids.discard(item.thread['thread_id'])
+
+    def resume_pages(self) -> Dict[Hashable, int]:
+        """Per unfinished forum: the page to resume listing from"""
+        with self._lock:
+            pages = {}
+            for forum, _, _, _ in self.forums:
+                pending = self._pending[forum]
+                if pending:
+                    pages[forum] = min(pending)
+                elif forum not in self._finished:
+                    pages[forum] = self._next_page[forum]
+            return pages
+
+    def stop(self):
+        """Stop listing and release the lister thread"""
+        self._stop.set()
+        if self._thread is not None:
+            while self._thread.is_alive():
+                try:  # unblock a lister waiting on a full queue
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+                self._thread.join(timeout=0.1)
+            self._thread = None
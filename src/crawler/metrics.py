@@ -0,0 +1,272 @@
+"""
+Live crawl metrics
+
+Hot-path instrumentation without a shared lock: every thread updates its
+own counters and stage histograms (registered once per thread), and
+readers sum the per-thread shards when a snapshot is taken. Counters are
+only ever written by their owning thread, so a snapshot may be a few
+increments behind but never blocks a worker.
+
+- counters:  metrics.inc('requests_made')
+- stages:    with metrics.time('fetch'): ...   or   metrics.observe('parse', seconds)
+- gauges:    metrics.gauge('frontier_queued', lambda: frontier.queued)
+
+Stages used by the crawlers: pacing (waiting on the rate controller),
+fetch, parse, clean, write, checkpoint. Comparing their total seconds
+shows whether a slow crawl is network-, parse- or disk-bound.
+
+Exposed through MetricsServer (Prometheus text on /metrics, JSON on
+/metrics.json) and SnapshotWriter (one JSON line per interval).
+"""
+
+import bisect
+import json
+import os
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Event, Lock, Thread, local
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Stage latency histogram bounds (seconds)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _Shard:
+    """One thread's counters and stage histograms"""
+
+    __slots__ = ('counters', 'stages')
+
+    def __init__(self):
+        self.counters: Dict[str, int] = {}
+        # stage -> [count, total seconds, bucket counts...] (last bucket is +Inf)
+        self.stages: Dict[str, list] = {}
+
+
+class Metrics:
+    """Per-thread counters and stage timers, aggregated on read"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.started = time.time()
+        self._local = local()
+        self._shards: List[_Shard] = []
+        self._lock = Lock()  # shard registration and gauges only
+        self._gauges: Dict[str, Callable[[], float]] = {}
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def inc(self, name: str, value: int = 1):
+        counters = self._shard().counters
+        counters[name] = counters.get(name, 0) + value
+
+    def observe(self, stage: str, seconds: float):
+        stages = self._shard().stages
+        hist = stages.get(stage)
+        if hist is None:
+            hist = stages[stage] = [0, 0.0] + [0] * (len(self.buckets) + 1)
+        hist[0] += 1
+        hist[1] += seconds
+        hist[2 + bisect.bisect_left(self.buckets, seconds)] += 1
+
+    @contextmanager
+    def time(self, stage: str):
+        """Time a block as one observation of `stage`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def gauge(self, name: str, fn: Callable[[], float]):
+        """Register a value computed at snapshot time"""
+        with self._lock:
+            self._gauges[name] = fn
+
+    def counter(self, name: str) -> int:
+        with self._lock:
+            shards = list(self._shards)
+        return sum(shard.counters.get(name, 0) for shard in shards)
+
+    def _aggregate(self):
+        with self._lock:
+            shards = list(self._shards)
+            gauges = dict(self._gauges)
+
+        counters: Dict[str, int] = {}
+        stages: Dict[str, list] = {}
+        for shard in shards:
+            for name, value in list(shard.counters.items()):
+                counters[name] = counters.get(name, 0) + value
+            for stage, hist in list(shard.stages.items()):
+                total = stages.setdefault(stage, [0] * len(hist))
+                for i, value in enumerate(list(hist)):
+                    total[i] += value
+
+        gauge_values = {}
+        for name, fn in gauges.items():
+            try:
+                gauge_values[name] = fn()
+            except Exception:
+                continue
+        return counters, stages, gauge_values
+
+    def _quantile(self, hist: list, q: float) -> float:
+        """Quantile estimate from bucket counts (linear within a bucket)"""
+        count = hist[0]
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        lower = 0.0
+        for i, bucket_count in enumerate(hist[2:]):
+            upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+            if bucket_count and seen + bucket_count >= rank:
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+            lower = upper
+        return self.buckets[-1]
+
+    def snapshot(self) -> dict:
+        """Aggregated counters, per-stage timing summaries and gauges"""
+        counters, stages, gauges = self._aggregate()
+        total_seconds = sum(hist[1] for hist in stages.values()) or 1.0
+        return {
+            'timestamp': time.time(),
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'counters': counters,
+            'stages': {
+                stage: {
+                    'count': hist[0],
+                    'seconds': round(hist[1], 3),
+                    'share': round(hist[1] / total_seconds, 3),
+                    'mean_ms': round(hist[1] / hist[0] * 1000, 2) if hist[0] else 0.0,
+                    'p50_ms': round(self._quantile(hist, 0.5) * 1000, 2),
+                    'p99_ms': round(self._quantile(hist, 0.99) * 1000, 2),
+                }
+                for stage, hist in sorted(stages.items())
+            },
+            'gauges': gauges,
+        }
+
+    def render_prometheus(self, prefix: str = 'voz_crawler') -> str:
+        """Prometheus text exposition format"""
+        counters, stages, gauges = self._aggregate()
+        lines = []
+        for name, value in sorted(counters.items()):
+            lines.append(f'# TYPE {prefix}_{name}_total counter')
+            lines.append(f'{prefix}_{name}_total {value}')
+        for name, value in sorted(gauges.items()):
+            lines.append(f'# TYPE {prefix}_{name} gauge')
+            lines.append(f'{prefix}_{name} {value}')
+
+        if stages:
+            metric = f'{prefix}_stage_seconds'
+            lines.append(f'# HELP {metric} Time spent per crawl stage')
+            lines.append(f'# TYPE {metric} histogram')
+            for stage, hist in sorted(stages.items()):
+                cumulative = 0
+                for i, bound in enumerate(self.buckets):
+                    cumulative += hist[2 + i]
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {hist[0]}')
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {hist[1]:.6f}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {hist[0]}')
+        return '\n'.join(lines) + '\n'
+
+    def stage_summary(self) -> str:
+        """One-line share of time per stage, e.g. 'fetch 71% | parse 18% | write 6%'"""
+        stages = self.snapshot()['stages']
+        ranked = sorted(stages.items(), key=lambda item: -item[1]['seconds'])
+        return ' | '.join(f"{stage} {info['share'] * 100:.0f}%" for stage, info in ranked)
+
+
+class MetricsServer:
+    """Local HTTP endpoint: /metrics (Prometheus) and /metrics.json"""
+
+    def __init__(self, metrics: Metrics, port: int = 9108, host: str = '127.0.0.1'):
+        self.metrics = metrics
+        registry = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path == '/metrics':
+                    body = registry.render_prometheus().encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                elif path == '/metrics.json':
+                    body = json.dumps(registry.snapshot(), ensure_ascii=False).encode('utf-8')
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/metrics'
+
+    def start(self):
+        self._thread = Thread(target=self._server.serve_forever, name='metrics-server', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class SnapshotWriter:
+    """Appends a JSON snapshot line to `path` every `interval` seconds"""
+
+    def __init__(self, metrics: Metrics, path: str, interval: float = 10.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+    def write(self):
+        line = json.dumps(self.metrics.snapshot(), ensure_ascii=False)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def start(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._thread = Thread(target=self._run, name='metrics-snapshots', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop and write a final snapshot"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.write()
@@ -0,0 +1,197 @@
+"""
+Streaming near-duplicate filter (64-bit SimHash + LSH banding)
+
+Exact dedup by post id misses reposts, copy-pastes and quote-heavy replies.
+NearDuplicateFilter fingerprints `content_clean` with SimHash over word
+shingles and reports a document as a near duplicate when a previously
+seen fingerprint is within `max_distance` bits (Hamming distance).
+
+Shingles default to single words (weighted by repetition): on forum
+posts a one-word edit then moves the fingerprint ~1 bit, while with
+3-word shingles it touches 3 features and often exceeds 3 bits.
+Unrelated posts stay well above 10 bits apart either way.
+
+Lookups use banding: the 64 bits are split into max_distance + 1 bands,
+so any fingerprint within max_distance bits shares at least one band
+exactly with the query (pigeonhole) and only that band's bucket is
+scanned. Memory is bounded by `capacity` fingerprints, oldest evicted
+first.
+
+Fingerprinting is kept cheap enough for the crawler's doc rate: shingles
+are hashed with Python's built-in tuple hash (fingerprints only need to
+be consistent within one process), and the 64 per-bit SimHash counters
+are packed into 16-bit lanes of one Python int, so each shingle costs
+8 table lookups and additions instead of a 64-step bit loop.
+
+Standalone mode dedups an existing corpus in one pass:
+    python near_dup.py data/voz_1m.jsonl data/voz_1m_dedup.jsonl --distance 3
+"""
+
+import re
+import time
+from collections import deque
+from typing import Deque, Dict, List
+
+MASK64 = (1 << 64) - 1
+LANE_BITS = 16
+LANE_MASK = (1 << LANE_BITS) - 1
+MAX_FEATURES = LANE_MASK  # lane counters must not overflow
+
+WORD_RE = re.compile(r'\w+')  # punctuation/spacing edits do not change shingles
+
+
+def _build_spread_tables() -> List[List[int]]:
+    """_SPREAD[j][b]: byte b at byte position j, each bit moved to its own 16-bit lane"""
+    tables = []
+    for j in range(8):
+        table = []
+        for b in range(256):
+            value = 0
+            for i in range(8):
+                if b >> i & 1:
+                    value |= 1 << (LANE_BITS * (8 * j + i))
+            table.append(value)
+        tables.append(table)
+    return tables
+
+
+_SPREAD = _build_spread_tables()
+
+
+def simhash(text: str, shingle_size: int = 1) -> int:
+    """64-bit SimHash of a text over lowercase word shingles"""
+    words = WORD_RE.findall(text.lower())
+    if shingle_size > 1 and len(words) >= shingle_size:
+        features = [tuple(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+    else:
+        features = words
+    if not features:
+        return 0
+    features = features[:MAX_FEATURES]
+
+    t0, t1, t2, t3, t4, t5, t6, t7 = _SPREAD
+    acc = 0
+    for feature in features:
+        h = hash(feature) & MASK64
+        acc += (t0[h & 255] + t1[h >> 8 & 255] + t2[h >> 16 & 255] + t3[h >> 24 & 255]
+                + t4[h >> 32 & 255] + t5[h >> 40 & 255] + t6[h >> 48 & 255] + t7[h >> 56])
+
+    # Bit i is set when more than half of the features have bit i set
+    half = len(features) // 2
+    fingerprint = 0
+    for i in range(64):
+        if (acc >> (LANE_BITS * i)) & LANE_MASK > half:
+            fingerprint |= 1 << i
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class NearDuplicateFilter:
+    """Bounded-memory SimHash index answering 'seen something within k bits?'"""
+
+    def __init__(self, max_distance: int = 3, shingle_size: int = 1, capacity: int = 2000000):
+        """
+        Args:
+            max_distance: Max Hamming distance (bits) to count as near duplicate
+            shingle_size: Words per shingle
+            capacity: Fingerprints kept in memory (oldest evicted first)
+        """
+        self.max_distance = max_distance
+        self.shingle_size = shingle_size
+        self.capacity = capacity
+
+        # Split 64 bits into max_distance + 1 bands
+        num_bands = max_distance + 1
+        widths = [64 // num_bands + (1 if i < 64 % num_bands else 0) for i in range(num_bands)]
+        self._bands = []
+        shift = 0
+        for width in widths:
+            self._bands.append((shift, (1 << width) - 1))
+            shift += width
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in self._bands]
+        self._order: Deque[int] = deque()
+
+        self.checked = 0
+        self.duplicates = 0
+
+    def _find(self, fingerprint: int) -> bool:
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            bucket = buckets.get(fingerprint >> shift & mask)
+            if bucket:
+                for other in bucket:
+                    if hamming_distance(fingerprint, other) <= self.max_distance:
+                        return True
+        return False
+
+    def _add(self, fingerprint: int):
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            buckets.setdefault(fingerprint >> shift & mask, []).append(fingerprint)
+        self._order.append(fingerprint)
+
+        if len(self._order) > self.capacity:
+            oldest = self._order.popleft()
+            for (shift, mask), buckets in zip(self._bands, self._buckets):
+                key = oldest >> shift & mask
+                bucket = buckets[key]
+                bucket.remove(oldest)
+                if not bucket:
+                    del buckets[key]
+
+    def is_duplicate(self, text: str) -> bool:
+        """Check a document; non-duplicates are remembered for later checks"""
+        self.checked += 1
+        fingerprint = simhash(text, self.shingle_size)
+        if fingerprint == 0:  # empty text
+            return False
+        if self._find(fingerprint):
+            self.duplicates += 1
+            return True
+        self._add(fingerprint)
+        return False
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+
+def main():
+    """Standalone single-pass dedup of an existing corpus"""
+    import argparse
+
+    try:
+        from .corpus_io import dumps_line, iter_documents
+    except ImportError:  # running as a script: python near_dup.py
+        from corpus_io import dumps_line, iter_documents
+
+    parser = argparse.ArgumentParser(description='Remove near-duplicate documents (SimHash)')
+    parser.add_argument('input', help='Crawler output (JSONL file or Parquet directory)')
+    parser.add_argument('output', help='Deduplicated JSONL output')
+    parser.add_argument('--distance', type=int, default=3, help='Max Hamming distance in bits (default 3)')
+    parser.add_argument('--field', default='content_clean', help='Text field to compare (default content_clean)')
+    parser.add_argument('--shingle', type=int, default=1, help='Words per shingle (default 1)')
+    parser.add_argument('--capacity', type=int, default=2000000, help='Fingerprints kept in memory')
+    args = parser.parse_args()
+
+    near_dup = NearDuplicateFilter(max_distance=args.distance, shingle_size=args.shingle,
+                                   capacity=args.capacity)
+    start = time.time()
+    kept = 0
+
+    with open(args.output, 'wb') as out:
+        for doc in iter_documents(args.input):
+            text = doc.get(args.field) or doc.get('content') or ''
+            if near_dup.is_duplicate(text):
+                continue
+            out.write(dumps_line(doc))
+            kept += 1
+
+    duration = max(time.time() - start, 1e-9)
+    print(f"✅ {near_dup.checked:,} docs -> {kept:,} kept, "
+          f"{near_dup.duplicates:,} near duplicates removed "
+          f"({near_dup.checked / duration:,.0f} docs/sec)")
+
+
+if __name__ == "__main__":
+    main()
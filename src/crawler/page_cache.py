@@ -0,0 +1,331 @@
+"""
+On-disk raw page cache for the crawlers
+
+Raw HTML is kept so parser/cleaning changes can be re-run without
+downloading voz.vn again:
+
+- content-addressed: page bodies are stored once per SHA-1 of their
+  content under blobs/<2 hex>/<digest>.z (zlib), shared by URLs that
+  return identical HTML
+- indexed by URL in SQLite (index.sqlite) with the response's ETag and
+  Last-Modified, so revisits can be conditional requests (304 -> cached body)
+- size-bounded: once compressed blobs exceed `max_bytes`, the least
+  recently used URLs are evicted and unreferenced blobs deleted
+
+Offline replay pushes every cached thread page through the parser pipeline
+at full CPU speed (no network), producing a corpus like a crawl would:
+
+    python page_cache.py replay data/page_cache data/replay.jsonl --parser lxml
+    python page_cache.py stats data/page_cache
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import time
+import zlib
+from collections import deque
+from threading import Lock
+from typing import Deque, Dict, Iterator, NamedTuple, Optional, Tuple
+
+THREAD_URL_RE = re.compile(r'/t/[^/]*?\.?(\d+)/(?:page-(\d+))?$')
+TITLE_RE = re.compile(r'<h1[^>]*class="p-title-value"[^>]*>(.*?)</h1>|<title>(.*?)</title>', re.S)
+TAG_RE = re.compile(r'<[^>]+>')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed_at);
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    refcount INTEGER NOT NULL
+);
+"""
+
+
+class CachedPage(NamedTuple):
+    url: str
+    text: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Request headers to revalidate this page (empty if the server gave no validators)"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """Content-addressed, zlib-compressed HTML cache with an SQLite URL index"""
+
+    def __init__(self, directory: str, max_bytes: int = 20 * 1024 ** 3, compression_level: int = 6):
+        """
+        Args:
+            directory: Cache directory (created if missing)
+            max_bytes: Compressed size budget; least recently used pages are evicted past it
+            compression_level: zlib level for new blobs
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compression_level = compression_level
+        os.makedirs(os.path.join(directory, 'blobs'), exist_ok=True)
+
+        self._lock = Lock()
+        self._db = sqlite3.connect(os.path.join(directory, 'index.sqlite'), check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(SCHEMA)
+        self.total_bytes = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0]
+
+        self.hits = 0
+        self.misses = 0
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, 'blobs', digest[:2], digest + '.z')
+
+    def _read_blob(self, digest: str) -> Optional[str]:
+        try:
+            with open(self._blob_path(digest), 'rb') as f:
+                return zlib.decompress(f.read()).decode('utf-8')
+        except (OSError, zlib.error):
+            return None
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        """Cached page for a URL, or None"""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT digest, etag, last_modified, fetched_at FROM pages WHERE url = ?', (url,)).fetchone()
+        text = self._read_blob(row[0]) if row else None
+        if text is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return CachedPage(url, text, row[1], row[2], row[3])
+
+    def put(self, url: str, text: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """Store a fetched page (a changed body replaces the URL's previous blob)"""
+        data = text.encode('utf-8')
+        digest = hashlib.sha1(data).hexdigest()
+        now = time.time()
+
+        with self._lock:
+            exists = self._db.execute('SELECT 1 FROM blobs WHERE digest = ?', (digest,)).fetchone()
+            if not exists:
+                path = self._blob_path(digest)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                compressed = zlib.compress(data, self.compression_level)
+                tmp_path = path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(compressed)
+                os.replace(tmp_path, path)
+
+            old = self._db.execute('SELECT digest FROM pages WHERE url = ?', (url,)).fetchone()
+            if old and old[0] == digest:
+                self._db.execute(
+                    'UPDATE pages SET etag = ?, last_modified = ?, fetched_at = ?, accessed_at = ? WHERE url = ?',
+                    (etag, last_modified, now, now, url))
+            else:
+                if exists:
+                    self._db.execute('UPDATE blobs SET refcount = refcount + 1 WHERE digest = ?', (digest,))
+                else:
+                    self._db.execute('INSERT INTO blobs (digest, size, refcount) VALUES (?, ?, 1)',
+                                     (digest, len(compressed)))
+                    self.total_bytes += len(compressed)
+                self._db.execute(
+                    'INSERT OR REPLACE INTO pages (url, digest, etag, last_modified, fetched_at, accessed_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)', (url, digest, etag, last_modified, now, now))
+                if old:
+                    self._release_blob(old[0])
+
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def touch(self, url: str):
+        """Mark a page as revalidated (304) and recently used"""
+        now = time.time()
+        with self._lock:
+            self._db.execute('UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url = ?', (now, now, url))
+            self._db.commit()
+
+    def _release_blob(self, digest: str):
+        """Drop one reference to a blob, deleting it when unused (caller holds the lock)"""
+        self._db.execute('UPDATE blobs SET refcount = refcount - 1 WHERE digest = ?', (digest,))
+        row = self._db.execute('SELECT size FROM blobs WHERE digest = ? AND refcount <= 0', (digest,)).fetchone()
+        if row:
+            self._db.execute('DELETE FROM blobs WHERE digest = ?', (digest,))
+            self.total_bytes -= row[0]
+            try:
+                os.remove(self._blob_path(digest))
+            except OSError:
+                pass
+
+    def _evict(self):
+        """Evict least recently used pages down to 90% of the budget (caller holds the lock)"""
+        target = self.max_bytes * 0.9
+        while self.total_bytes > target:
+            rows = self._db.execute(
+                'SELECT url, digest FROM pages ORDER BY accessed_at LIMIT 256').fetchall()
+            if not rows:
+                break
+            for url, digest in rows:
+                self._db.execute('DELETE FROM pages WHERE url = ?', (url,))
+                self._release_blob(digest)
+                if self.total_bytes <= target:
+                    break
+
+    def iter_pages(self, url_pattern: str = '%', batch_size: int = 1000) -> Iterator[CachedPage]:
+        """All cached pages whose URL matches a SQL LIKE pattern, in URL order (read batch_size rows at a time)"""
+        last_url = ''
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    'SELECT url, digest, etag, last_modified, fetched_at FROM pages '
+                    'WHERE url LIKE ? AND url > ? ORDER BY url LIMIT ?',
+                    (url_pattern, last_url, batch_size)).fetchall()
+            for url, digest, etag, last_modified, fetched_at in rows:
+                text = self._read_blob(digest)
+                if text is not None:
+                    yield CachedPage(url, text, etag, last_modified, fetched_at)
+            if len(rows) < batch_size:
+                return
+            last_url = rows[-1][0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            pages, blobs = self._db.execute(
+                'SELECT (SELECT COUNT(*) FROM pages), (SELECT COUNT(*) FROM blobs)').fetchone()
+        return {
+            'pages': pages,
+            'blobs': blobs,
+            'compressed_bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+
+def thread_from_page(url: str, html: str) -> Optional[Tuple[dict, int]]:
+    """(thread dict for parse_thread_page, page number) of a cached thread page URL"""
+    match = THREAD_URL_RE.search(url)
+    if not match:
+        return None
+    page = int(match.group(2) or 1)
+    thread_url = url[:match.start(2) - len('page-')] if match.group(2) else url
+
+    title = ''
+    title_match = TITLE_RE.search(html)
+    if title_match:
+        title = TAG_RE.sub('', title_match.group(1) or title_match.group(2) or '').strip()
+    return {'thread_id': match.group(1), 'title': title, 'url': thread_url}, page
+
+
+def _replay_page(args) -> list:
+    """Worker: parse one cached page, returns its documents"""
+    try:
+        from .page_parser import parse_thread_page
+    except ImportError:  # running as a script: python page_cache.py
+        from page_parser import parse_thread_page
+
+    html, thread, min_word_count, base_url, backend = args
+    parsed, _ = parse_thread_page(html, thread, min_word_count, base_url, backend)
+    return [doc for _, doc in parsed if doc]
+
+
+def main():
+    import argparse
+    from concurrent.futures import Future, ProcessPoolExecutor
+    from urllib.parse import urlsplit
+
+    try:
+        from .corpus_io import open_doc_writer
+    except ImportError:  # running as a script: python page_cache.py
+        from corpus_io import open_doc_writer
+
+    parser = argparse.ArgumentParser(description='Inspect or replay a raw page cache')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    stats_parser = commands.add_parser('stats', help='Show cache size and page counts')
+    stats_parser.add_argument('cache_dir')
+
+    replay_parser = commands.add_parser('replay', help='Parse every cached thread page into a corpus')
+    replay_parser.add_argument('cache_dir')
+    replay_parser.add_argument('output', help='Output .jsonl file or .parquet directory')
+    replay_parser.add_argument('--parser', choices=['bs4', 'lxml'], default='lxml')
+    replay_parser.add_argument('--min-words', type=int, default=30)
+    replay_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+
+    args = parser.parse_args()
+    cache = PageCache(args.cache_dir)
+
+    if args.command == 'stats':
+        stats = cache.stats()
+        print(f"📦 {stats['pages']:,} pages, {stats['blobs']:,} blobs, "
+              f"{stats['compressed_bytes'] / 1024 ** 2:,.1f} MB compressed")
+        return
+
+    def tasks():
+        for cached in cache.iter_pages('%/t/%'):
+            found = thread_from_page(cached.url, cached.text)
+            if found:
+                parts = urlsplit(cached.url)
+                yield cached.text, found[0], args.min_words, f"{parts.scheme}://{parts.netloc}", args.parser
+
+    output_format = 'parquet' if args.output.endswith('.parquet') else 'jsonl'
+    if os.path.dirname(args.output):
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+
+    start = time.time()
+    pages = docs = 0
+    # URL order keeps a thread's pages together, so duplicates (posts shifted
+    # between pages) only need to be looked for within the current thread
+    thread_id, seen = None, set()
+
+    def write_page(page_thread: str, future: Future):
+        nonlocal pages, docs, thread_id, seen
+        if page_thread != thread_id:
+            thread_id, seen = page_thread, set()
+        pages += 1
+        for doc in future.result():
+            if doc['doc_id'] not in seen:
+                seen.add(doc['doc_id'])
+                writer.write(doc)
+                docs += 1
+
+    with open_doc_writer(output_format, args.output) as writer, \
+            ProcessPoolExecutor(max_workers=args.workers) as pool:
+        # Bounded window of pages in flight, written back in URL order
+        pending: Deque[Tuple[str, Future]] = deque()
+        max_pending = max(args.workers, 1) * 16
+        for task in tasks():
+            pending.append((task[1]['thread_id'], pool.submit(_replay_page, task)))
+            if len(pending) >= max_pending:
+                write_page(*pending.popleft())
+        while pending:
+            write_page(*pending.popleft())
+
+    duration = max(time.time() - start, 1e-9)
+    print(f"✅ Replayed {pages:,} pages -> {docs:,} docs in {duration:.1f}s "
+          f"({pages / duration:,.0f} pages/s, {docs / duration:,.0f} docs/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+XenForo thread-page parser
+
+Pure functions (no crawler state) so pages can be parsed in a separate
+process: the crawler's fetch workers hand raw HTML to a ParserPool and get
+back plain document dicts. Checkpoint dedup happens in the crawler after
+parsing, since the checkpoint lives in the main process.
+
+Two backends produce identical documents:
+- bs4:  BeautifulSoup + CSS selectors (reference implementation)
+- lxml: lxml.html + precompiled XPath, no soup objects and no tree edits
+"""
+
+import logging
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from threading import BoundedSemaphore
+from typing import Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
+
+try:
+    from .text_normalizer import normalize_text
+except ImportError:  # running as a script: python page_parser.py
+    from text_normalizer import normalize_text
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://voz.vn"
+
+PARSER_BACKENDS = ('bs4', 'lxml')
+
+
+def _has_class(name: str) -> str:
+    """XPath predicate matching one token of the class attribute (like CSS .name)"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# Precompiled XPath for the lxml backend, mirroring the bs4 CSS selectors
+XP_POSTS = etree.XPath(f"//article[{_has_class('message--post')}]")
+XP_CONTENT = etree.XPath(f".//div[{_has_class('bbWrapper')}]")
+XP_QUOTE = etree.XPath(f".//blockquote[{_has_class('bbCodeBlock--quote')}]")
+XP_QUOTE_TITLE = etree.XPath(f".//div[{_has_class('bbCodeBlock-title')}]")
+XP_QUOTE_CONTENT = etree.XPath(f".//div[{_has_class('bbCodeBlock-content')}]")
+XP_AUTHOR = etree.XPath(f".//*[{_has_class('message-name')}]//*[{_has_class('username')}]")
+XP_TIME = etree.XPath(f".//*[{_has_class('message-attribution-main')}]//time")
+XP_PAGE_LINKS = etree.XPath(f"//ul[{_has_class('pageNav-main')}]//li[{_has_class('pageNav-page')}]//a")
+XP_TEXT = etree.XPath(".//text()")
+
+# BeautifulSoup's get_text() skips strings inside these tags
+NON_TEXT_TAGS = ('script', 'style', 'template', 'rt', 'rp')
+XP_NON_TEXT = etree.XPath('|'.join(f'.//{tag}' for tag in NON_TEXT_TAGS))
+
+
+def clean_content(text: str, expand: bool = True) -> str:
+    """Clean and normalize content (NFC, URLs/entities, whitespace, teencode), see text_normalizer"""
+    return normalize_text(text, expand)
+
+
+def simple_word_count(text: str) -> int:
+    """Simple word count using whitespace split (fast)"""
+    words = text.lower().split()
+    # Filter: min 2 chars, not pure digits
+    return sum(1 for w in words if len(w) >= 2 and not w.isdigit())
+
+
+def parse_post(post_elem, thread_id: str, thread_title: str,
+               base_url: str = BASE_URL) -> Optional[Tuple[str, dict]]:
+    """Parse a single post. Returns (post_id, doc) or None"""
+    try:
+        post_id = post_elem.get('data-content', '').replace('post-', '')
+
+        content_elem = post_elem.select_one('div.bbWrapper')
+        if not content_elem:
+            return None
+
+        # Handle quotes
+        has_quote = False
+        quoted_author = None
+        quoted_content = None
+
+        quote_elem = content_elem.select_one('blockquote.bbCodeBlock--quote')
+        if quote_elem:
+            has_quote = True
+            quote_title = quote_elem.select_one('div.bbCodeBlock-title')
+            if quote_title:
+                quoted_author = quote_title.get_text(strip=True).replace(' said:', '').replace(' nói:', '')
+            quote_content_elem = quote_elem.select_one('div.bbCodeBlock-content')
+            if quote_content_elem:
+                quoted_content = quote_content_elem.get_text(strip=True)[:500]  # Limit quote length
+            quote_elem.decompose()
+
+        content_raw = content_elem.get_text(separator=' ', strip=True)
+
+        author_elem = post_elem.select_one('.message-name .username')
+        author = author_elem.get_text(strip=True) if author_elem else "unknown"
+
+        time_elem = post_elem.select_one('.message-attribution-main time')
+        timestamp = time_elem.get('datetime', '') if time_elem else ""
+
+        return post_id, {
+            'doc_id': f"voz_t{thread_id}_p{post_id}",
+            'thread_id': f"t{thread_id}",
+            'thread_title': thread_title,
+            'content': content_raw,
+            'author': author,
+            'timestamp': timestamp,
+            'has_quote': has_quote,
+            'quoted_author': quoted_author,
+            'quoted_content': quoted_content,
+            'source': 'voz',
+            'url': f"{base_url}/p/{post_id}/"
+        }
+
+    except Exception as e:
+        logger.error(f"Error parsing post: {e}")
+        return None
+
+
+def _lxml_text(elem, separator: str = '', skip=None) -> str:
+    """
+    Equivalent of bs4 get_text(separator, strip=True) on an lxml element
+
+    Strings inside `skip` (and non-text tags like <script>) are left out,
+    which replaces bs4's decompose() of the quote without touching the tree.
+    """
+    excluded = set()
+    for root in XP_NON_TEXT(elem) + ([skip] if skip is not None else []):
+        excluded.update(root.iter())
+
+    parts = []
+    for text in XP_TEXT(elem):
+        if excluded:
+            owner = text.getparent()
+            if not text.is_text:
+                owner = owner.getparent()
+            if owner in excluded:
+                continue
+        text = text.strip()
+        if text:
+            parts.append(text)
+    return separator.join(parts)
+
+
+def parse_post_lxml(post_elem, thread_id: str, thread_title: str,
+                    base_url: str = BASE_URL) -> Optional[Tuple[str, dict]]:
+    """lxml version of parse_post, same output"""
+    try:
+        post_id = post_elem.get('data-content', '').replace('post-', '')
+
+        content_elems = XP_CONTENT(post_elem)
+        if not content_elems:
+            return None
+        content_elem = content_elems[0]
+
+        # Handle quotes
+        has_quote = False
+        quoted_author = None
+        quoted_content = None
+
+        quote_elems = XP_QUOTE(content_elem)
+        quote_elem = quote_elems[0] if quote_elems else None
+        if quote_elem is not None:
+            has_quote = True
+            quote_titles = XP_QUOTE_TITLE(quote_elem)
+            if quote_titles:
+                quoted_author = _lxml_text(quote_titles[0]).replace(' said:', '').replace(' nói:', '')
+            quote_contents = XP_QUOTE_CONTENT(quote_elem)
+            if quote_contents:
+                quoted_content = _lxml_text(quote_contents[0])[:500]
+
+        content_raw = _lxml_text(content_elem, ' ', skip=quote_elem)
+
+        author_elems = XP_AUTHOR(post_elem)
+        author = _lxml_text(author_elems[0]) if author_elems else "unknown"
+
+        time_elems = XP_TIME(post_elem)
+        timestamp = time_elems[0].get('datetime', '') if time_elems else ""
+
+        return post_id, {
+            'doc_id': f"voz_t{thread_id}_p{post_id}",
+            'thread_id': f"t{thread_id}",
+            'thread_title': thread_title,
+            'content': content_raw,
+            'author': author,
+            'timestamp': timestamp,
+            'has_quote': has_quote,
+            'quoted_author': quoted_author,
+            'quoted_content': quoted_content,
+            'source': 'voz',
+            'url': f"{base_url}/p/{post_id}/"
+        }
+
+    except Exception as e:
+        logger.error(f"Error parsing post: {e}")
+        return None
+
+
+def parse_last_page(soup) -> int:
+    """Read the thread's last page number from the XenForo page nav"""
+    last_page = 1
+    for link in soup.select('ul.pageNav-main li.pageNav-page a'):
+        text = link.get_text(strip=True)
+        if text.isdigit():
+            last_page = max(last_page, int(text))
+    return last_page
+
+
+def parse_last_page_lxml(root) -> int:
+    """lxml version of parse_last_page"""
+    last_page = 1
+    for link in XP_PAGE_LINKS(root):
+        text = _lxml_text(link)
+        if text.isdigit():
+            last_page = max(last_page, int(text))
+    return last_page
+
+
+def _parse_posts_bs4(html: str, thread: dict, base_url: str) -> Tuple[list, int]:
+    soup = BeautifulSoup(html, 'lxml')
+    posts = soup.select('article.message--post')
+    if not posts:
+        return [], 0
+
+    parsed = [parse_post(post, thread['thread_id'], thread['title'], base_url) for post in posts]
+    return parsed, parse_last_page(soup)
+
+
+def _parse_posts_lxml(html: str, thread: dict, base_url: str) -> Tuple[list, int]:
+    try:
+        root = lxml.html.document_fromstring(html)
+    except ValueError:  # str input with an XML encoding declaration
+        root = lxml.html.document_fromstring(html.encode('utf-8'))
+    except etree.ParserError:  # empty document
+        return [], 0
+
+    posts = XP_POSTS(root)
+    if not posts:
+        return [], 0
+
+    parsed = [parse_post_lxml(post, thread['thread_id'], thread['title'], base_url) for post in posts]
+    return parsed, parse_last_page_lxml(root)
+
+
+def parse_thread_page(html: str, thread: dict, min_word_count: int,
+                      base_url: str = BASE_URL,
+                      backend: str = 'bs4',
+                      timings: Optional[Dict[str, float]] = None) -> Tuple[List[Tuple[str, Optional[dict]]], int]:
+    """
+    Parse one thread page with the given backend ('bs4' or 'lxml')
+
+    Returns ([(post_id, doc), ...], last_page_number). doc is None for posts
+    below min_word_count; they are still returned so the caller can mark
+    them crawled. last_page_number is 0 when the page has no posts.
+    When `timings` is given, seconds spent parsing HTML and cleaning text
+    are added to its 'parse' and 'clean' entries.
+    """
+    start = time.perf_counter()
+    if backend == 'lxml':
+        posts, last_page = _parse_posts_lxml(html, thread, base_url)
+    else:
+        posts, last_page = _parse_posts_bs4(html, thread, base_url)
+    parsed_at = time.perf_counter()
+
+    results = []
+    for parsed in posts:
+        if not parsed:
+            continue
+
+        post_id, doc = parsed
+        # Check quality with simple word count (fast), on the words as
+        # written: teencode expansions add tokens
+        content_clean = clean_content(doc['content'], expand=False)
+        word_count = simple_word_count(content_clean)
+
+        if word_count >= min_word_count:
+            doc['content_clean'] = clean_content(content_clean)
+            doc['word_count'] = word_count
+            doc['forum'] = thread.get('forum')
+            results.append((post_id, doc))
+        else:
+            results.append((post_id, None))
+
+    if timings is not None:
+        timings['parse'] = timings.get('parse', 0.0) + parsed_at - start
+        timings['clean'] = timings.get('clean', 0.0) + time.perf_counter() - parsed_at
+    return results, last_page
+
+
+def parse_thread_page_timed(html: str, thread: dict, min_word_count: int,
+                            base_url: str = BASE_URL, backend: str = 'bs4'):
+    """parse_thread_page for worker processes: (results, last_page, {'parse': s, 'clean': s})"""
+    timings: Dict[str, float] = {}
+    results, last_page = parse_thread_page(html, thread, min_word_count, base_url, backend, timings)
+    return results, last_page, timings
+
+
+class ParserPool:
+    """
+    Process-pool parsing stage
+
+    Fetchers submit raw HTML and wait on the returned future (which releases
+    the GIL) for (results, last_page, timings), see parse_thread_page_timed.
+    At most `max_pending` pages are queued or being parsed; further submits
+    block, so fetchers slow down instead of piling HTML up in memory.
+    """
+
+    def __init__(self, num_workers: int, max_pending: int = 0):
+        self.num_workers = num_workers
+        self.max_pending = max_pending or num_workers * 4
+        self.executor = ProcessPoolExecutor(max_workers=num_workers)
+        self._slots = BoundedSemaphore(self.max_pending)
+
+    def submit(self, html: str, thread: dict, min_word_count: int,
+               base_url: str = BASE_URL, backend: str = 'bs4') -> Future:
+        """Queue a page for parsing, blocking while the queue is full"""
+        self._slots.acquire()
+        try:
+            future = self.executor.submit(parse_thread_page_timed, html, thread, min_word_count,
+                                          base_url, backend)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self):
+        self.executor.shutdown()
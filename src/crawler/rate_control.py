@@ -0,0 +1,218 @@
+"""
+Adaptive request pacing shared by all fetch workers
+
+One RateController per crawler replaces per-thread sleeps (a fixed random
+delay after every request, 30s after a 429, 5s after a Cloudflare
+challenge) with global feedback control:
+
+- pacing: a token bucket (GCRA form) spaces request starts 1/rate apart,
+  allowing `burst` back-to-back requests
+- concurrency: at most `concurrency` requests in flight
+- AIMD: every healthy response raises the rate by ~`increase` req/s per
+  second and the concurrency by one per window; a 429, challenge or
+  server error cuts both by `decrease` (at most once per `cooldown`)
+- latency: while the smoothed latency is above `latency_slowdown` times
+  the best seen, the controller stops increasing (the server is queueing)
+- backoff: a 429 or challenge pauses *all* workers once (Retry-After when
+  the server sends it) instead of each worker sleeping on its own
+
+Workers call acquire() (or `await acquire_async()`) before a request and
+release(outcome, latency) after it. Reported latencies also feed a
+quantile sketch, so snapshot() carries p50/p99 fetch latency.
+"""
+
+import asyncio
+import time
+from threading import Condition
+from typing import Optional
+
+try:
+    from .sketches import QuantileSketch
+except ImportError:  # running as a script
+    from sketches import QuantileSketch
+
+OK = 'ok'                  # server answered normally (including 404 etc.)
+THROTTLED = 'throttled'    # 429 Too Many Requests
+CHALLENGE = 'challenge'    # Cloudflare "Just a moment" page
+ERROR = 'error'            # 5xx or connection error
+
+OUTCOMES = (OK, THROTTLED, CHALLENGE, ERROR)
+
+
+class RateController:
+    """AIMD rate and concurrency controller with token-bucket pacing"""
+
+    def __init__(self,
+                 initial_rate: float = 10.0,
+                 min_rate: float = 0.5,
+                 max_rate: float = 100.0,
+                 initial_concurrency: int = 8,
+                 max_concurrency: int = 64,
+                 burst: int = 1,
+                 increase: float = 1.0,
+                 decrease: float = 0.5,
+                 cooldown: float = 5.0,
+                 throttle_backoff: float = 30.0,
+                 challenge_backoff: float = 5.0,
+                 latency_slowdown: float = 2.0,
+                 adaptive: bool = True):
+        """
+        Args:
+            initial_rate: Starting requests per second
+            min_rate: Lower bound for the rate
+            max_rate: Upper bound for the rate
+            initial_concurrency: Starting number of requests in flight
+            max_concurrency: Upper bound for requests in flight
+            burst: Requests that may start back-to-back (bucket size)
+            increase: Additive increase, req/s gained per second of healthy responses
+            decrease: Multiplicative decrease factor on throttling/errors
+            cooldown: Min seconds between two decreases
+            throttle_backoff: Global pause after a 429 without Retry-After
+            challenge_backoff: Global pause after a Cloudflare challenge
+            latency_slowdown: Stop increasing above this multiple of the best latency
+            adaptive: False keeps rate and concurrency fixed (pacing and backoff only)
+        """
+        self.rate = float(initial_rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.concurrency = max(1, min(initial_concurrency, max_concurrency))
+        self.max_concurrency = max_concurrency
+        self.burst = max(1, burst)
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.throttle_backoff = throttle_backoff
+        self.challenge_backoff = challenge_backoff
+        self.latency_slowdown = latency_slowdown
+        self.adaptive = adaptive
+
+        self._cond = Condition()
+        self._in_flight = 0
+        self._tat = 0.0             # theoretical arrival time of the next request
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._window_successes = 0
+
+        self.latency_ewma: Optional[float] = None
+        self.best_latency: Optional[float] = None
+        self.latencies = QuantileSketch()
+        self.counts = {outcome: 0 for outcome in OUTCOMES}
+
+    def _reserve(self, now: float):
+        """
+        Try to take a concurrency slot and a token (caller holds the lock)
+
+        Returns (True, start_delay) on success, (False, wait_hint) when the
+        caller has to wait; a wait_hint of None means until a release().
+        """
+        if now < self._paused_until:
+            return False, self._paused_until - now
+        if self._in_flight >= self.concurrency:
+            return False, None
+
+        self._in_flight += 1
+        interval = 1.0 / self.rate
+        tat = max(self._tat, now)
+        start = max(now, tat - (self.burst - 1) * interval)
+        self._tat = tat + interval
+        return True, start - now
+
+    def acquire(self):
+        """Block until this thread may send a request"""
+        with self._cond:
+            while True:
+                ok, delay = self._reserve(time.monotonic())
+                if ok:
+                    break
+                self._cond.wait(timeout=delay)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """acquire() for coroutines, never blocks the event loop"""
+        while True:
+            with self._cond:
+                ok, delay = self._reserve(time.monotonic())
+            if ok:
+                break
+            await asyncio.sleep(delay if delay is not None else 0.01)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def release(self, outcome: str = OK, latency: Optional[float] = None,
+                retry_after: Optional[float] = None):
+        """
+        Report a finished request and free its slot
+
+        Args:
+            outcome: OK, THROTTLED, CHALLENGE or ERROR
+            latency: Seconds the request took (OK responses feed the latency signal)
+            retry_after: Server's Retry-After in seconds, for THROTTLED
+        """
+        with self._cond:
+            now = time.monotonic()
+            self._in_flight -= 1
+            self.counts[outcome] += 1
+
+            if outcome == OK:
+                if latency is not None:
+                    self._observe_latency(latency)
+                if self.adaptive and not self._congested():
+                    self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+                    self._window_successes += 1
+                    if self._window_successes >= self.concurrency:
+                        self._window_successes = 0
+                        self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            else:
+                if outcome == THROTTLED:
+                    pause = retry_after if retry_after is not None else self.throttle_backoff
+                elif outcome == CHALLENGE:
+                    pause = self.challenge_backoff
+                else:
+                    pause = 0
+                self._paused_until = max(self._paused_until, now + pause)
+
+                if self.adaptive and now - self._last_decrease >= self.cooldown:
+                    self._last_decrease = now
+                    self._window_successes = 0
+                    self.rate = max(self.min_rate, self.rate * self.decrease)
+                    self.concurrency = max(1, int(self.concurrency * self.decrease))
+
+            self._cond.notify_all()
+
+    def _observe_latency(self, latency: float):
+        self.latencies.add(latency)
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma += 0.1 * (latency - self.latency_ewma)
+        if self.best_latency is None or self.latency_ewma < self.best_latency:
+            self.best_latency = self.latency_ewma
+
+    def _congested(self) -> bool:
+        return (self.best_latency is not None
+                and self.latency_ewma > self.latency_slowdown * self.best_latency)
+
+    def snapshot(self) -> dict:
+        """Current controller state for logs and stats"""
+        with self._cond:
+            return {
+                'rate': round(self.rate, 2),
+                'concurrency': self.concurrency,
+                'in_flight': self._in_flight,
+                'latency_ms': round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+                'latency_p50_ms': round(self.latencies.quantile(0.5) * 1000, 1),
+                'latency_p99_ms': round(self.latencies.quantile(0.99) * 1000, 1),
+                'paused_for': round(max(0.0, self._paused_until - time.monotonic()), 1),
+                'responses': dict(self.counts),
+            }
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header in seconds (HTTP-date values are ignored)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
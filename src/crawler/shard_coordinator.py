@@ -0,0 +1,232 @@
+"""
+Sharded crawl coordinator
+
+A shard `i/N` (0 <= i < N) owns a disjoint slice of the forum listing:
+- N <= number of forums: whole forums, round-robin (forum f -> shard f % N)
+- N >  number of forums: each forum is shared by the shards s with
+  s % F == f, which stripe its listing pages (page p -> the group member
+  (p - 1) % group_size)
+
+Every shard has its own checkpoint directory and output file
+(`voz_1m.jsonl` -> `voz_1m.shard-2-of-8.jsonl`), so shards never share
+state and can run as separate processes or on separate machines:
+
+    python voz_crawler_1m.py --shard 0/4 --target 250000
+    ...
+    python voz_crawler_1m.py --shard 3/4 --target 250000
+
+A thread bumped to another listing page while shards are crawling can be
+seen by two shards; `merge` drops those duplicates (by doc_id, optionally
+also near duplicates) while concatenating the shard outputs.
+
+Local coordinator mode runs all shards as processes, then merges:
+
+    python shard_coordinator.py run --shards 8 --target 1000000 -- --workers 10
+    python shard_coordinator.py merge data/voz_1m.jsonl data/voz_1m.shard-*.jsonl
+"""
+
+import glob
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    from .checkpoint_store import IntIdSet, to_int_id
+    from .corpus_io import iter_documents, open_doc_writer
+    from .near_dup import NearDuplicateFilter
+except ImportError:  # running as a script: python shard_coordinator.py
+    from checkpoint_store import IntIdSet, to_int_id
+    from corpus_io import iter_documents, open_doc_writer
+    from near_dup import NearDuplicateFilter
+
+SHARD_RE = re.compile(r'^(\d+)/(\d+)$')
+
+CRAWLER_SCRIPTS = {
+    '1m': 'voz_crawler_1m.py',
+    'lightning': 'voz_crawler_lightning.py',
+}
+
+
+class PageSlice(NamedTuple):
+    """Listing pages p with (p - 1) % stride == offset"""
+    offset: int = 0
+    stride: int = 1
+
+    def owns(self, page: int) -> bool:
+        return (page - 1) % self.stride == self.offset
+
+    def first(self, start: int) -> int:
+        """First owned page >= start"""
+        return start + (self.offset - (start - 1)) % self.stride
+
+    def pages(self, start: int, count: int) -> range:
+        """`count` owned pages from `start` on"""
+        first = self.first(start)
+        return range(first, first + count * self.stride, self.stride)
+
+
+class ShardSpec:
+    """Shard i of N (the default 0/1 is an unsharded crawl)"""
+
+    def __init__(self, index: int = 0, count: int = 1):
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"Invalid shard {index}/{count}: need 0 <= i < N")
+        self.index = index
+        self.count = count
+
+    @classmethod
+    def parse(cls, spec: Optional[str]) -> 'ShardSpec':
+        """Parse an 'i/N' CLI value (None -> unsharded)"""
+        if not spec:
+            return cls()
+        match = SHARD_RE.match(spec.strip())
+        if not match:
+            raise ValueError(f"Invalid shard '{spec}': expected i/N, e.g. 0/4")
+        return cls(int(match.group(1)), int(match.group(2)))
+
+    @property
+    def is_sharded(self) -> bool:
+        return self.count > 1
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+    def path(self, path: str) -> str:
+        """Per-shard variant of an output/checkpoint path (unchanged when unsharded)"""
+        if not self.is_sharded:
+            return path
+        root, ext = os.path.splitext(path)
+        return f"{root}.shard-{self.index}-of-{self.count}{ext}"
+
+    def assign(self, forums: Sequence) -> List[Tuple[object, PageSlice]]:
+        """Forums (keys) owned by this shard, each with the listing pages it crawls"""
+        num_forums = len(forums)
+        if self.count <= num_forums:
+            return [(forum, PageSlice()) for i, forum in enumerate(forums)
+                    if i % self.count == self.index]
+
+        forum_idx = self.index % num_forums
+        group_size = len(range(forum_idx, self.count, num_forums))
+        return [(forums[forum_idx], PageSlice(self.index // num_forums, group_size))]
+
+
+def _existing_output(path: str) -> Optional[str]:
+    """A shard output as written by the crawler (JSONL file or Parquet directory)"""
+    candidates = [path]
+    if path.endswith('.jsonl'):
+        candidates.append(path[:-len('.jsonl')] + '.parquet')
+    for candidate in candidates:
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def merge_outputs(inputs: Sequence[str], output: str, near_dup_distance: int = 0) -> dict:
+    """
+    Concatenate shard outputs into one corpus, dropping duplicate doc_ids
+
+    The output format follows the extension (.parquet directory or JSONL).
+    Returns counts: read, written, duplicates, near_duplicates.
+    """
+    output_format = 'parquet' if output.endswith('.parquet') else 'jsonl'
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+
+    seen = IntIdSet()
+    near_dup = NearDuplicateFilter(max_distance=near_dup_distance) if near_dup_distance > 0 else None
+    counts = {'read': 0, 'written': 0, 'duplicates': 0, 'near_duplicates': 0}
+
+    with open_doc_writer(output_format, output) as writer:
+        for path in inputs:
+            for doc in iter_documents(path):
+                counts['read'] += 1
+                if not seen.add(to_int_id(doc['doc_id'])):
+                    counts['duplicates'] += 1
+                    continue
+                if near_dup is not None and near_dup.is_duplicate(doc.get('content_clean') or doc.get('content', '')):
+                    counts['near_duplicates'] += 1
+                    continue
+                writer.write(doc)
+                counts['written'] += 1
+
+    return counts
+
+
+def run_local(num_shards: int, target: int, output: str, crawler: str = '1m',
+              crawler_args: Sequence[str] = (), merge: bool = True,
+              near_dup_distance: int = 0) -> int:
+    """Run every shard as a local process, then merge their outputs. Returns exit code"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), CRAWLER_SCRIPTS[crawler])
+    per_shard = -(-target // num_shards)
+
+    processes = []
+    for index in range(num_shards):
+        shard = ShardSpec(index, num_shards)
+        cmd = [sys.executable, script, '--shard', str(shard),
+               '--target', str(per_shard), '--output', output, *crawler_args]
+        print(f"🚀 Shard {shard}: {' '.join(cmd[1:])}")
+        processes.append((shard, subprocess.Popen(cmd)))
+
+    failed = []
+    for shard, process in processes:
+        if process.wait() != 0:
+            failed.append(str(shard))
+    if failed:
+        print(f"❌ Shards failed: {', '.join(failed)} (rerun them, they resume from their checkpoints)")
+        return 1
+
+    if merge:
+        inputs = [_existing_output(ShardSpec(i, num_shards).path(output)) for i in range(num_shards)]
+        inputs = [path for path in inputs if path]
+        start = time.time()
+        counts = merge_outputs(inputs, output, near_dup_distance)
+        print(f"✅ Merged {len(inputs)} shards -> {output}: {counts['written']:,} docs "
+              f"({counts['duplicates']:,} duplicates, {counts['near_duplicates']:,} near duplicates, "
+              f"{time.time() - start:.0f}s)")
+    return 0
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run and merge sharded Voz crawls')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Run N shards as local processes, then merge')
+    run_parser.add_argument('--shards', '-n', type=int, default=os.cpu_count() or 1,
+                            help='Number of shard processes (default: CPU count)')
+    run_parser.add_argument('--target', '-t', type=int, default=1000000, help='Total target documents')
+    run_parser.add_argument('--output', '-o', default='data/voz_1m.jsonl', help='Merged output path')
+    run_parser.add_argument('--crawler', choices=list(CRAWLER_SCRIPTS), default='1m')
+    run_parser.add_argument('--no-merge', action='store_true', help='Leave the shard outputs unmerged')
+    run_parser.add_argument('--near-dup', type=int, default=0, metavar='BITS',
+                            help='Also drop near duplicates across shards when merging')
+    run_parser.add_argument('crawler_args', nargs=argparse.REMAINDER,
+                            help='Extra crawler arguments after --')
+
+    merge_parser = commands.add_parser('merge', help='Merge shard outputs into one deduplicated corpus')
+    merge_parser.add_argument('output', help='Merged output (.jsonl file or .parquet directory)')
+    merge_parser.add_argument('inputs', nargs='+', help='Shard outputs (globs allowed)')
+    merge_parser.add_argument('--near-dup', type=int, default=0, metavar='BITS',
+                              help='Also drop near duplicates within BITS SimHash distance')
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        crawler_args = [arg for arg in args.crawler_args if arg != '--']
+        sys.exit(run_local(args.shards, args.target, args.output, args.crawler,
+                           crawler_args, not args.no_merge, args.near_dup))
+
+    inputs = []
+    for pattern in args.inputs:
+        inputs.extend(sorted(glob.glob(pattern)) or [pattern])
+    counts = merge_outputs(inputs, args.output, args.near_dup)
+    print(f"✅ {counts['read']:,} docs from {len(inputs)} shards -> {counts['written']:,} written "
+          f"({counts['duplicates']:,} duplicates, {counts['near_duplicates']:,} near duplicates)")
+
+
+if __name__ == "__main__":
+    main()
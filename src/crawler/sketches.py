@@ -0,0 +1,174 @@
+"""
+Streaming sketches for crawl statistics
+
+Fixed-memory replacements for the per-document lists and sets that
+CrawlStatistics used to grow without bound:
+
+- QuantileSketch:  log-bucketed histogram (DDSketch style), quantiles with
+                   bounded relative error; a few hundred buckets cover any
+                   realistic doc length
+- HyperLogLog:     distinct counts (authors, threads, vocabulary) in
+                   2**precision one-byte registers, ~0.8% error at p=14
+- SpaceSaving:     top-k heavy hitters (word frequencies) with k counters
+
+All updates are O(1) (SpaceSaving amortized O(log k)) and all queries
+cost a function of the sketch size, never of the number of items seen.
+
+HyperLogLog and SpaceSaving hash with Python's built-in hash(), so
+sketches are only comparable within one process (like near_dup).
+"""
+
+import heapq
+import math
+from typing import Dict, Hashable, List, Optional, Tuple
+
+MASK64 = (1 << 64) - 1
+
+
+class QuantileSketch:
+    """Quantiles of non-negative numbers with relative accuracy `relative_accuracy`"""
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, value: float):
+        self.count += 1
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if value <= 0:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+
+    def quantile(self, q: float) -> float:
+        """Value at quantile q (0..1); 0 for an empty sketch"""
+        if not self.count:
+            return 0
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if rank < seen:
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class HyperLogLog:
+    """Approximate distinct counter"""
+
+    def __init__(self, precision: int = 14):
+        self.precision = precision
+        self.num_registers = 1 << precision
+        self._registers = bytearray(self.num_registers)
+        self._rank_bits = 64 - precision
+        self._rank_mask = (1 << self._rank_bits) - 1
+
+        # Maintained incrementally so count() does not scan the registers
+        self._inverse_sum = float(self.num_registers)  # sum of 2**-register
+        self._zeros = self.num_registers
+
+        m = self.num_registers
+        if m >= 128:
+            self._alpha = 0.7213 / (1 + 1.079 / m)
+        else:
+            self._alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.673)
+
+    def add(self, value: Hashable):
+        h = hash(value) & MASK64
+        index = h >> self._rank_bits
+        rank = self._rank_bits - (h & self._rank_mask).bit_length() + 1
+        old = self._registers[index]
+        if rank > old:
+            self._registers[index] = rank
+            self._inverse_sum += 2.0 ** -rank - 2.0 ** -old
+            if old == 0:
+                self._zeros -= 1
+
+    def count(self) -> int:
+        m = self.num_registers
+        estimate = self._alpha * m * m / self._inverse_sum
+        if estimate <= 2.5 * m and self._zeros:
+            # Small range correction (linear counting)
+            estimate = m * math.log(m / self._zeros)
+        return int(round(estimate))
+
+    def __len__(self) -> int:
+        return self.count()
+
+
+class SpaceSaving:
+    """
+    Top-k frequent items with k counters (Metwally et al.)
+
+    An unseen item replaces the current minimum and inherits its count, so
+    counts are overestimates by at most that inherited `error`. Items
+    with a true frequency above total/k are guaranteed to be tracked.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self._counts: Dict[Hashable, int] = {}
+        self._errors: Dict[Hashable, int] = {}
+        # One (count, seq, item) entry per tracked item; an entry goes stale
+        # when the item's count grows and is refreshed lazily on eviction
+        self._heap: List[Tuple[int, int, Hashable]] = []
+        self._seq = 0
+        self.total = 0
+
+    def _push(self, item: Hashable, count: int):
+        self._seq += 1
+        heapq.heappush(self._heap, (count, self._seq, item))
+
+    def add(self, item: Hashable, count: int = 1):
+        self.total += count
+        counts = self._counts
+        if item in counts:
+            counts[item] += count
+            return
+        if len(counts) < self.capacity:
+            counts[item] = count
+            self._errors[item] = 0
+            self._push(item, count)
+            return
+
+        # Evict the item with the smallest current count
+        while True:
+            entry_count, _, victim = self._heap[0]
+            current = counts[victim]
+            if current == entry_count:
+                break
+            heapq.heapreplace(self._heap, (current, self._seq + 1, victim))
+            self._seq += 1
+        heapq.heappop(self._heap)
+        del counts[victim]
+        del self._errors[victim]
+
+        counts[item] = current + count
+        self._errors[item] = current
+        self._push(item, current + count)
+
+    def top(self, n: int) -> List[Tuple[Hashable, int]]:
+        """n most frequent items as (item, estimated count)"""
+        return heapq.nlargest(n, self._counts.items(), key=lambda x: x[1])
+
+    def error(self, item: Hashable) -> int:
+        return self._errors.get(item, 0)
+
+    def __len__(self) -> int:
+        return len(self._counts)
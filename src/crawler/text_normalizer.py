@@ -0,0 +1,214 @@
+"""
+Single-pass text normalizer for crawled posts and search queries
+
+Produces `content_clean` for both crawlers and normalizes query text for
+the indexer, so documents and queries agree:
+
+1. NFC normalization (Vietnamese diacritics as precomposed characters)
+2. URLs removed, HTML entities and zero-width characters dropped
+3. Whitespace collapsed
+4. Teencode, slang and abbreviations expanded next to the original token
+   ("ko" -> "ko không", "ae" -> "ae anh em"), so the written form stays
+   searchable; in positional indexes the expansion takes the token's
+   position (term_positions, phrase_terms)
+
+Steps 2-3 only run a regex when a cheap substring test says there is
+something to remove, and whitespace is collapsed by str.split(), which is
+several times faster than re.sub(r'\\s+'). Teencode entries are whole
+tokens, so the dictionary is compiled once into a hash table of every
+written form of each entry: lowercase, Capitalized and (for entries longer
+than two letters) UPPERCASE, bare or with common trailing punctuation
+("ko,", "Đc?"). One set test on the split tokens rejects texts without any
+teencode, and otherwise only the matching tokens are expanded. A token
+already followed by its expansion is left alone, so normalizing twice
+(crawler, then index build) changes nothing. Single letters ("k" after a price, "vitamin K") and short
+UPPERCASE tokens ("VS", "NG") have too many other readings and are never
+expanded.
+
+Usage:
+    from text_normalizer import normalize_text
+    normalize_text("Ko bik luôn, đc ko ae?")   # 'Ko không bik biết luôn, đc được ko không ae anh em?'
+
+    normalizer = TextNormalizer(load_expansions('slang.tsv'))   # extra entries
+"""
+
+import re
+import unicodedata
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+URL_RE = re.compile(r'https?://\S+')
+ENTITY_RE = re.compile(r'&\w+;')
+ZERO_WIDTH = ('\u200b', '\u200c', '\u200d', '\ufeff')
+
+# Punctuation that commonly sticks to the end of a token
+TRAILING_PUNCTUATION = (',', '.', '?', '!', ':', ';', '...', '..', '?!', '??', '!!', ')')
+END_PUNCTUATION = ',.?!:;)'
+
+# Recorded in index meta.json: bump whenever normalize() output changes
+# (rules or DEFAULT_EXPANSIONS), indexes built with another version must
+# be rebuilt for their queries to match
+NORMALIZER_VERSION = 2
+
+# Whole-token teencode / slang / abbreviation expansions (lowercase keys).
+# Only unambiguous forum usage: single letters ("k" = nghìn, "r", "z", "j")
+# and tokens with other common readings ("kg" = kilogram, "ms" =
+# milliseconds, "ck" = chuyển khoản, "dk" = đăng ký) are left alone.
+DEFAULT_EXPANSIONS: Dict[str, str] = {
+    # không
+    'ko': 'không', 'k0': 'không', 'khg': 'không', 'hok': 'không',
+    'hem': 'không', 'khong': 'không',
+    # được
+    'dc': 'được', 'đc': 'được', 'duoc': 'được',
+    # people
+    'ae': 'anh em', 'mn': 'mọi người', 'mng': 'mọi người', 'ng': 'người', 'ngta': 'người ta',
+    'ny': 'người yêu',
+    # common words
+    'ji': 'gì', 'zậy': 'vậy', 'rùi': 'rồi', 'ròi': 'rồi', 'oy': 'rồi',
+    'cx': 'cũng', 'cg': 'cũng', 'vs': 'với', 'lm': 'làm', 'trc': 'trước', 'nhìu': 'nhiều',
+    'bik': 'biết', 'bít': 'biết', 'bjk': 'biết', 'thik': 'thích', 'thjk': 'thích', 'iu': 'yêu',
+    'wá': 'quá', 'ntn': 'như thế nào', 'bnhiu': 'bao nhiêu', 'bh': 'bây giờ', 'bjo': 'bây giờ',
+    'bt': 'bình thường', 'sd': 'sử dụng', 'xl': 'xin lỗi', 'tks': 'cảm ơn', 'thks': 'cảm ơn',
+    'đt': 'điện thoại',
+    # places
+    'hn': 'hà nội', 'sg': 'sài gòn', 'hcm': 'hồ chí minh', 'tphcm': 'thành phố hồ chí minh',
+    'vn': 'việt nam', 'tp': 'thành phố',
+}
+
+
+def load_expansions(path: str) -> Dict[str, str]:
+    """Read extra expansions from a UTF-8 file of `token<TAB>expansion` lines (# comments)"""
+    expansions = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            token, _, expansion = line.partition('\t')
+            if expansion:
+                expansions[unicodedata.normalize('NFC', token.strip().lower())] = expansion.strip()
+    return expansions
+
+
+class TextNormalizer:
+    """NFC + URL/entity stripping + whitespace collapsing + teencode expansion"""
+
+    def __init__(self, expansions: Optional[Mapping[str, str]] = None, use_defaults: bool = True):
+        """
+        Args:
+            expansions: Extra token -> expansion entries (override the defaults)
+            use_defaults: Start from DEFAULT_EXPANSIONS
+        """
+        entries = dict(DEFAULT_EXPANSIONS) if use_defaults else {}
+        entries.update(expansions or {})
+
+        # Token as written (lowercase, Capitalized or UPPERCASE, bare or with
+        # trailing punctuation) -> (token + expansion, lowercase expansion)
+        self._table: Dict[str, Tuple[str, str]] = {}
+        # Lowercase term -> its expansion's terms, to find expansions in index terms
+        self._terms: Dict[str, Tuple[str, ...]] = {}
+        for token, expansion in entries.items():
+            token = unicodedata.normalize('NFC', token.lower())
+            expansion = unicodedata.normalize('NFC', expansion.lower())
+            if len(token) < 2:
+                continue
+            self._terms[token] = tuple(expansion.split())
+            variants = {token: expansion, token[0].upper() + token[1:]: expansion}
+            if len(token) > 2:
+                variants[token.upper()] = expansion.upper()
+            for written, written_expansion in variants.items():
+                self._table[written] = (f'{written} {written_expansion}', expansion)
+                for punctuation in TRAILING_PUNCTUATION:
+                    self._table.setdefault(written + punctuation,
+                                           (f'{written} {written_expansion}{punctuation}', expansion))
+
+    def normalize(self, text: str, expand: bool = True) -> str:
+        """Normalized text, '' for empty input (expand=False stops before teencode expansion)"""
+        if not text:
+            return ''
+        text = unicodedata.normalize('NFC', text)
+        if '://' in text:
+            text = URL_RE.sub('', text)
+        if '&' in text:
+            text = ENTITY_RE.sub(' ', text)
+        for char in ZERO_WIDTH:
+            if char in text:
+                text = text.replace(char, '')
+
+        tokens = text.split()
+        table = self._table
+        if expand and not table.keys().isdisjoint(tokens):
+            for i in [i for i, token in enumerate(tokens) if token in table]:
+                replacement, expansion = table[tokens[i]]
+                following = tokens[i + 1:i + 2 + expansion.count(' ')]
+                if ' '.join(following).lower().rstrip(END_PUNCTUATION) != expansion:
+                    tokens[i] = replacement
+        return ' '.join(tokens)
+
+    __call__ = normalize
+
+    def _expansions(self, terms: Sequence[str]) -> Dict[int, int]:
+        """Index of each term followed by its expansion -> number of expansion terms"""
+        table = self._terms
+        if table.keys().isdisjoint(terms):
+            return {}
+        spans = {}
+        for i, term in enumerate(terms):
+            expansion = table.get(term)
+            if expansion and tuple(terms[i + 1:i + 1 + len(expansion)]) == expansion:
+                spans[i] = len(expansion)
+        return spans
+
+    def term_positions(self, terms: Sequence[str]) -> List[int]:
+        """
+        Positions of the terms of normalized text
+
+        An expansion's terms share the position of the token they expand,
+        like synonyms, so they do not shift the tokens after it.
+        """
+        spans = self._expansions(terms)
+        if not spans:
+            return list(range(len(terms)))
+        positions = []
+        position = i = 0
+        while i < len(terms):
+            width = 1 + spans.get(i, 0)
+            positions.extend([position] * width)
+            position += 1
+            i += width
+        return positions
+
+    def phrase_terms(self, terms: Sequence[str]) -> List[Tuple[int, str]]:
+        """
+        (offset, term) a phrase of normalized text has to match
+
+        A token expanded to one word requires the expansion, which every
+        document indexes at that position whichever form it was written in
+        ("ko biết" and "không biết" both match "không" then "biết"). Longer
+        expansions require the token as written.
+        """
+        spans = self._expansions(terms)
+        phrase = []
+        i = 0
+        while i < len(terms):
+            width = spans.get(i, 0)
+            phrase.append((len(phrase), terms[i + 1] if width == 1 else terms[i]))
+            i += 1 + width
+        return phrase
+
+
+_default_normalizer = TextNormalizer()
+
+
+def normalize_text(text: str, expand: bool = True) -> str:
+    """Normalize with the default dictionary"""
+    return _default_normalizer.normalize(text, expand)
+
+
+def term_positions(terms: Sequence[str]) -> List[int]:
+    """TextNormalizer.term_positions with the default dictionary"""
+    return _default_normalizer.term_positions(terms)
+
+
+def phrase_terms(terms: Sequence[str]) -> List[Tuple[int, str]]:
+    """TextNormalizer.phrase_terms with the default dictionary"""
+    return _default_normalizer.phrase_terms(terms)
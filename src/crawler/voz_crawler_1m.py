@@ -15,64 +15,95 @@ import cloudscraper
 from bs4 import BeautifulSoup
 import json
 import time
-import random
 import os
 from datetime import datetime
 from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from threading import Lock, local
 import logging
-from collections import defaultdict
-from typing import Dict, List, Set, Optional, Tuple
-import pickle
+from typing import Dict, List, Optional, Tuple
 import hashlib
 
+try:
+    from .async_fetcher import AsyncFetcher
+    from .checkpoint_store import CheckpointStore, IntIdSet, Mark, migrate_pickle
+    from .frontier import ListingFrontier
+    from .metrics import Metrics, MetricsServer, SnapshotWriter
+    from .corpus_io import FSYNC_POLICIES, OUTPUT_FORMATS, open_doc_writer
+    from .near_dup import NearDuplicateFilter
+    from .page_cache import PageCache
+    from .page_parser import (PARSER_BACKENDS, ParserPool, clean_content,
+                              parse_thread_page, simple_word_count)
+    from .rate_control import CHALLENGE, ERROR, OK, THROTTLED, RateController, parse_retry_after
+    from .shard_coordinator import ShardSpec
+    from .sketches import HyperLogLog, QuantileSketch, SpaceSaving
+except ImportError:  # running as a script: python voz_crawler_1m.py
+    from async_fetcher import AsyncFetcher
+    from checkpoint_store import CheckpointStore, IntIdSet, Mark, migrate_pickle
+    from frontier import ListingFrontier
+    from metrics import Metrics, MetricsServer, SnapshotWriter
+    from corpus_io import FSYNC_POLICIES, OUTPUT_FORMATS, open_doc_writer
+    from near_dup import NearDuplicateFilter
+    from page_cache import PageCache
+    from page_parser import (PARSER_BACKENDS, ParserPool, clean_content,
+                             parse_thread_page, simple_word_count)
+    from rate_control import CHALLENGE, ERROR, OK, THROTTLED, RateController, parse_retry_after
+    from shard_coordinator import ShardSpec
+    from sketches import HyperLogLog, QuantileSketch, SpaceSaving
+
 # Tokenization is done in post-processing, not during crawl
 # This significantly speeds up the crawler
 
 
 class CrawlCheckpoint:
-    """Checkpoint manager for resume capability"""
+    """Checkpoint manager for resume capability (incremental CheckpointStore)"""
     
-    def __init__(self, checkpoint_path: str = 'data/crawl_checkpoint.pkl'):
+    def __init__(self, checkpoint_path: str = 'data/crawl_checkpoint'):
         self.checkpoint_path = checkpoint_path
-        self.crawled_threads: Set[str] = set()
-        self.crawled_posts: Set[str] = set()
+        self.legacy_path = checkpoint_path + '.pkl'  # pickled checkpoint of older versions
+        self.store = CheckpointStore(checkpoint_path, mark_names=('thread_marks',))
         self.total_docs = 0
         self.failed_urls: List[str] = []
         self.last_forum_page: Dict[str, int] = {}
+        self.output_offset: Optional[int] = None  # committed output size (bytes, or Parquet rows)
         self.last_save_time = datetime.now()
+    
+    @property
+    def crawled_threads(self) -> IntIdSet:
+        return self.store.sets['threads']
+    
+    @property
+    def crawled_posts(self) -> IntIdSet:
+        return self.store.sets['posts']
         
     def load(self) -> bool:
-        """Load checkpoint from disk"""
-        if os.path.exists(self.checkpoint_path):
-            try:
-                with open(self.checkpoint_path, 'rb') as f:
-                    data = pickle.load(f)
-                self.crawled_threads = data.get('crawled_threads', set())
-                self.crawled_posts = data.get('crawled_posts', set())
-                self.total_docs = data.get('total_docs', 0)
-                self.failed_urls = data.get('failed_urls', [])
-                self.last_forum_page = data.get('last_forum_page', {})
-                return True
-            except Exception as e:
-                logging.warning(f"Failed to load checkpoint: {e}")
+        """Load checkpoint from disk, migrating an old pickle checkpoint once"""
+        try:
+            data = self.store.load()
+            if data is None and os.path.exists(self.legacy_path):
+                logging.info(f"Migrating {self.legacy_path} -> {self.checkpoint_path}/")
+                data = migrate_pickle(self.legacy_path, self.store)
+            if data is None:
                 return False
-        return False
+            self.total_docs = data.get('total_docs', 0)
+            self.failed_urls = data.get('failed_urls', [])
+            self.last_forum_page = data.get('last_forum_page', {})
+            self.output_offset = data.get('output_offset')
+            return True
+        except Exception as e:
+            logging.warning(f"Failed to load checkpoint: {e}")
+            return False
     
     def save(self):
-        """Save checkpoint to disk"""
-        os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
-        data = {
-            'crawled_threads': self.crawled_threads,
-            'crawled_posts': self.crawled_posts,
+        """Save checkpoint to disk (only ids added since the last save are written)"""
+        self.store.commit({
             'total_docs': self.total_docs,
             'failed_urls': self.failed_urls,
             'last_forum_page': self.last_forum_page,
+            'output_offset': self.output_offset,
             'save_time': datetime.now().isoformat()
-        }
-        with open(self.checkpoint_path, 'wb') as f:
-            pickle.dump(data, f)
+        })
         self.last_save_time = datetime.now()
     
     def should_save(self, interval_seconds: int = 60) -> bool:
@@ -80,72 +111,122 @@ class CrawlCheckpoint:
         return (datetime.now() - self.last_save_time).seconds >= interval_seconds
     
     def is_thread_crawled(self, thread_id: str) -> bool:
-        return thread_id in self.crawled_threads
+        return self.store.contains('threads', thread_id)
     
     def is_post_crawled(self, post_id: str) -> bool:
-        return post_id in self.crawled_posts
+        return self.store.contains('posts', post_id)
     
     def mark_thread_crawled(self, thread_id: str):
-        self.crawled_threads.add(thread_id)
+        self.store.add('threads', thread_id)
     
     def mark_post_crawled(self, post_id: str):
-        self.crawled_posts.add(post_id)
+        self.store.add('posts', post_id)
+    
+    def get_thread_mark(self, thread_id: str) -> Optional[Mark]:
+        """High-water mark of a crawled thread (incremental recrawl)"""
+        return self.store.get_mark('thread_marks', thread_id)
+    
+    def set_thread_mark(self, thread_id: str, mark: Mark):
+        self.store.set_mark('thread_marks', thread_id, mark)
 
 
 class CrawlStatistics:
-    """Statistics collector for crawl insights"""
+    """
+    Statistics collector for crawl insights
     
-    def __init__(self):
+    Constant memory: doc lengths go into a quantile sketch, authors/threads/
+    vocabulary into HyperLogLog counters and word frequencies into a
+    Space-Saving top-k, so get_report() costs the same at 1M docs as at 1k.
+    Request and duplicate counters are read from the lock-free Metrics.
+    """
+    
+    TOKENS_PER_DOC = 100  # tokens per document fed to the word sketches
+    
+    def __init__(self, top_k: int = 1000, metrics: Optional[Metrics] = None):
         self.lock = Lock()
+        self.metrics = metrics or Metrics()
         self.total_docs = 0
         self.total_words = 0
-        self.word_freq: Dict[str, int] = defaultdict(int)
-        self.doc_lengths: List[int] = []
-        self.authors: Set[str] = set()
-        self.threads: Set[str] = set()
+        self.word_freq = SpaceSaving(top_k)
+        self.vocabulary = HyperLogLog()
+        self.doc_lengths = QuantileSketch()
+        self.authors = HyperLogLog()
+        self.threads = HyperLogLog()
         self.start_time = None
-        self.requests_made = 0
-        self.requests_failed = 0
-        self.duplicates_skipped = 0
+    
+    @property
+    def requests_made(self) -> int:
+        return self.metrics.counter('requests_made')
+    
+    @property
+    def requests_failed(self) -> int:
+        return self.metrics.counter('requests_failed')
+    
+    @property
+    def duplicates_skipped(self) -> int:
+        return self.metrics.counter('duplicates_skipped')
+    
+    @property
+    def duplicates_near_skipped(self) -> int:
+        return self.metrics.counter('duplicates_near_skipped')
+    
+    @property
+    def pages_not_modified(self) -> int:
+        return self.metrics.counter('pages_not_modified')
+    
+    def add_document(self, doc: dict, tokens: Optional[List[str]] = None):
+        """
+        Add document statistics
+        
+        Args:
+            doc: Document dict
+            tokens: Document tokens; defaults to the words of content_clean,
+                with the length taken from doc['word_count']
+        """
+        if tokens is None:
+            doc_len = doc.get('word_count', 0)
+            tokens = [w for w in doc.get('content_clean', '').lower().split()[:self.TOKENS_PER_DOC]
+                      if len(w) >= 2 and not w.isdigit()]
+        else:
+            doc_len = len(tokens)
+            tokens = tokens[:self.TOKENS_PER_DOC]
         
-    def add_document(self, doc: dict, tokens: List[str]):
-        """Add document statistics"""
         with self.lock:
             self.total_docs += 1
-            doc_len = len(tokens)
             self.total_words += doc_len
-            self.doc_lengths.append(doc_len)
+            self.doc_lengths.add(doc_len)
             self.authors.add(doc.get('author', 'unknown'))
             self.threads.add(doc.get('thread_id', ''))
             
-            # Word frequency (sample to save memory)
-            if self.total_docs <= 100000:  # Only track for first 100k
-                for token in tokens[:100]:  # Limit per doc
-                    self.word_freq[token] += 1
+            for token in tokens:
+                self.word_freq.add(token)
+                self.vocabulary.add(token)
     
     def get_report(self) -> dict:
-        """Generate statistics report"""
+        """Generate statistics report (approximate distinct counts and quantiles)"""
         with self.lock:
-            avg_length = sum(self.doc_lengths) / max(1, len(self.doc_lengths))
-            
-            # Get top words
-            top_words = sorted(self.word_freq.items(), key=lambda x: x[1], reverse=True)[:100]
+            avg_length = self.total_words / max(1, self.total_docs)
+            lengths = self.doc_lengths
             
             return {
                 'total_documents': self.total_docs,
                 'total_words': self.total_words,
-                'vocabulary_size': len(self.word_freq),
+                'vocabulary_size': self.vocabulary.count(),
                 'avg_doc_length': round(avg_length, 2),
-                'unique_authors': len(self.authors),
-                'unique_threads': len(self.threads),
+                'unique_authors': self.authors.count(),
+                'unique_threads': self.threads.count(),
                 'requests_made': self.requests_made,
                 'requests_failed': self.requests_failed,
+                'pages_not_modified': self.pages_not_modified,
                 'duplicates_skipped': self.duplicates_skipped,
-                'top_words': top_words[:50],
+                'duplicates_near_skipped': self.duplicates_near_skipped,
+                'top_words': self.word_freq.top(50),
                 'doc_length_distribution': {
-                    'min': min(self.doc_lengths) if self.doc_lengths else 0,
-                    'max': max(self.doc_lengths) if self.doc_lengths else 0,
-                    'median': sorted(self.doc_lengths)[len(self.doc_lengths)//2] if self.doc_lengths else 0
+                    'min': lengths.min or 0,
+                    'max': lengths.max or 0,
+                    'median': round(lengths.quantile(0.5)),
+                    'p90': round(lengths.quantile(0.9)),
+                    'p99': round(lengths.quantile(0.99))
                 }
             }
 
@@ -174,29 +255,134 @@ class VozProductionCrawler:
                  num_workers: int = 20,
                  delay_range: tuple = (0.1, 0.3),
                  checkpoint_interval: int = 60,
-                 min_word_count: int = 50):
+                 min_word_count: int = 50,
+                 engine: str = 'threads',
+                 max_connections: int = 500,
+                 per_host_limit: int = 64,
+                 parse_workers: int = 0,
+                 parser_backend: str = 'bs4',
+                 write_batch_size: int = 1000,
+                 flush_interval: float = 1.0,
+                 fsync_policy: str = 'commit',
+                 output_format: str = 'jsonl',
+                 row_group_size: int = 50000,
+                 near_dup_distance: int = 0,
+                 near_dup_capacity: int = 2000000,
+                 adaptive_rate: bool = True,
+                 max_rate: float = 200.0,
+                 shard: Optional[ShardSpec] = None,
+                 frontier_size: int = 500,
+                 incremental: bool = False,
+                 page_cache_dir: Optional[str] = None,
+                 page_cache_size: int = 20 * 1024 ** 3,
+                 metrics_port: int = 0,
+                 metrics_snapshot: Optional[str] = None,
+                 metrics_interval: float = 10.0):
         """
         Initialize production crawler
         
         Args:
             num_workers: Number of concurrent threads
-            delay_range: Random delay between requests
+            delay_range: Per-worker delay between requests, sets the starting request rate
             checkpoint_interval: Seconds between checkpoint saves
             min_word_count: Minimum words for quality filter
+            engine: 'threads' (cloudscraper per worker) or 'async' (shared aiohttp loop)
+            max_connections: Async engine - total pooled connections
+            per_host_limit: Async engine - concurrent connections per host
+            parse_workers: Parser processes (0 = parse inside the fetch workers; the CLI
+                defaults to the CPU count instead)
+            parser_backend: 'bs4' (BeautifulSoup) or 'lxml' (precompiled XPath, faster)
+            write_batch_size: Documents buffered by the writer before a write
+            flush_interval: Max seconds a document stays in the write buffer
+            fsync_policy: 'commit' (fsync with each checkpoint), 'flush' or 'never'
+            output_format: 'jsonl' file or 'parquet' directory of part files
+            row_group_size: Parquet rows per row group
+            near_dup_distance: SimHash bits for near-duplicate skipping (0 = off)
+            near_dup_capacity: Fingerprints kept by the near-duplicate filter
+            adaptive_rate: Adjust request rate/concurrency from 429s, challenges and latency
+            max_rate: Upper bound for the adaptive request rate (req/s)
+            shard: Crawl only this shard's forums/listing pages (own checkpoint and output)
+            frontier_size: Threads listed ahead of the workers (bounded queue)
+            incremental: Revisit crawled threads with new activity, fetching only pages
+                past their high-water mark
+            page_cache_dir: Keep raw pages here (compressed) and revalidate them with
+                conditional requests; replay with page_cache.py (None = off)
+            page_cache_size: Compressed size budget of the page cache in bytes
+            metrics_port: Serve Prometheus metrics on 127.0.0.1:<port>/metrics (0 = off)
+            metrics_snapshot: Append a JSON metrics snapshot to this file periodically
+            metrics_interval: Seconds between metrics snapshots
         """
+        if engine not in ('threads', 'async'):
+            raise ValueError(f"Unknown engine: {engine}")
+        if parser_backend not in PARSER_BACKENDS:
+            raise ValueError(f"Unknown parser backend: {parser_backend}")
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {output_format}")
+        
         self.num_workers = num_workers
         self.delay_range = delay_range
         self.checkpoint_interval = checkpoint_interval
         self.min_word_count = min_word_count
+        self.engine = engine
+        self.max_connections = max_connections
+        self.per_host_limit = per_host_limit
+        self.parse_workers = parse_workers
+        self.parser_backend = parser_backend
+        self.write_batch_size = write_batch_size
+        self.flush_interval = flush_interval
+        self.fsync_policy = fsync_policy
+        self.output_format = output_format
+        self.row_group_size = row_group_size
+        self.shard = shard or ShardSpec()
+        self.frontier_size = frontier_size
+        self.incremental = incremental
+        self.metrics_port = metrics_port
+        self.metrics_snapshot = metrics_snapshot
+        self.metrics_interval = metrics_interval
+        
+        # Near-duplicate filter, fed from the writer stage (single thread)
+        self.near_dup: Optional[NearDuplicateFilter] = None
+        if near_dup_distance > 0:
+            self.near_dup = NearDuplicateFilter(max_distance=near_dup_distance,
+                                                capacity=near_dup_capacity)
+        
+        # Raw HTML cache under _get_page (per shard, like the checkpoint)
+        self.page_cache: Optional[PageCache] = None
+        if page_cache_dir:
+            self.page_cache = PageCache(self.shard.path(page_cache_dir), max_bytes=page_cache_size)
+        
+        # Shared pacing for all workers: starts at the rate the per-worker delays
+        # used to give (num_workers / mean delay), then AIMD when adaptive
+        mean_delay = sum(delay_range) / 2
+        initial_rate = min(max_rate, num_workers / mean_delay) if mean_delay > 0 else max_rate
+        # Threads engine: list workers plus page fan-out workers can be fetching
+        max_concurrency = per_host_limit if engine == 'async' else num_workers * 2
+        self.rate = RateController(
+            initial_rate=initial_rate,
+            max_rate=max_rate if adaptive_rate else initial_rate,
+            initial_concurrency=min(num_workers, max_concurrency),
+            max_concurrency=max_concurrency,
+            adaptive=adaptive_rate
+        )
+        
+        # One cloudscraper session per worker thread (threads engine)
+        self._local = local()
+        self.fetcher: Optional[AsyncFetcher] = None
+        # Fans out pages 2..N of a thread (threads engine)
+        self.page_executor: Optional[ThreadPoolExecutor] = None
+        # HTML -> documents stage, separate processes when parse_workers > 0
+        self.parser_pool: Optional[ParserPool] = None
         
         # Thread-safe components
-        self.write_lock = Lock()
-        self.stats_lock = Lock()
         self.checkpoint_lock = Lock()
         
         # Initialize components
-        self.checkpoint = CrawlCheckpoint()
-        self.stats = CrawlStatistics()
+        self.checkpoint = CrawlCheckpoint(self.shard.path('data/crawl_checkpoint'))
+        # Per-stage timings and counters, per thread (no lock on the hot path)
+        self.metrics = Metrics()
+        self.stats = CrawlStatistics(metrics=self.metrics)
         
         # Setup logging
         self._setup_logging()
@@ -209,7 +395,7 @@ class VozProductionCrawler:
             level=logging.INFO,
             format='%(asctime)s [%(levelname)s] %(message)s',
             handlers=[
-                logging.FileHandler(f'logs/crawl_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'),
+                logging.FileHandler(self.shard.path(f'logs/crawl_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')),
                 logging.StreamHandler()
             ]
         )
@@ -235,85 +421,161 @@ class VozProductionCrawler:
         scraper.mount('http://', adapter)
         return scraper
     
-    def _random_delay(self):
-        """Add random delay between requests"""
-        delay = random.uniform(*self.delay_range)
-        time.sleep(delay)
+    def _get_scraper(self):
+        """Get the calling worker thread's scraper, created once per thread"""
+        scraper = getattr(self._local, 'scraper', None)
+        if scraper is None:
+            scraper = self._create_scraper()
+            self._local.scraper = scraper
+        return scraper
+    
+    def _start_fetcher(self, scraper):
+        """Start the async engine, reusing the cloudscraper session's UA and cookies"""
+        self.fetcher = AsyncFetcher(
+            max_connections=self.max_connections,
+            per_host_limit=self.per_host_limit,
+            headers={'User-Agent': scraper.headers.get('User-Agent', '')},
+            cookies=scraper.cookies.get_dict()
+        )
+        self.fetcher.start()
+        self.logger.info(f"⚡ Async engine: {self.max_connections} connections, "
+                         f"{self.per_host_limit} per host")
     
     def _get_page(self, scraper, url: str, max_retries: int = 3) -> Optional[str]:
-        """Fetch a page with retries"""
+        """Fetch a page with retries, paced and backed off by the shared rate controller"""
+        cached = self.page_cache.get(url) if self.page_cache else None
+        headers = cached.conditional_headers() if cached else {}
         for attempt in range(max_retries):
+            with self.metrics.time('pacing'):
+                self.rate.acquire()
+            start = time.monotonic()
+            outcome, retry_after = ERROR, None
             try:
-                with self.stats_lock:
-                    self.stats.requests_made += 1
+                self.metrics.inc('requests_made')
                 
-                response = scraper.get(url, timeout=30)
+                response = scraper.get(url, timeout=30, headers=headers)
                 
                 if "Just a moment" in response.text:
                     self.logger.warning(f"Cloudflare challenge on {url}")
-                    time.sleep(5)
+                    outcome = CHALLENGE
+                    continue
+                
+                if response.status_code == 429:  # Rate limited
+                    outcome = THROTTLED
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    self.logger.warning(f"Rate limited on {url}, backing off")
                     continue
                 
+                outcome = ERROR if response.status_code >= 500 else OK
+                if response.status_code == 304 and cached:
+                    return self._cache_revalidated(cached)
                 if response.status_code == 200:
+                    self._cache_store(url, response.text, response.headers)
                     return response.text
                 
-                if response.status_code == 429:  # Rate limited
-                    self.logger.warning("Rate limited, sleeping 30s")
-                    time.sleep(30)
+                self.metrics.inc('requests_failed')
+                
+            except Exception as e:
+                self.logger.error(f"Error fetching {url}: {e}")
+                self.metrics.inc('requests_failed')
+            
+            finally:
+                latency = time.monotonic() - start
+                self.metrics.observe('fetch', latency)
+                self.rate.release(outcome, latency, retry_after)
+        
+        # Add to failed URLs for later retry
+        with self.checkpoint_lock:
+            self.checkpoint.failed_urls.append(url)
+        
+        return None
+    
+    async def _get_page_async(self, url: str, max_retries: int = 3) -> Optional[str]:
+        """Fetch a page through the shared async client, same retry policy as _get_page"""
+        # Page cache calls hit SQLite, disk and zlib: keep them off the event loop
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(None, self.page_cache.get, url) if self.page_cache else None
+        headers = cached.conditional_headers() if cached else None
+        for attempt in range(max_retries):
+            pacing_start = time.perf_counter()
+            await self.rate.acquire_async()
+            self.metrics.observe('pacing', time.perf_counter() - pacing_start)
+            start = time.monotonic()
+            outcome, retry_after = ERROR, None
+            try:
+                self.metrics.inc('requests_made')
+                
+                status, text, response_headers = await self.fetcher.fetch(url, headers)
+                
+                if "Just a moment" in text:
+                    self.logger.warning(f"Cloudflare challenge on {url}")
+                    outcome = CHALLENGE
+                    continue
+                
+                if status == 429:  # Rate limited
+                    outcome = THROTTLED
+                    retry_after = parse_retry_after(response_headers.get('Retry-After'))
+                    self.logger.warning(f"Rate limited on {url}, backing off")
                     continue
                 
-                with self.stats_lock:
-                    self.stats.requests_failed += 1
-                time.sleep(2)
+                outcome = ERROR if status >= 500 else OK
+                if status == 304 and cached:
+                    return await loop.run_in_executor(None, self._cache_revalidated, cached)
+                if status == 200:
+                    if self.page_cache is not None:
+                        await loop.run_in_executor(None, self._cache_store, url, text, response_headers)
+                    return text
+                
+                self.metrics.inc('requests_failed')
                 
             except Exception as e:
                 self.logger.error(f"Error fetching {url}: {e}")
-                with self.stats_lock:
-                    self.stats.requests_failed += 1
-                time.sleep(3)
+                self.metrics.inc('requests_failed')
+            
+            finally:
+                latency = time.monotonic() - start
+                self.metrics.observe('fetch', latency)
+                self.rate.release(outcome, latency, retry_after)
         
-        # Add to failed URLs for later retry
         with self.checkpoint_lock:
             self.checkpoint.failed_urls.append(url)
         
         return None
     
+    def _cache_store(self, url: str, text: str, headers):
+        """Keep a fetched page with its validators (no-op without a page cache)"""
+        if self.page_cache is not None:
+            self.page_cache.put(url, text, headers.get('ETag'), headers.get('Last-Modified'))
+    
+    def _cache_revalidated(self, cached) -> str:
+        """304 Not Modified: serve the cached body"""
+        self.page_cache.touch(cached.url)
+        self.metrics.inc('pages_not_modified')
+        return cached.text
+    
     def _simple_word_count(self, text: str) -> int:
         """Simple word count using whitespace split (fast)"""
-        words = text.lower().split()
-        # Filter: min 2 chars, not pure digits
-        count = sum(1 for w in words if len(w) >= 2 and not w.isdigit())
-        return count
+        return simple_word_count(text)
     
     def _clean_content(self, text: str) -> str:
         """Clean and normalize content"""
-        import re
-        import unicodedata
-        
-        # Normalize unicode
-        text = unicodedata.normalize('NFC', text)
-        
-        # Remove URLs
-        text = re.sub(r'https?://\S+', '', text)
-        
-        # Remove HTML entities
-        text = re.sub(r'&\w+;', ' ', text)
-        
-        # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
-        
-        return text
+        return clean_content(text)
     
     def get_thread_list(self, scraper, forum_url: str, page: int = 1) -> Tuple[List[dict], int]:
-        """Get thread list from a forum page. Returns (threads_to_crawl, total_threads_on_page)"""
+        """
+        Get thread list from a forum page. Returns (threads_to_crawl, total_threads_on_page)
+        
+        In incremental mode a crawled thread is returned again when the
+        listing shows activity past its high-water mark, with `start_page`
+        set to the last page crawled so only new pages are fetched.
+        """
         url = f"{self.BASE_URL}{forum_url}page-{page}" if page > 1 else f"{self.BASE_URL}{forum_url}"
         
         html = self._get_page(scraper, url)
         if not html:
             return [], 0
         
-        self._random_delay()
-        
+        parse_start = time.perf_counter()
         soup = BeautifulSoup(html, 'lxml')
         threads = []
         total_on_page = 0
@@ -330,18 +592,75 @@ class VozProductionCrawler:
             total_on_page += 1  # Count all threads on page
             thread_id = self._extract_thread_id(href)
             
-            # Skip already crawled threads
-            if self.checkpoint.is_thread_crawled(thread_id):
+            # Skip already crawled threads (unless they have new posts in incremental mode)
+            crawled = self.checkpoint.is_thread_crawled(thread_id)
+            if crawled and not self.incremental:
                 continue
             
-            threads.append({
+            thread = {
                 'title': title_elem.get_text(strip=True),
                 'url': self.BASE_URL + href,
-                'thread_id': thread_id
-            })
+                'thread_id': thread_id,
+                'forum': forum_url.split('/')[2],  # e.g. xe-may.175
+                **self._parse_listing_meta(item)
+            }
+            if crawled and not self._has_new_posts(thread):
+                continue
+            
+            threads.append(thread)
         
+        self.metrics.observe('parse', time.perf_counter() - parse_start)
         return threads, total_on_page
     
+    @staticmethod
+    def _parse_count(text: str) -> int:
+        """Listing counters: '1,234', '1.2K', '3M'"""
+        text = text.strip().replace(',', '').upper()
+        multiplier = 1
+        if text[-1:] in ('K', 'M'):
+            multiplier = 1000 if text[-1] == 'K' else 1000000
+            text = text[:-1]
+        try:
+            return int(float(text) * multiplier)
+        except ValueError:
+            return 0
+    
+    def _parse_listing_meta(self, item) -> dict:
+        """Reply count, last page and last-post time of a structItem"""
+        meta = {'replies': 0, 'listing_last_page': 1, 'latest_time': 0}
+        
+        replies_elem = item.select_one('.structItem-cell--meta dd')
+        if replies_elem:
+            meta['replies'] = self._parse_count(replies_elem.get_text())
+        
+        for link in item.select('.structItem-pageJump a'):
+            text = link.get_text(strip=True)
+            if text.isdigit():
+                meta['listing_last_page'] = max(meta['listing_last_page'], int(text))
+        
+        time_elem = item.select_one('.structItem-cell--latest time[data-time]')
+        if time_elem and time_elem.get('data-time', '').isdigit():
+            meta['latest_time'] = int(time_elem['data-time'])
+        
+        return meta
+    
+    def _has_new_posts(self, thread: dict) -> bool:
+        """Incremental mode: compare listing metadata with the thread's high-water mark"""
+        mark = self.checkpoint.get_thread_mark(thread['thread_id'])
+        if mark is None:
+            # Crawled before marks were recorded: take the listing as baseline
+            with self.checkpoint_lock:
+                self.checkpoint.set_thread_mark(thread['thread_id'], Mark(
+                    thread['listing_last_page'], thread['replies'], 0, thread['latest_time']))
+            return False
+        
+        if (thread['latest_time'] > mark.latest_time
+                or thread['replies'] > mark.replies
+                or thread['listing_last_page'] > mark.last_page):
+            thread['start_page'] = max(1, mark.last_page)
+            return True
+        return False
+    
     def _extract_thread_id(self, url: str) -> str:
         """Extract thread ID from URL"""
         try:
@@ -350,112 +669,187 @@ class VozProductionCrawler:
         except:
             return hashlib.md5(url.encode()).hexdigest()[:12]
     
+    def _parse_thread_page(self, html: str, thread: dict) -> Tuple[List[dict], int]:
+        """Parse one thread page. Returns (documents, last_page_number)"""
+        if self.parser_pool is not None:
+            future = self.parser_pool.submit(html, thread, self.min_word_count,
+                                             self.BASE_URL, self.parser_backend)
+            parsed, last_page, timings = future.result()
+        else:
+            timings = {}
+            parsed, last_page = parse_thread_page(html, thread, self.min_word_count,
+                                                  self.BASE_URL, self.parser_backend, timings)
+        for stage, seconds in timings.items():
+            self.metrics.observe(stage, seconds)
+        
+        return self._collect_posts(parsed), last_page
+    
+    def _collect_posts(self, parsed: List[Tuple[str, Optional[dict]]]) -> List[dict]:
+        """Drop already-crawled posts (posts are marked crawled when written)"""
+        documents = []
+        for post_id, doc in parsed:
+            # Skip already crawled posts
+            if self.checkpoint.is_post_crawled(post_id):
+                self.metrics.inc('duplicates_skipped')
+                continue
+            
+            if doc:
+                documents.append(doc)
+        return documents
+    
+    @staticmethod
+    def _doc_post_id(doc: dict) -> str:
+        """Post id of a document built by page_parser (doc_id = voz_t<thread>_p<post>)"""
+        return doc['doc_id'].rsplit('_p', 1)[-1]
+    
+    def _thread_page_url(self, thread: dict, page: int) -> str:
+        return f"{thread['url']}page-{page}" if page > 1 else thread['url']
+    
+    def _crawl_thread_page(self, thread: dict, page: int) -> List[dict]:
+        """Fetch and parse one page of a thread - runs on the page executor"""
+        html = self._get_page(self._get_scraper(), self._thread_page_url(thread, page))
+        if not html:
+            return []
+        
+        documents, _ = self._parse_thread_page(html, thread)
+        return documents
+    
+    def _next_pages(self, thread: dict, last_page: int, max_pages: int) -> range:
+        """Pages after the first fetched one, recording how far the crawl got"""
+        first = thread.get('start_page', 1)
+        pages = range(first + 1, min(last_page, first + max_pages - 1) + 1)
+        thread['crawled_to_page'] = pages[-1] if pages else first
+        return pages
+    
     def crawl_thread(self, thread: dict, max_pages: int = 10) -> List[dict]:
-        """Crawl a single thread - called by worker threads"""
-        scraper = self._create_scraper()
+        """
+        Crawl a single thread - called by worker threads
+        
+        The first page (1, or the high-water page in incremental mode) tells
+        us the last page number, so the following pages are fetched
+        concurrently on the page executor instead of one after another.
+        """
         documents = []
-        thread_id = thread['thread_id']
-        thread_title = thread['title']
-        thread_url = thread['url']
         
-        for page in range(1, max_pages + 1):
-            url = f"{thread_url}page-{page}" if page > 1 else thread_url
-            
-            html = self._get_page(scraper, url)
-            if not html:
-                break
-            
-            self._random_delay()
-            
-            soup = BeautifulSoup(html, 'lxml')
-            posts = soup.select('article.message--post')
-            
-            if not posts:
-                break
+        first_page = thread.get('start_page', 1)
+        html = self._get_page(self._get_scraper(), self._thread_page_url(thread, first_page))
+        if html:
+            documents, last_page = self._parse_thread_page(html, thread)
             
-            for post in posts:
-                doc = self._parse_post(post, thread_id, thread_title, thread_url)
-                if doc:
-                    # Check quality with simple word count (fast)
-                    content_clean = self._clean_content(doc['content'])
-                    word_count = self._simple_word_count(content_clean)
-                    
-                    if word_count >= self.min_word_count:
-                        doc['content_clean'] = content_clean
-                        doc['word_count'] = word_count
-                        documents.append(doc)
-            
-            # Check for next page
-            next_btn = soup.select_one('a.pageNav-jump--next')
-            if not next_btn:
-                break
+            pages = self._next_pages(thread, last_page, max_pages)
+            futures = [self.page_executor.submit(self._crawl_thread_page, thread, page)
+                       for page in pages]
+            for future in futures:  # keep page order
+                documents.extend(future.result())
         
-        # Mark thread as crawled
-        with self.checkpoint_lock:
-            self.checkpoint.mark_thread_crawled(thread_id)
+        return documents
+    
+    async def _crawl_thread_page_async(self, thread: dict, page: int) -> Tuple[List[dict], int]:
+        """Fetch one thread page on the async engine, parsing off the event loop"""
+        html = await self._get_page_async(self._thread_page_url(thread, page))
+        if not html:
+            return [], 0
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._parse_thread_page, html, thread)
+    
+    async def crawl_thread_async(self, thread: dict, max_pages: int = 10) -> List[dict]:
+        """Crawl a single thread on the async engine loop, fanning out the following pages"""
+        documents, last_page = await self._crawl_thread_page_async(thread, thread.get('start_page', 1))
+        if not last_page:
+            return documents
+        
+        pages = self._next_pages(thread, last_page, max_pages)
+        results = await asyncio.gather(
+            *(self._crawl_thread_page_async(thread, page) for page in pages))
+        for page_docs, _ in results:
+            documents.extend(page_docs)
         
         return documents
     
-    def _parse_post(self, post_elem, thread_id: str, thread_title: str, thread_url: str) -> Optional[dict]:
-        """Parse a single post"""
-        try:
-            post_id = post_elem.get('data-content', '').replace('post-', '')
-            
-            # Skip already crawled posts
-            if self.checkpoint.is_post_crawled(post_id):
-                with self.stats_lock:
-                    self.stats.duplicates_skipped += 1
-                return None
-            
-            content_elem = post_elem.select_one('div.bbWrapper')
-            if not content_elem:
-                return None
-            
-            # Handle quotes
-            has_quote = False
-            quoted_author = None
-            quoted_content = None
-            
-            quote_elem = content_elem.select_one('blockquote.bbCodeBlock--quote')
-            if quote_elem:
-                has_quote = True
-                quote_title = quote_elem.select_one('div.bbCodeBlock-title')
-                if quote_title:
-                    quoted_author = quote_title.get_text(strip=True).replace(' said:', '').replace(' nói:', '')
-                quote_content_elem = quote_elem.select_one('div.bbCodeBlock-content')
-                if quote_content_elem:
-                    quoted_content = quote_content_elem.get_text(strip=True)[:500]  # Limit quote length
-                quote_elem.decompose()
-            
-            content_raw = content_elem.get_text(separator=' ', strip=True)
-            
-            author_elem = post_elem.select_one('.message-name .username')
-            author = author_elem.get_text(strip=True) if author_elem else "unknown"
-            
-            time_elem = post_elem.select_one('.message-attribution-main time')
-            timestamp = time_elem.get('datetime', '') if time_elem else ""
+    def _submit_thread(self, executor: ThreadPoolExecutor, thread: dict):
+        """Schedule a thread crawl on the configured engine, returns a Future"""
+        if self.engine == 'async':
+            return self.fetcher.submit(self.crawl_thread_async(thread))
+        return executor.submit(self.crawl_thread, thread)
+    
+    def _write_thread_docs(self, thread: dict, docs: List[dict],
+                           writer, budget: int) -> int:
+        """
+        Writer stage for one finished thread. Returns number of docs written.
+        
+        Posts are marked crawled as their documents are written, and the
+        thread only once all of them fit in `budget`, so a checkpoint never
+        covers documents that are not in the output.
+        """
+        written = 0
+        for doc in docs:
+            if written >= budget:
+                return written
             
-            # Mark post as crawled
+            # Exact dedup at write time
+            post_id = self._doc_post_id(doc)
             with self.checkpoint_lock:
-                self.checkpoint.mark_post_crawled(post_id)
+                duplicate = self.checkpoint.is_post_crawled(post_id)
+                if not duplicate:
+                    self.checkpoint.mark_post_crawled(post_id)
+            if duplicate:
+                self.metrics.inc('duplicates_skipped')
+                continue
             
-            return {
-                'doc_id': f"voz_t{thread_id}_p{post_id}",
-                'thread_id': f"t{thread_id}",
-                'thread_title': thread_title,
-                'content': content_raw,
-                'author': author,
-                'timestamp': timestamp,
-                'has_quote': has_quote,
-                'quoted_author': quoted_author,
-                'quoted_content': quoted_content,
-                'source': 'voz',
-                'url': f"{self.BASE_URL}/p/{post_id}/"
-            }
+            # Near-duplicate (reposts, copy-paste) on the cleaned content
+            if self.near_dup is not None and self.near_dup.is_duplicate(doc.get('content_clean', '')):
+                self.metrics.inc('duplicates_near_skipped')
+                continue
             
-        except Exception as e:
-            self.logger.error(f"Error parsing post: {e}")
-            return None
+            # Update statistics (simple word count)
+            self.stats.add_document(doc)
+            
+            # Output doc (no tokens field), batched by the writer
+            writer.write(doc)
+            written += 1
+        
+        with self.checkpoint_lock:
+            self.checkpoint.mark_thread_crawled(thread['thread_id'])
+            if 'crawled_to_page' in thread:
+                self._update_thread_mark(thread, docs)
+        
+        return written
+    
+    def _update_thread_mark(self, thread: dict, docs: List[dict]):
+        """Record the thread's high-water mark once its documents are written"""
+        previous = self.checkpoint.get_thread_mark(thread['thread_id']) or Mark()
+        post_ids = [int(p) for p in map(self._doc_post_id, docs) if p.isdigit()]
+        self.checkpoint.set_thread_mark(thread['thread_id'], Mark(
+            last_page=thread['crawled_to_page'],
+            replies=thread.get('replies', previous.replies),
+            last_post_id=max(post_ids, default=previous.last_post_id),
+            latest_time=thread.get('latest_time', previous.latest_time)
+        ))
+    
+    def _start_metrics(self) -> list:
+        """
+        Start the metrics endpoint / snapshot writer if configured, returns them for stop()
+        
+        Shard i serves on metrics_port + i and writes its own snapshot file.
+        """
+        reporters = []
+        if self.metrics_port:
+            server = MetricsServer(self.metrics, self.metrics_port + self.shard.index)
+            server.start()
+            self.logger.info(f"📈 Metrics: {server.url}")
+            reporters.append(server)
+        if self.metrics_snapshot:
+            writer = SnapshotWriter(self.metrics, self.shard.path(self.metrics_snapshot), self.metrics_interval)
+            writer.start()
+            self.logger.info(f"📈 Metrics snapshots every {self.metrics_interval:g}s: {writer.path}")
+            reporters.append(writer)
+        return reporters
+    
+    def _save_forum_pages(self, frontier: ListingFrontier):
+        """Checkpoint listing resume pages (a refresh keeps the full crawl's position)"""
+        if not self.incremental:
+            self.checkpoint.last_forum_page.update(frontier.resume_pages())
     
     def crawl(self, 
               target_docs: int = 1000000,
@@ -466,24 +860,30 @@ class VozProductionCrawler:
         
         Args:
             target_docs: Target number of documents
-            output_file: Output JSONL file path
+            output_file: Output JSONL file path (Parquet: .jsonl becomes a .parquet directory;
+                sharded crawls write <name>.shard-i-of-N.<ext>)
             resume: Whether to resume from checkpoint
             
         Returns:
             Statistics dict
         """
+        output_file = self.shard.path(output_file)
+        if self.output_format == 'parquet' and output_file.endswith('.jsonl'):
+            output_file = output_file[:-len('.jsonl')] + '.parquet'
         os.makedirs(os.path.dirname(output_file), exist_ok=True)
         
         # Load checkpoint if resuming
         if resume and self.checkpoint.load():
             self.logger.info(f"📂 Resumed from checkpoint: {self.checkpoint.total_docs} docs already crawled")
-            mode = 'a'  # Append mode
+            append = True
         else:
             self.logger.info("🆕 Starting fresh crawl")
-            mode = 'w'  # Write mode
+            append = False
         
         self.stats.start_time = datetime.now()
         self.logger.info(f"🚀 Starting production crawler at {self.stats.start_time.strftime('%H:%M:%S')}")
+        if self.shard.is_sharded:
+            self.logger.info(f"🧩 Shard {self.shard}: {', '.join(f for f, _ in self.shard.assign(list(self.FORUMS)))}")
         self.logger.info(f"🔧 Workers: {self.num_workers}")
         self.logger.info(f"🎯 Target: {target_docs:,} documents")
         self.logger.info(f"⚡ Optimized mode: NO tokenization during crawl")
@@ -499,104 +899,134 @@ class VozProductionCrawler:
         
         self.logger.info("✅ Connected to Voz!")
         
+        if self.engine == 'async':
+            self._start_fetcher(scraper)
+        else:
+            self.page_executor = ThreadPoolExecutor(max_workers=self.num_workers)
+        
+        if self.parse_workers > 0:
+            self.parser_pool = ParserPool(self.parse_workers)
+            self.logger.info(f"🧩 Parser processes: {self.parse_workers}")
+        
         total_docs = self.checkpoint.total_docs
         
-        with open(output_file, mode, encoding='utf-8') as f:
+        writer = open_doc_writer(
+            self.output_format,
+            output_file,
+            append=append,
+            resume_offset=self.checkpoint.output_offset,
+            batch_size=self.row_group_size if self.output_format == 'parquet' else self.write_batch_size,
+            flush_interval=self.flush_interval,
+            fsync=self.fsync_policy
+        )
+        
+        with writer:
             pbar = tqdm(total=target_docs, initial=total_docs, desc="Documents")
             
+            # Listing pages are prefetched into the frontier while workers crawl;
+            # this shard's forums (all of them when unsharded) take turns, 50 pages each.
+            # A refresh lists from page 1 (latest activity first) and leaves a forum
+            # after 3 listing pages without new activity.
+            frontier = ListingFrontier(
+                lambda forum_id, page: self.get_thread_list(self._get_scraper(), self.FORUMS[forum_id], page),
+                [(forum_id, page_slice, page_slice.first(
+                    1 if self.incremental else self.checkpoint.last_forum_page.get(forum_id, 1)), None)
+                 for forum_id, page_slice in self.shard.assign(list(self.FORUMS))],
+                max_queued=self.frontier_size,
+                pages_per_turn=50,
+                max_idle_pages=3 if self.incremental else 0,
+                logger=self.logger
+            )
+            max_in_flight = self.num_workers * 2  # keep the pool busy while results are written
+            futures = {}
+            
+            self.metrics.gauge('docs_total', lambda: total_docs)
+            self.metrics.gauge('frontier_queued', lambda: frontier.queued)
+            self.metrics.gauge('listing_pages', lambda: frontier.pages_listed)
+            self.metrics.gauge('threads_in_flight', lambda: len(futures))
+            self.metrics.gauge('request_rate', lambda: self.rate.rate)
+            self.metrics.gauge('request_concurrency', lambda: self.rate.concurrency)
+            reporters = self._start_metrics()
+            
             with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
-                # Cycle through forums
-                forum_cycle = list(self.FORUMS.items())
-                forum_idx = 0
+                frontier.start()
                 
                 while total_docs < target_docs:
-                    # Get current forum
-                    forum_id, forum_url = forum_cycle[forum_idx % len(forum_cycle)]
-                    forum_idx += 1
-                    
-                    # Get starting page for this forum
-                    start_page = self.checkpoint.last_forum_page.get(forum_id, 1)
-                    
-                    self.logger.info(f"📂 Crawling {forum_id} from page {start_page}")
-                    
-                    # Collect threads from forum
-                    for page in range(start_page, start_page + 50):  # 50 pages per batch
-                        if total_docs >= target_docs:
+                    # Top up in-flight threads, waiting on the frontier only when idle
+                    while len(futures) < max_in_flight:
+                        item = frontier.get(timeout=None if not futures else 0)
+                        if item is None:
                             break
-                        
-                        threads, total_on_page = self.get_thread_list(scraper, forum_url, page)
-                        
-                        if total_on_page == 0:
-                            # No threads on page = end of forum
-                            self.logger.info(f"   End of forum at page {page}")
+                        futures[self._submit_thread(executor, item.thread)] = item
+                    
+                    if not futures:
+                        if frontier.exhausted:
+                            self.logger.info("🏁 All forums exhausted")
                             break
-                        
-                        if not threads:
-                            # Page has threads but all already crawled, continue to next page
-                            self.logger.debug(f"   Page {page}: all {total_on_page} threads already crawled")
-                            continue
-                        
-                        # Submit threads to workers
-                        futures = {}
-                        for thread in threads[:20]:  # Limit concurrent threads
-                            future = executor.submit(self.crawl_thread, thread)
-                            futures[future] = thread
-                        
-                        # Process completed futures
-                        for future in as_completed(futures):
-                            if total_docs >= target_docs:
-                                break
+                        continue
+                    
+                    # Process completed futures
+                    done, _ = wait(futures, timeout=1.0, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        item = futures.pop(future)
+                        thread = item.thread
+                        try:
+                            docs = future.result()
+                            
+                            with self.metrics.time('write'):
+                                written = self._write_thread_docs(
+                                    thread, docs, writer, target_docs - total_docs)
+                            total_docs += written
+                            self.metrics.inc('docs_written', written)
+                            pbar.update(written)
                             
-                            thread = futures[future]
-                            try:
-                                docs = future.result()
-                                
-                                for doc in docs:
-                                    if total_docs >= target_docs:
-                                        break
-                                    
-                                    # Update statistics (simple word count)
-                                    word_count = doc.get('word_count', 0)
-                                    with self.stats_lock:
-                                        self.stats.total_docs += 1
-                                        self.stats.total_words += word_count
-                                        self.stats.doc_lengths.append(word_count)
-                                        self.stats.authors.add(doc.get('author', 'unknown'))
-                                        self.stats.threads.add(doc.get('thread_id', ''))
-                                    
-                                    # Output doc (no tokens field)
-                                    output_doc = doc
-                                    
-                                    with self.write_lock:
-                                        f.write(json.dumps(output_doc, ensure_ascii=False) + '\n')
-                                        f.flush()  # Ensure data is written
-                                    
-                                    total_docs += 1
-                                    pbar.update(1)
-                                
-                                if docs:
-                                    tqdm.write(f"✓ {thread['title'][:40]}... ({len(docs)} docs)")
-                                
-                            except Exception as e:
-                                self.logger.error(f"Error processing thread: {e}")
+                            if written:
+                                tqdm.write(f"✓ {thread['title'][:40]}... ({written} docs)")
+                            
+                        except Exception as e:
+                            self.logger.error(f"Error processing thread: {e}")
                         
-                        # Save checkpoint periodically
-                        if self.checkpoint.should_save(self.checkpoint_interval):
-                            with self.checkpoint_lock:
-                                self.checkpoint.total_docs = total_docs
-                                self.checkpoint.last_forum_page[forum_id] = page
-                                self.checkpoint.save()
-                            self.logger.info(f"💾 Checkpoint saved: {total_docs:,} docs")
+                        frontier.task_done(item)
+                        if total_docs >= target_docs:
+                            break
                     
-                    # Brief pause between forums
-                    time.sleep(2)
+                    # Save checkpoint periodically
+                    if self.checkpoint.should_save(self.checkpoint_interval):
+                        with self.checkpoint_lock, self.metrics.time('checkpoint'):
+                            self.checkpoint.total_docs = total_docs
+                            self._save_forum_pages(frontier)
+                            self.checkpoint.output_offset = writer.commit()
+                            self.checkpoint.save()
+                        rate = self.rate.snapshot()
+                        self.logger.info(f"💾 Checkpoint saved: {total_docs:,} docs "
+                                         f"(rate {rate['rate']} req/s, concurrency {rate['concurrency']}; "
+                                         f"{self.metrics.stage_summary()})")
+                
+                # Target reached: drop queued work, unfinished threads are recrawled on resume
+                for future in futures:
+                    future.cancel()
+                frontier.stop()
             
             pbar.close()
+            
+            # Final checkpoint
+            with self.checkpoint_lock, self.metrics.time('checkpoint'):
+                self.checkpoint.total_docs = total_docs
+                self._save_forum_pages(frontier)
+                self.checkpoint.output_offset = writer.commit()
+                self.checkpoint.save()
         
-        # Final checkpoint
-        with self.checkpoint_lock:
-            self.checkpoint.total_docs = total_docs
-            self.checkpoint.save()
+        for reporter in reporters:
+            reporter.stop()
+        if self.fetcher is not None:
+            self.fetcher.stop()
+            self.fetcher = None
+        if self.page_executor is not None:
+            self.page_executor.shutdown()
+            self.page_executor = None
+        if self.parser_pool is not None:
+            self.parser_pool.shutdown()
+            self.parser_pool = None
         
         # Generate report
         end_time = datetime.now()
@@ -607,21 +1037,33 @@ class VozProductionCrawler:
         self.logger.info(f"{'='*60}")
         self.logger.info(f"⏱️  Total time: {duration/60:.1f} minutes ({duration/3600:.2f} hours)")
         self.logger.info(f"📄 Documents collected: {total_docs:,}")
-        self.logger.info(f"📝 Vocabulary size: {len(self.stats.word_freq):,}")
-        self.logger.info(f"📏 Avg doc length: {self.stats.get_report()['avg_doc_length']:.1f} words")
+        stats_report = self.stats.get_report()
+        self.logger.info(f"📝 Vocabulary size: ~{stats_report['vocabulary_size']:,}")
+        self.logger.info(f"📏 Avg doc length: {stats_report['avg_doc_length']:.1f} words")
         self.logger.info(f"🌐 Requests made: {self.stats.requests_made:,}")
+        self.logger.info(f"🚦 Request rate: {self.rate.rate:.1f} req/s, concurrency {self.rate.concurrency}")
         self.logger.info(f"✗  Failed: {self.stats.requests_failed:,}")
         self.logger.info(f"🔄 Duplicates skipped: {self.stats.duplicates_skipped:,}")
+        self.logger.info(f"🔁 Near-duplicates skipped: {self.stats.duplicates_near_skipped:,}")
+        if self.page_cache is not None:
+            self.logger.info(f"📦 Not modified (304): {self.stats.pages_not_modified:,}, "
+                             f"cache {self.page_cache.total_bytes / 1024 ** 2:,.1f} MB")
         self.logger.info(f"⚡ Speed: {total_docs/max(1, duration)*60:.1f} docs/minute")
+        self.logger.info(f"⏱️  Stage time: {self.metrics.stage_summary()}")
         self.logger.info(f"{'='*60}")
         
         # Save statistics report
-        stats_report = self.stats.get_report()
         stats_report['duration_seconds'] = duration
+        stats_report['rate_control'] = self.rate.snapshot()
+        stats_report['stages'] = self.metrics.snapshot()['stages']
+        if self.page_cache is not None:
+            stats_report['page_cache'] = self.page_cache.stats()
+            self.page_cache.close()
+            self.page_cache = None
         stats_report['start_time'] = self.stats.start_time.isoformat()
         stats_report['end_time'] = end_time.isoformat()
         
-        stats_path = output_file.replace('.jsonl', '_stats.json')
+        stats_path = os.path.splitext(output_file)[0] + '_stats.json'
         with open(stats_path, 'w', encoding='utf-8') as f:
             json.dump(stats_report, f, ensure_ascii=False, indent=2)
         
@@ -646,12 +1088,76 @@ def main():
                        help='Do not resume from checkpoint')
     parser.add_argument('--min-words', type=int, default=30,
                        help='Minimum word count per document')
+    parser.add_argument('--engine', choices=['threads', 'async'], default='threads',
+                       help='Fetch engine: worker threads or one asyncio loop (default threads)')
+    parser.add_argument('--max-connections', type=int, default=500,
+                       help='Async engine: total pooled connections (default 500)')
+    parser.add_argument('--per-host', type=int, default=64,
+                       help='Async engine: concurrent connections per host (default 64)')
+    parser.add_argument('--parser', choices=list(PARSER_BACKENDS), default='bs4',
+                       help='HTML parser backend (default bs4, lxml is faster)')
+    parser.add_argument('--output-format', choices=list(OUTPUT_FORMATS), default='jsonl',
+                       help='jsonl file or parquet directory (zstd, dictionary-encoded)')
+    parser.add_argument('--row-group-size', type=int, default=50000,
+                       help='Parquet rows per row group (default 50000)')
+    parser.add_argument('--near-dup', type=int, default=0, metavar='BITS',
+                       help='Skip near-duplicate posts within BITS SimHash distance (e.g. 3; default off)')
+    parser.add_argument('--no-adaptive-rate', action='store_true',
+                       help='Keep the request rate fixed instead of adapting to 429s/latency')
+    parser.add_argument('--max-rate', type=float, default=200.0,
+                       help='Upper bound for the adaptive request rate in req/s (default 200)')
+    parser.add_argument('--shard', default=None, metavar='i/N',
+                       help='Crawl shard i of N (0-based) with its own checkpoint and output')
+    parser.add_argument('--frontier-size', type=int, default=500,
+                       help='Threads listed ahead of the workers (default 500)')
+    parser.add_argument('--incremental', action='store_true',
+                       help='Refresh: only fetch new pages of crawled threads with new replies')
+    parser.add_argument('--page-cache', default=None, metavar='DIR',
+                       help='Cache raw pages in DIR and revalidate them with ETag/If-Modified-Since')
+    parser.add_argument('--page-cache-size', type=float, default=20.0, metavar='GB',
+                       help='Compressed page cache budget in GB, LRU eviction past it (default 20)')
+    parser.add_argument('--metrics-port', type=int, default=0,
+                       help='Serve Prometheus metrics on 127.0.0.1:PORT/metrics (default off)')
+    parser.add_argument('--metrics-snapshot', default=None, metavar='PATH',
+                       help='Append a JSON metrics snapshot to PATH every --metrics-interval seconds')
+    parser.add_argument('--metrics-interval', type=float, default=10.0,
+                       help='Seconds between metrics snapshots (default 10)')
+    parser.add_argument('--batch-size', type=int, default=1000,
+                       help='Documents buffered by the writer before a write (default 1000)')
+    parser.add_argument('--flush-interval', type=float, default=1.0,
+                       help='Max seconds a document stays in the write buffer (default 1.0)')
+    parser.add_argument('--fsync', choices=list(FSYNC_POLICIES), default='commit',
+                       help='fsync output on checkpoint commit, every flush, or never (default commit)')
+    parser.add_argument('--parse-workers', type=int, default=os.cpu_count() or 1,
+                       help='Parser processes, 0 parses in the fetch workers (default: CPU count, '
+                            'unlike the VozProductionCrawler default of 0)')
     
     args = parser.parse_args()
     
     crawler = VozProductionCrawler(
         num_workers=args.workers,
-        min_word_count=args.min_words
+        min_word_count=args.min_words,
+        engine=args.engine,
+        max_connections=args.max_connections,
+        per_host_limit=args.per_host,
+        parse_workers=args.parse_workers,
+        parser_backend=args.parser,
+        write_batch_size=args.batch_size,
+        flush_interval=args.flush_interval,
+        fsync_policy=args.fsync,
+        output_format=args.output_format,
+        row_group_size=args.row_group_size,
+        near_dup_distance=args.near_dup,
+        adaptive_rate=not args.no_adaptive_rate,
+        max_rate=args.max_rate,
+        shard=ShardSpec.parse(args.shard),
+        frontier_size=args.frontier_size,
+        incremental=args.incremental,
+        page_cache_dir=args.page_cache,
+        page_cache_size=int(args.page_cache_size * 1024 ** 3),
+        metrics_port=args.metrics_port,
+        metrics_snapshot=args.metrics_snapshot,
+        metrics_interval=args.metrics_interval
     )
     
     stats = crawler.crawl(
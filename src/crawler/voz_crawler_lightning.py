@@ -2,6 +2,8 @@
 """
 Voz Crawler for Lightning AI
 Standalone version - no external dependencies except cloudscraper, bs4, lxml, tqdm
+(keep checkpoint_store.py, frontier.py, metrics.py, rate_control.py, shard_coordinator.py,
+sketches.py and text_normalizer.py next to this file)
 
 Usage:
     pip install cloudscraper beautifulsoup4 lxml tqdm
@@ -12,17 +14,30 @@ import json
 import os
 import re
 import time
-import random
-import pickle
 import logging
 import argparse
 from datetime import datetime
 from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from threading import Lock, local
 from typing import Optional, List
 from tqdm import tqdm
 
+try:
+    from .checkpoint_store import CheckpointStore, IntIdSet, migrate_pickle
+    from .frontier import ListingFrontier
+    from .metrics import Metrics, MetricsServer, SnapshotWriter
+    from .rate_control import CHALLENGE, ERROR, OK, THROTTLED, RateController, parse_retry_after
+    from .shard_coordinator import ShardSpec
+    from .text_normalizer import normalize_text
+except ImportError:  # running as a script: python voz_crawler_lightning.py
+    from checkpoint_store import CheckpointStore, IntIdSet, migrate_pickle
+    from frontier import ListingFrontier
+    from metrics import Metrics, MetricsServer, SnapshotWriter
+    from rate_control import CHALLENGE, ERROR, OK, THROTTLED, RateController, parse_retry_after
+    from shard_coordinator import ShardSpec
+    from text_normalizer import normalize_text
+
 try:
     import cloudscraper
 except ImportError:
@@ -32,62 +47,64 @@ except ImportError:
 
 
 class CrawlCheckpoint:
-    """Checkpoint to resume crawling"""
+    """Checkpoint to resume crawling (incremental CheckpointStore)"""
     
-    def __init__(self, checkpoint_file: str = 'data/crawl_checkpoint.pkl'):
+    def __init__(self, checkpoint_file: str = 'data/crawl_checkpoint'):
         self.checkpoint_file = checkpoint_file
-        self.crawled_threads = set()
-        self.crawled_posts = set()
+        self.legacy_file = checkpoint_file + '.pkl'  # pickled checkpoint of older versions
+        self.store = CheckpointStore(checkpoint_file)
         self.last_forum = None
         self.last_page = 1
         self.total_docs = 0
         self._lock = Lock()
+    
+    @property
+    def crawled_threads(self) -> IntIdSet:
+        return self.store.sets['threads']
+    
+    @property
+    def crawled_posts(self) -> IntIdSet:
+        return self.store.sets['posts']
         
     def save(self):
-        """Save checkpoint to file"""
-        os.makedirs(os.path.dirname(self.checkpoint_file), exist_ok=True)
+        """Save checkpoint (appends new ids, atomically replaces meta)"""
         with self._lock:
-            data = {
-                'crawled_threads': self.crawled_threads,
-                'crawled_posts': self.crawled_posts,
+            self.store.commit({
                 'last_forum': self.last_forum,
                 'last_page': self.last_page,
                 'total_docs': self.total_docs
-            }
-            with open(self.checkpoint_file, 'wb') as f:
-                pickle.dump(data, f)
+            })
                 
     def load(self) -> bool:
-        """Load checkpoint from file"""
-        if os.path.exists(self.checkpoint_file):
-            try:
-                with open(self.checkpoint_file, 'rb') as f:
-                    data = pickle.load(f)
-                    if isinstance(data, dict):
-                        self.crawled_threads = data.get('crawled_threads', set())
-                        self.crawled_posts = data.get('crawled_posts', set())
-                        self.last_forum = data.get('last_forum')
-                        self.last_page = data.get('last_page', 1)
-                        self.total_docs = data.get('total_docs', 0)
-                    return True
-            except Exception as e:
-                print(f"Warning: Could not load checkpoint: {e}")
+        """Load checkpoint, migrating an old pickle checkpoint once"""
+        try:
+            data = self.store.load()
+            if data is None and os.path.exists(self.legacy_file):
+                print(f"Migrating {self.legacy_file} -> {self.checkpoint_file}/")
+                data = migrate_pickle(self.legacy_file, self.store)
+            if data is not None:
+                self.last_forum = data.get('last_forum')
+                self.last_page = data.get('last_page', 1)
+                self.total_docs = data.get('total_docs', 0)
+                return True
+        except Exception as e:
+            print(f"Warning: Could not load checkpoint: {e}")
         return False
     
     def add_thread(self, thread_id: str):
         with self._lock:
-            self.crawled_threads.add(thread_id)
+            self.store.add('threads', thread_id)
             
     def add_post(self, post_id: str):
         with self._lock:
-            self.crawled_posts.add(post_id)
+            self.store.add('posts', post_id)
             self.total_docs += 1
             
     def is_thread_crawled(self, thread_id: str) -> bool:
-        return thread_id in self.crawled_threads
+        return self.store.contains('threads', thread_id)
     
     def is_post_crawled(self, post_id: str) -> bool:
-        return post_id in self.crawled_posts
+        return self.store.contains('posts', post_id)
 
 
 class VozCrawler:
@@ -148,20 +165,37 @@ class VozCrawler:
                  num_workers: int = 10,
                  delay_range: tuple = (0.1, 0.3),
                  min_word_count: int = 50,
-                 start_page: int = 1):
+                 start_page: int = 1,
+                 max_rate: float = 100.0,
+                 shard: Optional[ShardSpec] = None,
+                 metrics_port: int = 0,
+                 metrics_snapshot: Optional[str] = None):
         
         self.num_workers = num_workers
         self.delay_range = delay_range
         self.min_word_count = min_word_count
         self.start_page = start_page
+        self.shard = shard or ShardSpec()
         
-        self.checkpoint = CrawlCheckpoint()
+        # Shared AIMD pacing, starting at the rate the per-worker delays gave
+        mean_delay = sum(delay_range) / 2
+        self.rate = RateController(
+            initial_rate=min(max_rate, num_workers / mean_delay) if mean_delay > 0 else max_rate,
+            max_rate=max_rate,
+            initial_concurrency=num_workers,
+            max_concurrency=num_workers
+        )
+        
+        self.checkpoint = CrawlCheckpoint(self.shard.path('data/crawl_checkpoint'))
         self.stats_lock = Lock()
         self.file_lock = Lock()
+        self._local = local()  # one scraper per worker thread
         
         self.total_docs = 0
-        self.requests_made = 0
-        self.requests_failed = 0
+        # Per-thread counters and stage timings (fetch/parse/write/checkpoint)
+        self.metrics = Metrics()
+        self.metrics_port = metrics_port
+        self.metrics_snapshot = metrics_snapshot
         
         # Setup logging
         logging.basicConfig(
@@ -170,6 +204,14 @@ class VozCrawler:
         )
         self.logger = logging.getLogger(__name__)
     
+    @property
+    def requests_made(self) -> int:
+        return self.metrics.counter('requests_made')
+    
+    @property
+    def requests_failed(self) -> int:
+        return self.metrics.counter('requests_failed')
+    
     def _create_scraper(self):
         """Create cloudscraper with connection pooling"""
         import requests.adapters
@@ -181,35 +223,50 @@ class VozCrawler:
         scraper.mount('http://', adapter)
         return scraper
     
+    def _get_scraper(self):
+        """Reuse one scraper (and its pooled connections) per worker thread"""
+        scraper = getattr(self._local, 'scraper', None)
+        if scraper is None:
+            scraper = self._create_scraper()
+            self._local.scraper = scraper
+        return scraper
+    
     def _get_page(self, scraper, url: str, max_retries: int = 3) -> Optional[str]:
-        """Fetch page with retries"""
+        """Fetch page with retries, paced and backed off by the shared rate controller"""
         for attempt in range(max_retries):
+            with self.metrics.time('pacing'):
+                self.rate.acquire()
+            start = time.monotonic()
+            outcome, retry_after = ERROR, None
             try:
-                with self.stats_lock:
-                    self.requests_made += 1
+                self.metrics.inc('requests_made')
                 
                 response = scraper.get(url, timeout=30)
                 
                 if "Just a moment" in response.text:
                     self.logger.warning(f"Cloudflare challenge on {url}")
-                    time.sleep(5)
+                    outcome = CHALLENGE
                     continue
                 
-                if response.status_code == 200:
-                    return response.text
-                
                 if response.status_code == 429:
-                    self.logger.warning("Rate limited, sleeping 30s")
-                    time.sleep(30)
+                    outcome = THROTTLED
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    self.logger.warning(f"Rate limited on {url}, backing off")
                     continue
                 
-                with self.stats_lock:
-                    self.requests_failed += 1
-                time.sleep(2)
+                outcome = ERROR if response.status_code >= 500 else OK
+                if response.status_code == 200:
+                    return response.text
+                
+                self.metrics.inc('requests_failed')
                 
             except Exception as e:
                 self.logger.error(f"Error fetching {url}: {e}")
-                time.sleep(2)
+            
+            finally:
+                latency = time.monotonic() - start
+                self.metrics.observe('fetch', latency)
+                self.rate.release(outcome, latency, retry_after)
         
         return None
     
@@ -234,8 +291,6 @@ class VozCrawler:
         if not html:
             return [], 0
         
-        time.sleep(random.uniform(*self.delay_range))
-        
         soup = BeautifulSoup(html, 'lxml')
         threads = []
         total_on_page = 0
@@ -258,14 +313,15 @@ class VozCrawler:
             threads.append({
                 'title': title_elem.get_text(strip=True),
                 'url': self.BASE_URL + href,
-                'thread_id': thread_id
+                'thread_id': thread_id,
+                'forum': forum_url.split('/')[2]
             })
         
         return threads, total_on_page
     
     def crawl_thread(self, thread: dict, max_thread_pages: int = 10) -> List[dict]:
         """Crawl a single thread (multiple pages)"""
-        scraper = self._create_scraper()
+        scraper = self._get_scraper()
         documents = []
         base_url = thread['url']
         
@@ -281,6 +337,7 @@ class VozCrawler:
                 if not html:
                     break
                 
+                parse_start = time.perf_counter()
                 soup = BeautifulSoup(html, 'lxml')
                 posts_found = 0
                 
@@ -311,9 +368,11 @@ class VozCrawler:
                                 'thread_id': thread['thread_id'],
                                 'thread_title': thread['title'],
                                 'content': content,
+                                'content_clean': normalize_text(content),
                                 'author': author,
                                 'timestamp': timestamp,
                                 'source': 'voz',
+                                'forum': thread.get('forum'),
                                 'url': f"{self.BASE_URL}/p/{post_id}/",
                                 'word_count': word_count
                             }
@@ -327,11 +386,9 @@ class VozCrawler:
                 
                 # Check for next page
                 next_btn = soup.select_one('a.pageNav-jump--next')
+                self.metrics.observe('parse', time.perf_counter() - parse_start)
                 if not next_btn:
                     break
-                    
-                # Small delay between thread pages
-                time.sleep(random.uniform(0.1, 0.2))
             
             self.checkpoint.add_thread(thread['thread_id'])
             
@@ -340,8 +397,43 @@ class VozCrawler:
         
         return documents
     
+    def _list_forum_page(self, forum_url: str, page: int) -> tuple:
+        """Frontier callback: thread list of one forum listing page"""
+        self.logger.info(f"📂 Crawling {forum_url.split('/')[2]} page {page}")
+        return self.get_thread_list(self._get_scraper(), forum_url, page)
+    
+    def _start_metrics(self) -> list:
+        """Metrics endpoint (port + shard index) and snapshot writer, if configured"""
+        reporters = []
+        if self.metrics_port:
+            server = MetricsServer(self.metrics, self.metrics_port + self.shard.index)
+            server.start()
+            self.logger.info(f"📈 Metrics: {server.url}")
+            reporters.append(server)
+        if self.metrics_snapshot:
+            writer = SnapshotWriter(self.metrics, self.shard.path(self.metrics_snapshot))
+            writer.start()
+            reporters.append(writer)
+        return reporters
+    
+    def _save_resume_point(self, frontier: ListingFrontier):
+        """Checkpoint the first forum/page that still has unfinished threads"""
+        with self.metrics.time('checkpoint'):
+            self._save_checkpoint(frontier)
+    
+    def _save_checkpoint(self, frontier: ListingFrontier):
+        resume_pages = frontier.resume_pages()
+        for forum_url in self.FORUMS:
+            if forum_url in resume_pages:
+                self.checkpoint.last_forum = forum_url
+                self.checkpoint.last_page = resume_pages[forum_url]
+                break
+        self.checkpoint.total_docs = self.total_docs
+        self.checkpoint.save()
+    
     def crawl(self, target_docs: int = 600000, output_file: str = 'data/voz_lightning.jsonl'):
-        """Main crawl function"""
+        """Main crawl function (sharded crawls write <name>.shard-i-of-N.jsonl)"""
+        output_file = self.shard.path(output_file)
         os.makedirs(os.path.dirname(output_file), exist_ok=True)
         
         # Load checkpoint
@@ -357,6 +449,11 @@ class VozCrawler:
         
         self.logger.info(f"🚀 Starting crawler at {start_time.strftime('%H:%M:%S')}")
         self.logger.info(f"🔧 Workers: {self.num_workers}")
+        
+        # This shard's forums (all of them when unsharded) and their listing pages
+        page_slices = dict(self.shard.assign(self.FORUMS))
+        if self.shard.is_sharded:
+            self.logger.info(f"🧩 Shard {self.shard}: {len(page_slices)} forums")
         self.logger.info(f"🎯 Target: {target_docs:,} documents")
         
         # Test connection
@@ -384,68 +481,81 @@ class VozCrawler:
         
         with open(output_file, mode, encoding='utf-8') as f:
             with tqdm(total=target_docs, initial=self.total_docs, desc="Documents") as pbar:
+                # Forums in order from the resume point, listed ahead by the frontier
+                max_pages = 5000  # per forum, increased for 1M+ target
+                frontier = ListingFrontier(
+                    self._list_forum_page,
+                    [(forum_url, page_slices[forum_url],
+                      page_slices[forum_url].first(start_page if forum_idx == start_forum_idx else 1), max_pages)
+                     for forum_idx, forum_url in enumerate(self.FORUMS)
+                     if forum_idx >= start_forum_idx and forum_url in page_slices],
+                    max_queued=500,
+                    logger=self.logger
+                )
+                futures = {}
+                saved_at_pages = 0
+                
+                self.metrics.gauge('docs_total', lambda: self.total_docs)
+                self.metrics.gauge('frontier_queued', lambda: frontier.queued)
+                self.metrics.gauge('threads_in_flight', lambda: len(futures))
+                self.metrics.gauge('request_rate', lambda: self.rate.rate)
+                reporters = self._start_metrics()
+                
                 with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+                    frontier.start()
                     
-                    for forum_idx, forum_url in enumerate(self.FORUMS):
-                        if forum_idx < start_forum_idx:
+                    while self.total_docs < target_docs:
+                        # Keep every worker busy, waiting on the frontier only when idle
+                        while len(futures) < self.num_workers * 2:
+                            item = frontier.get(timeout=None if not futures else 0)
+                            if item is None:
+                                break
+                            futures[executor.submit(self.crawl_thread, item.thread)] = item
+                        
+                        if not futures:
+                            if frontier.exhausted:
+                                break
                             continue
-                        if self.total_docs >= target_docs:
-                            break
                         
-                        page = start_page if forum_idx == start_forum_idx else 1
-                        start_page = 1  # Reset for next forums
-                        max_pages = 5000  # Increased for 1M+ target
+                        done, _ = wait(futures, timeout=1.0, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            item = futures.pop(future)
+                            try:
+                                docs = future.result()
+                                for doc in docs:
+                                    with self.file_lock, self.metrics.time('write'):
+                                        f.write(json.dumps(doc, ensure_ascii=False) + '\n')
+                                        f.flush()
+                                    
+                                    with self.stats_lock:
+                                        self.total_docs += 1
+                                    pbar.update(1)
+                                self.metrics.inc('docs_written', len(docs))
+                                    
+                            except Exception as e:
+                                pass
+                            frontier.task_done(item)
                         
-                        while page <= max_pages and self.total_docs < target_docs:
-                            self.logger.info(f"📂 Crawling {forum_url.split('/')[2]} page {page}")
-                            
-                            threads, total_on_page = self.get_thread_list(scraper, forum_url, page)
-                            
-                            if total_on_page == 0:
-                                self.logger.info(f"   End of forum at page {page}")
-                                break
-                            
-                            if not threads:
-                                page += 1
-                                continue
-                            
-                            # Submit threads to workers
-                            futures = {executor.submit(self.crawl_thread, t): t for t in threads[:20]}
-                            
-                            for future in as_completed(futures):
-                                if self.total_docs >= target_docs:
-                                    break
-                                
-                                try:
-                                    docs = future.result(timeout=60)
-                                    for doc in docs:
-                                        with self.file_lock:
-                                            f.write(json.dumps(doc, ensure_ascii=False) + '\n')
-                                            f.flush()
-                                        
-                                        with self.stats_lock:
-                                            self.total_docs += 1
-                                        pbar.update(1)
-                                        
-                                except Exception as e:
-                                    continue
-                            
-                            # Save checkpoint periodically
-                            if page % 10 == 0:
-                                self.checkpoint.total_docs = self.total_docs
-                                self.checkpoint.last_forum = forum_url
-                                self.checkpoint.last_page = page
-                                self.checkpoint.save()
-                                self.logger.info(f"💾 Checkpoint saved: {self.total_docs:,} docs (page {page})")
-                            
-                            page += 1
+                        # Save checkpoint every 10 listing pages
+                        if frontier.pages_listed - saved_at_pages >= 10:
+                            saved_at_pages = frontier.pages_listed
+                            self._save_resume_point(frontier)
+                            self.logger.info(f"💾 Checkpoint saved: {self.total_docs:,} docs "
+                                             f"(page {self.checkpoint.last_page}, {self.rate.rate:.1f} req/s; "
+                                             f"{self.metrics.stage_summary()})")
+                    
+                    for future in futures:
+                        future.cancel()
+                    frontier.stop()
         
         # Final checkpoint
-        self.checkpoint.total_docs = self.total_docs
-        self.checkpoint.save()
+        self._save_resume_point(frontier)
+        for reporter in reporters:
+            reporter.stop()
         
         duration = (datetime.now() - start_time).total_seconds() / 60
         self.logger.info(f"\n✅ Crawl completed! {self.total_docs:,} documents in {duration:.1f} minutes")
+        self.logger.info(f"⏱️  Stage time: {self.metrics.stage_summary()}")
         self.logger.info(f"📁 Output: {output_file}")
 
 
@@ -456,13 +566,21 @@ def main():
     parser.add_argument('--output', type=str, default='data/voz_lightning.jsonl', help='Output file')
     parser.add_argument('--min-words', type=int, default=50, help='Minimum word count')
     parser.add_argument('--start-page', type=int, default=1, help='Start from this page (skip earlier pages)')
+    parser.add_argument('--shard', default=None, metavar='i/N', help='Crawl shard i of N (0-based) with its own checkpoint and output')
+    parser.add_argument('--max-rate', type=float, default=100.0, help='Upper bound for the adaptive request rate (req/s)')
+    parser.add_argument('--metrics-port', type=int, default=0, help='Serve Prometheus metrics on 127.0.0.1:PORT/metrics')
+    parser.add_argument('--metrics-snapshot', default=None, metavar='PATH', help='Append a JSON metrics snapshot to PATH every 10s')
     
     args = parser.parse_args()
     
     crawler = VozCrawler(
         num_workers=args.workers,
         min_word_count=args.min_words,
-        start_page=args.start_page
+        start_page=args.start_page,
+        max_rate=args.max_rate,
+        shard=ShardSpec.parse(args.shard),
+        metrics_port=args.metrics_port,
+        metrics_snapshot=args.metrics_snapshot
     )
     
     crawler.crawl(target_docs=args.target, output_file=args.output)
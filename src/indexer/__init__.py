@@ -1,4 +1,21 @@
 """
 Milestone 2: Indexing
 SPIMI algorithm implementation
+
+Usage:
+    # Word-segment the crawled posts (content_segmented), all cores
+    python -m src.indexer.segment_corpus data/voz_1m.jsonl data/voz_1m_segmented.jsonl
+
+    # Build the inverted index from the crawler output (bounded memory),
+    # with term positions for phrase queries
+    python -m src.indexer.spimi data/voz_1m.jsonl data/index --memory-mb 512 --store-docs --positions --filters
+
+    # Count documents matching metadata filters (index built with --filters)
+    python -m src.indexer.filters data/index --forum xe-may.175 --since 2024-06-01
+
+    # Fetch stored documents by docno (result rendering)
+    python -m src.indexer.doc_store get data/index 0 42
+
+    # Look terms up (memory-mapped, nothing loaded up front)
+    python -m src.indexer.index_reader data/index "xe máy"
 """
@@ -0,0 +1,256 @@
+"""
+Random-access document store aligned with index docnos
+
+A compressed, block-chunked copy of the corpus for rendering results
+(title, author, url, snippet) without scanning the JSONL:
+
+    docs.dat   zlib blocks, each holding the JSON lines of DOCS_PER_BLOCK
+               consecutive documents
+    docs.idx   uint64 byte offset of every block in docs.dat, plus the end
+               offset (num_blocks + 1 entries)
+
+Document n lives in block n // DOCS_PER_BLOCK at line n % DOCS_PER_BLOCK,
+so the offset array is all the index there is: fetching a document is one
+read of a block of a few KB and one decompress. get_many() decompresses
+each block once for all the hits in it, and recently used blocks are kept.
+
+Docnos are the SPIMI docnos when the store is built from the same inputs
+in the same order: `spimi.py --store-docs` writes it during the index
+build, or build it afterwards with this module.
+
+Usage:
+    python -m src.indexer.doc_store build data/voz_1m.jsonl data/index
+    python -m src.indexer.doc_store get data/index 0 42 1000
+
+    with DocStore('data/index') as store:
+        doc = store.get(42)
+"""
+
+import json
+import mmap
+import os
+import struct
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Sequence
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DOCS_PER_BLOCK = 32
+OFFSET = struct.Struct('<Q')
+
+
+def _dumps(doc: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(doc)
+    return json.dumps(doc, ensure_ascii=False).encode('utf-8')
+
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+class DocStoreWriter:
+    """Appends documents in docno order into docs.dat / docs.idx"""
+
+    def __init__(self, directory: str, docs_per_block: int = DOCS_PER_BLOCK, compression_level: int = 6):
+        """
+        Args:
+            directory: Store directory (usually the index directory)
+            docs_per_block: Documents per compressed block (larger = better ratio, slower fetch)
+            compression_level: zlib level
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.docs_per_block = docs_per_block
+        self.compression_level = compression_level
+        self._data = open(os.path.join(directory, 'docs.dat'), 'wb', buffering=1024 * 1024)
+        self._index = open(os.path.join(directory, 'docs.idx'), 'wb', buffering=1024 * 1024)
+        self._offset = 0
+        self._block: List[bytes] = []
+        self.num_docs = 0
+        self._index.write(OFFSET.pack(0))
+
+    def add(self, doc: dict):
+        """Store the next document (docno = number of documents added before it)"""
+        self._block.append(_dumps(doc))
+        self.num_docs += 1
+        if len(self._block) >= self.docs_per_block:
+            self._flush_block()
+
+    def _flush_block(self):
+        if not self._block:
+            return
+        data = zlib.compress(b'\n'.join(self._block), self.compression_level)
+        self._data.write(data)
+        self._offset += len(data)
+        self._index.write(OFFSET.pack(self._offset))
+        self._block = []
+
+    def close(self):
+        self._flush_block()
+        self._data.close()
+        self._index.close()
+        with open(os.path.join(self.directory, 'docs.json'), 'w', encoding='utf-8') as f:
+            json.dump({'num_docs': self.num_docs, 'docs_per_block': self.docs_per_block,
+                       'codec': 'zlib'}, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class DocStore:
+    """Read-only random access to stored documents by docno"""
+
+    def __init__(self, directory: str, cache_blocks: int = 64):
+        """
+        Args:
+            directory: Directory written by DocStoreWriter
+            cache_blocks: Decompressed blocks kept for repeated fetches
+        """
+        with open(os.path.join(directory, 'docs.json'), encoding='utf-8') as f:
+            info = json.load(f)
+        self.num_docs: int = info['num_docs']
+        self.docs_per_block: int = info['docs_per_block']
+
+        with open(os.path.join(directory, 'docs.idx'), 'rb') as f:
+            self._index_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets = memoryview(self._index_map).cast('Q')
+        with open(os.path.join(directory, 'docs.dat'), 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+        self._cache: 'OrderedDict[int, List[bytes]]' = OrderedDict()
+        self._cache_blocks = cache_blocks
+
+    def _lines(self, block: int) -> List[bytes]:
+        lines = self._cache.get(block)
+        if lines is not None:
+            self._cache.move_to_end(block)
+            return lines
+        start, end = self._offsets[block], self._offsets[block + 1]
+        lines = zlib.decompress(self._data[start:end]).split(b'\n')
+        self._cache[block] = lines
+        if len(self._cache) > self._cache_blocks:
+            self._cache.popitem(last=False)
+        return lines
+
+    def get(self, docno: int) -> dict:
+        """Document by docno (IndexError if out of range)"""
+        if not 0 <= docno < self.num_docs:
+            raise IndexError(f"docno {docno} out of range (0..{self.num_docs - 1})")
+        block, line = divmod(docno, self.docs_per_block)
+        return _loads(self._lines(block)[line])
+
+    def get_many(self, docnos: Iterable[int]) -> List[dict]:
+        """Documents in the given order, each block decompressed once"""
+        docnos = list(docnos)
+        by_block: Dict[int, List[int]] = {}
+        for docno in docnos:
+            if not 0 <= docno < self.num_docs:
+                raise IndexError(f"docno {docno} out of range (0..{self.num_docs - 1})")
+            by_block.setdefault(docno // self.docs_per_block, []).append(docno)
+        docs = {}
+        for block in sorted(by_block):
+            lines = self._lines(block)
+            for docno in by_block[block]:
+                docs[docno] = _loads(lines[docno % self.docs_per_block])
+        return [docs[docno] for docno in docnos]
+
+    def __len__(self) -> int:
+        return self.num_docs
+
+    def close(self):
+        self._offsets.release()
+        self._index_map.close()
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def make_snippet(text: str, terms: Sequence[str], width: int = 200) -> str:
+    """Window of about `width` characters around the first query term found in text"""
+    if not text:
+        return ''
+    lowered = text.lower()
+    hits = [pos for pos in (lowered.find(term) for term in terms if term) if pos >= 0]
+    start = max(0, min(hits) - width // 4) if hits else 0
+    if start:
+        # Do not start mid-word
+        space = text.rfind(' ', 0, start)
+        start = space + 1 if space >= 0 else start
+    end = min(len(text), start + width)
+    if end < len(text):
+        space = text.rfind(' ', start, end)
+        end = space if space > start else end
+    return f"{'…' if start else ''}{text[start:end]}{'…' if end < len(text) else ''}"
+
+
+def build_doc_store(inputs: Sequence[str], directory: str, docs_per_block: int = DOCS_PER_BLOCK) -> int:
+    """Store every document of the inputs in order, returns the document count"""
+    from ..crawler.corpus_io import iter_documents
+
+    with DocStoreWriter(directory, docs_per_block) as writer:
+        for path in inputs:
+            for doc in iter_documents(path):
+                writer.add(doc)
+    return writer.num_docs
+
+
+def main():
+    import argparse
+    import glob
+    import time
+
+    parser = argparse.ArgumentParser(description='Build or read the random-access document store')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = commands.add_parser('build', help='Store crawler outputs (same order as the index build)')
+    build_parser.add_argument('inputs', nargs='+', help='Crawler outputs: .jsonl files or .parquet directories (globs allowed)')
+    build_parser.add_argument('directory', help='Index directory')
+    build_parser.add_argument('--docs-per-block', type=int, default=DOCS_PER_BLOCK)
+
+    get_parser = commands.add_parser('get', help='Print documents by docno')
+    get_parser.add_argument('directory')
+    get_parser.add_argument('docnos', nargs='+', type=int)
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        inputs: List[str] = []
+        for pattern in args.inputs:
+            inputs.extend(sorted(glob.glob(pattern)) or [pattern])
+        start = time.time()
+        count = build_doc_store(inputs, args.directory, args.docs_per_block)
+        size = os.path.getsize(os.path.join(args.directory, 'docs.dat'))
+        print(f"✅ Stored {count:,} docs in {args.directory} ({size / 1024 ** 2:,.1f} MB, "
+              f"{time.time() - start:.1f}s)")
+        meta_path = os.path.join(args.directory, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding='utf-8') as f:
+                indexed = json.load(f)['num_docs']
+            if indexed != count:
+                print(f"⚠️  Index has {indexed:,} docs: docnos will not line up, use the index inputs")
+        return
+
+    with DocStore(args.directory) as store:
+        start = time.perf_counter()
+        docs = store.get_many(args.docnos)
+        elapsed = (time.perf_counter() - start) * 1000
+        for docno, doc in zip(args.docnos, docs):
+            print(json.dumps({'docno': docno, **doc}, ensure_ascii=False))
+        print(f"⏱️  {len(docs)} docs in {elapsed:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
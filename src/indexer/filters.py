@@ -0,0 +1,390 @@
+"""
+Metadata filter indexes: source, forum, thread, author and date range
+
+Search is almost always filtered ("only voz", "only this author", "only
+the last 30 days"), so filters are evaluated inside retrieval: BM25 asks a
+DocSet for the next allowed docno and skips every posting before it
+instead of scoring documents and post-filtering the top k.
+
+Categorical fields keep one container per value, chosen like Roaring
+containers: values in more than 1/32 of the documents get a bitmap
+(num_docs bits), rarer values a sorted uint32 docno array, whichever is
+smaller. Bitmaps combine with big-int AND/OR, arrays with bisect. The
+timestamp is kept as a sorted date column (docnos ordered by time), so a
+date range is two binary searches and a slice of docnos.
+
+select() combines the clauses into one bitmap or array up front, so
+retrieval only pays a bit test or a bisect per skip, and keeps recent
+selections in an LRU cache: dashboards and alerts repeat the same filters
+("only voz, last 30 days") across many queries.
+
+    filters/<field>.bin    containers of the field's values, concatenated
+    filters/<field>.json   value -> [offset, length, count] (loaded on first use)
+    filters/dates.bin      int64 unix time of every dated document, ascending
+    filters/dates.idx      uint32 docno of each dates.bin entry
+
+Usage:
+    python -m src.indexer.filters data/index --forum xe-may.175 --since 2024-06-01
+
+    with FilterIndex('data/index') as filters:
+        docs = filters.select(source='voz', author=['abc', 'xyz'], since='2024-06-01')
+        docs.next_geq(1000), 1234 in docs
+"""
+
+import bisect
+import json
+import mmap
+import os
+import re
+import sys
+from abc import ABC, abstractmethod
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Union
+
+from .postings import NO_MORE_DOCS, _from_le, _le
+
+FILTER_FIELDS = ('source', 'forum', 'thread_id', 'author')
+TIME_FIELD = 'timestamp'
+MIN_TIME = -(1 << 63)
+MAX_TIME = (1 << 63) - 1
+
+# A value gets a bitmap once its docno array would be larger
+BITMAP_DENSITY = 32
+
+_NONZERO = re.compile(b'[^\x00]')
+
+
+def parse_time(value: Optional[str]) -> Optional[int]:
+    """Unix seconds of an ISO date or timestamp ('2024-07-17', '2024-07-17T10:00:00+0700'), None if invalid"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def _map(path: str):
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class DocSet(ABC):
+    """Set of docnos that retrieval can test (docno in docs) and skip through (next_geq)"""
+
+    __slots__ = ('count',)
+
+    @abstractmethod
+    def __contains__(self, docno: int) -> bool:
+        ...
+
+    @abstractmethod
+    def next_geq(self, docno: int) -> int:
+        """Smallest member >= docno, NO_MORE_DOCS if none"""
+
+
+class ArrayDocSet(DocSet):
+    """Sorted docnos (sparse values)"""
+
+    __slots__ = ('docnos',)
+
+    def __init__(self, docnos: Sequence[int]):
+        self.docnos = docnos
+        self.count = len(docnos)
+
+    def __contains__(self, docno: int) -> bool:
+        i = bisect.bisect_left(self.docnos, docno)
+        return i < self.count and self.docnos[i] == docno
+
+    def next_geq(self, docno: int) -> int:
+        i = bisect.bisect_left(self.docnos, docno)
+        return self.docnos[i] if i < self.count else NO_MORE_DOCS
+
+
+class BitmapDocSet(DocSet):
+    """Little-endian bitmap, bit n = docno n (dense values)"""
+
+    __slots__ = ('bits',)
+
+    def __init__(self, bits: bytes, count: int = None):
+        self.bits = bits
+        self.count = int.from_bytes(bits, 'little').bit_count() if count is None else count
+
+    def __contains__(self, docno: int) -> bool:
+        byte = docno >> 3
+        return byte < len(self.bits) and (self.bits[byte] >> (docno & 7)) & 1 == 1
+
+    def next_geq(self, docno: int) -> int:
+        byte = docno >> 3
+        if byte >= len(self.bits):
+            return NO_MORE_DOCS
+        rest = self.bits[byte] >> (docno & 7)
+        if rest:
+            return docno + ((rest & -rest).bit_length() - 1)
+        # Next nonzero byte, searched in C
+        match = _NONZERO.search(self.bits, byte + 1)
+        if match is None:
+            return NO_MORE_DOCS
+        value = self.bits[match.start()]
+        return match.start() * 8 + ((value & -value).bit_length() - 1)
+
+
+def _bitmap(docnos: Sequence[int], num_docs: int) -> bytearray:
+    bits = bytearray((num_docs + 7) // 8)
+    for docno in docnos:
+        bits[docno >> 3] |= 1 << (docno & 7)
+    return bits
+
+
+def _compact(bits: int, num_docs: int) -> DocSet:
+    """DocSet of a big-int bitmap"""
+    return BitmapDocSet(bits.to_bytes((num_docs + 7) // 8, 'little'), bits.bit_count())
+
+
+def union(sets: Sequence[DocSet], num_docs: int) -> DocSet:
+    """Documents in any of the sets (values of one field)"""
+    if len(sets) == 1:
+        return sets[0]
+    if all(isinstance(docs, ArrayDocSet) for docs in sets) and \
+            sum(docs.count for docs in sets) * BITMAP_DENSITY <= num_docs:
+        return ArrayDocSet(sorted(set().union(*(docs.docnos for docs in sets))))
+    merged = 0
+    for docs in sets:
+        if isinstance(docs, BitmapDocSet):
+            merged |= int.from_bytes(docs.bits, 'little')
+        else:
+            merged |= int.from_bytes(_bitmap(docs.docnos, num_docs), 'little')
+    return _compact(merged, num_docs)
+
+
+def intersection(sets: Sequence[DocSet], num_docs: int) -> DocSet:
+    """Documents in all of the sets (different fields)"""
+    if len(sets) == 1:
+        return sets[0]
+    arrays = [docs for docs in sets if isinstance(docs, ArrayDocSet)]
+    if arrays:
+        # The result is at most as large as the smallest array
+        smallest = min(arrays, key=lambda docs: docs.count)
+        others = [docs for docs in sets if docs is not smallest]
+        return ArrayDocSet([docno for docno in smallest.docnos if all(docno in docs for docs in others)])
+    merged = int.from_bytes(sets[0].bits, 'little')
+    for docs in sets[1:]:
+        merged &= int.from_bytes(docs.bits, 'little')
+    return _compact(merged, num_docs)
+
+
+class FilterIndexWriter:
+    """Collects filter fields and timestamps by docno, writes filters/ on close"""
+
+    def __init__(self, directory: str, fields: Sequence[str] = FILTER_FIELDS, time_field: str = TIME_FIELD):
+        """
+        Args:
+            directory: Index directory (filters/ is created in it)
+            fields: Categorical document fields to index
+            time_field: ISO timestamp field for date ranges
+        """
+        self.directory = os.path.join(directory, 'filters')
+        self.fields = list(fields)
+        self.time_field = time_field
+        self._values: Dict[str, Dict[str, array]] = {field: {} for field in self.fields}
+        self._times = array('q')  # by docno, MIN_TIME if undated
+        self.num_docs = 0
+
+    def add(self, doc: dict):
+        """Filter values of the next document (docno = number of documents added before it)"""
+        docno = self.num_docs
+        for field in self.fields:
+            value = doc.get(field)
+            if value:
+                docnos = self._values[field].get(value)
+                if docnos is None:
+                    self._values[field][value] = array('I', (docno,))
+                else:
+                    docnos.append(docno)
+        parsed = parse_time(doc.get(self.time_field))
+        self._times.append(MIN_TIME if parsed is None else parsed)
+        self.num_docs += 1
+
+    def close(self):
+        os.makedirs(self.directory, exist_ok=True)
+        bitmap_bytes = (self.num_docs + 7) // 8
+        for field, values in self._values.items():
+            entries = {}
+            offset = 0
+            with open(os.path.join(self.directory, f'{field}.bin'), 'wb', buffering=1024 * 1024) as f:
+                for value in sorted(values):
+                    docnos = values[value]
+                    if len(docnos) * BITMAP_DENSITY > self.num_docs:
+                        bits = bytearray(bitmap_bytes)
+                        for docno in docnos:
+                            bits[docno >> 3] |= 1 << (docno & 7)
+                        data = bytes(bits)
+                    else:
+                        data = _le(docnos)
+                    f.write(data)
+                    entries[value] = [offset, len(data), len(docnos)]
+                    offset += len(data)
+            with open(os.path.join(self.directory, f'{field}.json'), 'w', encoding='utf-8') as f:
+                json.dump(entries, f, ensure_ascii=False)
+
+        times = self._times
+        dated = sorted((docno for docno in range(self.num_docs) if times[docno] != MIN_TIME), key=times.__getitem__)
+        with open(os.path.join(self.directory, 'dates.bin'), 'wb') as f:
+            f.write(_le(array('q', (times[docno] for docno in dated))))
+        with open(os.path.join(self.directory, 'dates.idx'), 'wb') as f:
+            f.write(_le(array('I', dated)))
+        with open(os.path.join(self.directory, 'filters.json'), 'w', encoding='utf-8') as f:
+            json.dump({'num_docs': self.num_docs, 'fields': self.fields, 'time_field': self.time_field,
+                       'dated': len(dated), 'bitmap_density': BITMAP_DENSITY}, f, indent=2)
+
+
+class FilterIndex:
+    """Memory-mapped filter indexes of an index directory"""
+
+    def __init__(self, directory: str, cache_size: int = 64):
+        """
+        Args:
+            directory: Index directory built with filters (spimi.py --filters)
+            cache_size: Recent select() results kept
+        """
+        self.directory = os.path.join(directory, 'filters')
+        with open(os.path.join(self.directory, 'filters.json'), encoding='utf-8') as f:
+            info = json.load(f)
+        self.num_docs: int = info['num_docs']
+        self.fields: List[str] = info['fields']
+        self._maps = {}
+        self._entries: Dict[str, Dict[str, list]] = {}
+        for name in ('dates.bin', 'dates.idx'):
+            self._maps[name] = _map(os.path.join(self.directory, name))
+        if sys.byteorder == 'little':
+            self._dates = memoryview(self._maps['dates.bin']).cast('B').cast('q')
+            self._date_docnos = memoryview(self._maps['dates.idx']).cast('B').cast('I')
+        else:
+            self._dates = memoryview(_from_le(self._maps['dates.bin'], 'q'))
+            self._date_docnos = memoryview(_from_le(self._maps['dates.idx']))
+        self._cache: 'OrderedDict[tuple, Optional[DocSet]]' = OrderedDict()
+        self._cache_size = cache_size
+
+    def _field(self, field: str) -> Dict[str, list]:
+        entries = self._entries.get(field)
+        if entries is None:
+            if field not in self.fields:
+                raise ValueError(f"No filter index for {field!r}, indexed: {', '.join(self.fields)}")
+            with open(os.path.join(self.directory, f'{field}.json'), encoding='utf-8') as f:
+                entries = self._entries[field] = json.load(f)
+            self._maps[field] = _map(os.path.join(self.directory, f'{field}.bin'))
+        return entries
+
+    def values(self, field: str) -> Dict[str, int]:
+        """Document count of every value of a field"""
+        return {value: entry[2] for value, entry in self._field(field).items()}
+
+    def value(self, field: str, value: str) -> DocSet:
+        """Documents whose field equals value"""
+        entry = self._field(field).get(value)
+        if entry is None:
+            return ArrayDocSet([])
+        offset, length, count = entry
+        data = self._maps[field][offset:offset + length]
+        if count * BITMAP_DENSITY > self.num_docs:
+            return BitmapDocSet(data, count)
+        return ArrayDocSet(_from_le(data))
+
+    def time_range(self, since: Union[str, int, None] = None, until: Union[str, int, None] = None) -> DocSet:
+        """Documents dated since <= time < until (ISO strings or unix seconds, None = unbounded)"""
+        lo = parse_time(since) if isinstance(since, str) else since
+        hi = parse_time(until) if isinstance(until, str) else until
+        if (since is not None and lo is None) or (until is not None and hi is None):
+            raise ValueError(f"Invalid date range: {since!r} .. {until!r}")
+        lo = MIN_TIME if lo is None else lo
+        hi = MAX_TIME if hi is None else hi
+        start = bisect.bisect_left(self._dates, lo)
+        end = max(bisect.bisect_left(self._dates, hi, start), start)
+        docnos = self._date_docnos[start:end]
+        if (end - start) * BITMAP_DENSITY > self.num_docs:
+            return BitmapDocSet(bytes(_bitmap(docnos, self.num_docs)), end - start)
+        return ArrayDocSet(sorted(docnos))
+
+    def select(self, since: Union[str, int, None] = None, until: Union[str, int, None] = None,
+               **fields: Union[str, Sequence[str], None]) -> Optional[DocSet]:
+        """
+        Documents matching every given clause, None if nothing is filtered
+
+        Args:
+            since: Earliest time (ISO date/timestamp or unix seconds)
+            until: Time bound, exclusive
+            fields: field=value or field=[values] (any of them), e.g. source='voz'
+        """
+        wanted = {field: tuple(sorted([values] if isinstance(values, str) else values))
+                  for field, values in fields.items() if values is not None}
+        key = (tuple(sorted(wanted.items())), since, until)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        clauses = [union([self.value(field, value) for value in values], self.num_docs)
+                   if values else ArrayDocSet([]) for field, values in wanted.items()]
+        if since is not None or until is not None:
+            clauses.append(self.time_range(since, until))
+        # A clause that keeps every document filters nothing
+        clauses = [docs for docs in clauses if docs.count < self.num_docs]
+        docs = intersection(clauses, self.num_docs) if clauses else None
+
+        self._cache[key] = docs
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return docs
+
+    def close(self):
+        for view in (self._dates, self._date_docnos):
+            view.release()
+        for mapped in self._maps.values():
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def main():
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Count documents matching metadata filters')
+    parser.add_argument('index', help='Index directory built with --filters')
+    for field in FILTER_FIELDS:
+        parser.add_argument(f"--{field.replace('_', '-')}", dest=field, action='append',
+                            help=f'{field} value (repeat for any of several)')
+    parser.add_argument('--since', help='Earliest date, e.g. 2024-06-01')
+    parser.add_argument('--until', help='Date bound (exclusive)')
+    parser.add_argument('--show', type=int, default=10, help='Docnos to print')
+    args = parser.parse_args()
+
+    with FilterIndex(args.index) as filters:
+        start = time.perf_counter()
+        docs = filters.select(args.since, args.until, **{field: getattr(args, field) for field in FILTER_FIELDS})
+        if docs is None:
+            print(f"🔎 No filter: all {filters.num_docs:,} docs")
+            return
+        docnos = []
+        docno = docs.next_geq(0)
+        while docno != NO_MORE_DOCS:
+            docnos.append(docno)
+            docno = docs.next_geq(docno + 1)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"🔎 {len(docnos):,} docs match ({type(docs).__name__}) in {elapsed:.1f} ms: "
+              f"{', '.join(map(str, docnos[:args.show]))}{' …' if len(docnos) > args.show else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Memory-mapped reader for indexes built by spimi.py
+
+Nothing is deserialized at open: terms.idx, terms.dat, postings.bin and
+the doc tables are memory-mapped, and a term is resolved by binary search
+over the fixed-size term records (comparing UTF-8 bytes, the order the
+merge wrote them in). Opening costs a few syscalls and RSS only grows
+with the pages of terms and postings actually read. Indexes built with
+--positions also map positions.bin, and their cursors give positions();
+--filters indexes open their filter indexes on first use (index.filters).
+
+    with InvertedIndex('data/index') as index:
+        cursor = index.postings('bitcoin')
+        for docno, tf in cursor:
+            print(index.doc_id(docno), tf, index.doc_length(docno))
+"""
+
+import json
+import mmap
+import os
+from collections import OrderedDict
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from ..crawler.text_normalizer import NORMALIZER_VERSION, normalize_text, phrase_terms
+from .filters import FilterIndex
+from .postings import PostingsCursor
+from .spimi import FORMAT_VERSION, TERM_RECORD
+from .tokenizer import tokenize
+
+
+class TermInfo(NamedTuple):
+    term_id: int
+    df: int
+    offset: int
+    length: int
+
+
+def _map(path: str):
+    """Read-only mmap of a file (empty files map to b'')"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class InvertedIndex:
+    """Read-only, lazily paged view of an on-disk inverted index"""
+
+    def __init__(self, directory: str, cache_size: int = 4096):
+        """
+        Args:
+            directory: Index directory written by SpimiIndexer
+            cache_size: Recently looked-up terms kept resolved
+        """
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Index format {self.meta.get('format_version')} in {directory}, "
+                             f"expected {FORMAT_VERSION}: rebuild it with spimi.py")
+        if self.meta.get('normalizer') != NORMALIZER_VERSION:
+            raise ValueError(f"Index text normalizer {self.meta.get('normalizer')} in {directory}, "
+                             f"queries use {NORMALIZER_VERSION}: rebuild it with spimi.py")
+
+        self.num_docs: int = self.meta['num_docs']
+        self.num_terms: int = self.meta['num_terms']
+        self.avg_doc_len: float = self.meta['avg_doc_len']
+
+        self._maps = {name: _map(os.path.join(directory, name)) for name in
+                      ('terms.idx', 'terms.dat', 'postings.bin', 'doclens.bin', 'docids.dat', 'docids.idx')}
+        self._term_records = self._maps['terms.idx']
+        self._term_bytes = self._maps['terms.dat']
+        self._postings = memoryview(self._maps['postings.bin'])
+        self._doclens = memoryview(self._maps['doclens.bin']).cast('B').cast('I')
+        self._docid_offsets = memoryview(self._maps['docids.idx']).cast('B').cast('Q')
+        self._docids = self._maps['docids.dat']
+
+        self.has_positions: bool = bool(self.meta.get('positions'))
+        self._positions = self._positions_offsets = None
+        if self.has_positions:
+            for name in ('positions.bin', 'positions.idx'):
+                self._maps[name] = _map(os.path.join(directory, name))
+            self._positions = memoryview(self._maps['positions.bin'])
+            self._positions_offsets = memoryview(self._maps['positions.idx']).cast('B').cast('Q')
+
+        self._cache: 'OrderedDict[str, Optional[TermInfo]]' = OrderedDict()
+        self._cache_size = cache_size
+        self._filters: Optional[FilterIndex] = None
+
+    def _term_at(self, term_id: int) -> bytes:
+        offset, length = TERM_RECORD.unpack_from(self._term_records, term_id * TERM_RECORD.size)[:2]
+        return self._term_bytes[offset:offset + length]
+
+    def _find(self, key: bytes) -> int:
+        """Index of the first term record >= key"""
+        lo, hi = 0, self.num_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def lookup(self, term: str) -> Optional[TermInfo]:
+        """Dictionary entry of a term, None if it is not indexed"""
+        if term in self._cache:
+            self._cache.move_to_end(term)
+            return self._cache[term]
+
+        key = term.encode('utf-8')
+        term_id = self._find(key)
+        info = None
+        if term_id < self.num_terms and self._term_at(term_id) == key:
+            _, _, df, offset, length = TERM_RECORD.unpack_from(self._term_records, term_id * TERM_RECORD.size)
+            info = TermInfo(term_id, df, offset, length)
+
+        self._cache[term] = info
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return info
+
+    def df(self, term: str) -> int:
+        info = self.lookup(term)
+        return info.df if info else 0
+
+    def postings(self, term: str) -> Optional[PostingsCursor]:
+        """Fresh cursor over a term's postings (with positions if indexed), None if the term is not indexed"""
+        info = self.lookup(term)
+        if info is None:
+            return None
+        positions = None
+        if self.has_positions:
+            start, end = self._positions_offsets[info.term_id], self._positions_offsets[info.term_id + 1]
+            positions = self._positions[start:end]
+        return PostingsCursor(self._postings[info.offset:info.offset + info.length], info.df, positions=positions)
+
+    def terms_with_prefix(self, prefix: str, limit: int = 20) -> List[str]:
+        """Indexed terms starting with prefix, in byte order (e.g. query completion)"""
+        key = prefix.encode('utf-8')
+        terms = []
+        term_id = self._find(key)
+        while term_id < self.num_terms and len(terms) < limit:
+            term = self._term_at(term_id)
+            if not term.startswith(key):
+                break
+            terms.append(term.decode('utf-8'))
+            term_id += 1
+        return terms
+
+    def doc_length(self, docno: int) -> int:
+        return self._doclens[docno]
+
+    def doc_id(self, docno: int) -> str:
+        start, end = self._docid_offsets[docno], self._docid_offsets[docno + 1]
+        return self._docids[start:end].decode('utf-8')
+
+    def analyze(self, text: str) -> List[str]:
+        """Query text -> index terms (same normalizer and tokenizer as the build)"""
+        return tokenize(normalize_text(text))
+
+    def analyze_phrase(self, text: str) -> List[Tuple[int, str]]:
+        """Phrase text -> (offset, term) to match in positions (expansions share their token's offset)"""
+        return phrase_terms(tokenize(normalize_text(text)))
+
+    @property
+    def filters(self) -> Optional[FilterIndex]:
+        """Metadata filter indexes, None if the index was built without --filters"""
+        if self._filters is None and self.meta.get('filters'):
+            self._filters = FilterIndex(self.directory)
+        return self._filters
+
+    @property
+    def doc_lengths(self) -> memoryview:
+        """Token count of every docno (uint32 view over doclens.bin)"""
+        return self._doclens
+
+    def iter_terms(self) -> Iterator[Tuple[str, int]]:
+        """(term, df) for the whole vocabulary, in byte order"""
+        for offset, length, df, _, _ in TERM_RECORD.iter_unpack(self._term_records):
+            yield self._term_bytes[offset:offset + length].decode('utf-8'), df
+
+    def close(self):
+        # Views on the maps have to go before the maps can close
+        self._postings.release()
+        self._doclens.release()
+        self._docid_offsets.release()
+        if self.has_positions:
+            self._positions.release()
+            self._positions_offsets.release()
+        if self._filters is not None:
+            self._filters.close()
+        for mapped in self._maps.values():
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def main():
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Look up terms in an on-disk index')
+    parser.add_argument('index', help='Index directory')
+    parser.add_argument('terms', nargs='+', help='Terms to look up')
+    parser.add_argument('--show', type=int, default=5, help='Postings to print per term')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = InvertedIndex(args.index)
+    print(f"📂 Opened {args.index} in {(time.perf_counter() - start) * 1000:.1f} ms: "
+          f"{index.num_docs:,} docs, {index.num_terms:,} terms")
+
+    for text in args.terms:
+        for term in index.analyze(text):
+            start = time.perf_counter()
+            cursor = index.postings(term)
+            if cursor is None:
+                print(f"   {term}: not indexed")
+                continue
+            shown = []
+            for docno, tf in cursor:
+                if len(shown) >= args.show:
+                    break
+                shown.append(f"{index.doc_id(docno)} (tf={tf})")
+            print(f"   {term}: df={cursor.df:,} ({(time.perf_counter() - start) * 1000:.2f} ms) {', '.join(shown)}")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,491 @@
+"""
+Compressed postings: delta gaps + VByte, in blocks with skip entries
+
+A term's postings (docno, tf) are cut into blocks of BLOCK_SIZE postings.
+Each block stores docno gaps (from the previous block's last docno) and
+tfs interleaved, VByte encoded (7 bits per byte, high bit = more bytes
+follow), so the common small gaps and tfs take one byte each.
+
+Lists longer than one block start with a skip table, one SKIP_ENTRY per
+block: (last docno, end offset of the block after the table, max tf, max
+tf / doc length as a RATIO_ONE fixed-point fraction, rounded up). A
+cursor decodes one block at a time and next_geq() jumps over whole blocks
+by binary search on the skip table, which is what makes intersections and
+WAND-style skipping cheap. The two maxima bound any tf-saturating score
+(BM25 for every k1, b) of a block without decoding it. Single-block lists
+have no skip table (most terms occur in a handful of documents).
+
+Positional indexes keep term positions in a parallel stream with the
+same blocking (encode_positions): per posting, its tf positions as gaps
+from the previous position in the document (the first one absolute),
+VByte encoded; multi-block lists start with one uint32 end offset per
+block. Positions are only decoded for the block of a document whose
+positions() are asked for, so phrase checks cost nothing for documents
+skipped by next_geq().
+
+    data = encode_postings(docnos_and_tfs, doclens)  # interleaved docno, tf
+    cursor = PostingsCursor(data, df)
+    cursor.next_geq(1000)                            # -> docno >= 1000 or NO_MORE_DOCS
+    cursor.docno, cursor.tf
+
+    cursor = PostingsCursor(data, df, positions=encode_positions(docnos_and_tfs, positions))
+    cursor.next_geq(1000)
+    cursor.positions()                               # -> [3, 17, 42]
+"""
+
+import bisect
+import io
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+from itertools import accumulate
+from typing import BinaryIO, Iterable, Iterator, List, Sequence, Tuple, Union
+
+BLOCK_SIZE = 128
+SKIP_ENTRY = struct.Struct('<IIII')  # last docno, block end offset, max tf, max tf/len
+POSITIONS_ENTRY = struct.Struct('<I')  # block end offset in the positions stream
+RATIO_ONE = 1 << 31  # fixed-point 1.0 for tf/len ratios (tf <= len)
+NO_MORE_DOCS = 1 << 32  # larger than any docno (uint32)
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def _le(values: array) -> bytes:
+    """Little-endian bytes of an int array (index files are little-endian on every host)"""
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_le(data: Buffer, typecode: str = 'I') -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def vbyte_encode(values: Sequence[int]) -> bytes:
+    """VByte (LEB128-style) encoding of non-negative ints"""
+    if not values:
+        return b''
+    if max(values) < 0x80:
+        return bytes(values)
+    out = bytearray()
+    append = out.append
+    for value in values:
+        while value >= 0x80:
+            append((value & 0x7F) | 0x80)
+            value >>= 7
+        append(value)
+    return bytes(out)
+
+
+def vbyte_decode(data: Buffer) -> List[int]:
+    """Decode a whole VByte buffer"""
+    if not data:
+        return []
+    if max(data) < 0x80:
+        return list(data)
+    values = []
+    append = values.append
+    value = shift = 0
+    for byte in data:
+        if byte & 0x80:
+            value |= (byte & 0x7F) << shift
+            shift += 7
+        else:
+            append(value | (byte << shift))
+            value = shift = 0
+    return values
+
+
+def _encode_block(chunk: Sequence[int], previous: int, doc_lengths: Sequence[int] = None) -> Tuple[bytes, bytes]:
+    """(VByte data, skip entry without the end offset) of one block of interleaved postings"""
+    values = list(chunk)
+    docnos = values[0::2]
+    values[0::2] = [docno - prev for docno, prev in zip(docnos, [previous] + docnos[:-1])]
+    tfs = values[1::2]
+    if doc_lengths is None:
+        ratio = RATIO_ONE
+    else:
+        ratio = max(-(-tf * RATIO_ONE // max(doc_lengths[docno], 1)) for docno, tf in zip(docnos, tfs))
+    return vbyte_encode(values), (docnos[-1], max(tfs), min(ratio, RATIO_ONE))
+
+
+def _encode_positions_block(tfs: Sequence[int], chunk: Sequence[int]) -> bytes:
+    """VByte data of the positions of one block (tfs of its postings, their positions)"""
+    chunk = list(chunk)
+    gaps = [position - previous for position, previous in zip(chunk, [0] + chunk[:-1])]
+    # Gaps restart at every document: its first position stays absolute
+    offset = 0
+    for tf in tfs:
+        gaps[offset] = chunk[offset]
+        offset += tf
+    return vbyte_encode(gaps)
+
+
+class PostingsListEncoder:
+    """
+    Encodes a postings list (and its positions) that arrives in runs
+
+    Only the current run and block are decoded: encoded blocks and table
+    entries are kept in memory up to spool_bytes, then spilled to
+    temporary files, so memory does not grow with the list. The output is
+    the same as encode_postings / encode_positions of the concatenated runs.
+    """
+
+    def __init__(self, doc_lengths: Sequence[int] = None, positions: bool = False,
+                 block_size: int = BLOCK_SIZE, spool_bytes: int = 4 * 1024 * 1024):
+        """
+        Args:
+            doc_lengths: Token count per docno, for the block max tf/len
+            positions: Also encode positions
+            block_size: Postings per block
+            spool_bytes: Encoded bytes of a list kept in memory before spilling to disk
+        """
+        self.doc_lengths = doc_lengths
+        self.positions = positions
+        self.block_size = block_size
+        self.spool_bytes = spool_bytes
+
+    def encode(self, runs: Iterable[Tuple[Sequence[int], Sequence[int]]],
+               postings_out: BinaryIO, positions_out: BinaryIO = None) -> Tuple[int, int, int]:
+        """
+        Encode one list into the output files
+
+        Args:
+            runs: (interleaved docno/tf postings, their positions) in docno order
+            postings_out: Receives the postings data
+            positions_out: Receives the positions data (positions=True)
+
+        Returns:
+            (df, postings bytes written, positions bytes written)
+        """
+        block_size = self.block_size
+        pending = array('I')
+        pending_positions = array('I')
+        df = 0
+        previous = 0
+        blocks = _ListSpool(self.spool_bytes)
+        positions = _ListSpool(self.spool_bytes) if self.positions else None
+        for postings, run_positions in runs:
+            pending.extend(postings)
+            if positions is not None:
+                pending_positions.extend(run_positions)
+            if len(pending) < 2 * block_size:
+                continue
+            start = position_start = 0
+            while len(pending) - start >= 2 * block_size:
+                chunk = pending[start:start + 2 * block_size]
+                previous = self._add_block(chunk, previous, blocks)
+                start += 2 * block_size
+                if positions is not None:
+                    tfs = chunk[1::2]
+                    count = sum(tfs)
+                    positions.add_entry(POSITIONS_ENTRY.pack(positions.add(_encode_positions_block(
+                        tfs, pending_positions[position_start:position_start + count]))))
+                    position_start += count
+            df += start // 2
+            del pending[:start]
+            del pending_positions[:position_start]
+        if pending:
+            previous = self._add_block(pending, previous, blocks)
+            df += len(pending) // 2
+            if positions is not None:
+                positions.add_entry(POSITIONS_ENTRY.pack(
+                    positions.add(_encode_positions_block(pending[1::2], pending_positions))))
+
+        postings_bytes = blocks.write_to(postings_out)
+        positions_bytes = positions.write_to(positions_out) if positions is not None else 0
+        return df, postings_bytes, positions_bytes
+
+    def _add_block(self, chunk: Sequence[int], previous: int, blocks: '_ListSpool') -> int:
+        data, (last, max_tf, ratio) = _encode_block(chunk, previous, self.doc_lengths)
+        end = blocks.add(data)
+        blocks.add_entry(SKIP_ENTRY.pack(last, end, max_tf, ratio))
+        return last
+
+
+class _ListSpool:
+    """Encoded blocks of one list and their table entries, spilled to temporary files past spool_bytes"""
+
+    def __init__(self, spool_bytes: int):
+        self.spool_bytes = spool_bytes
+        self.blocks = 0
+        self.end = 0
+        self.table = bytearray()
+        self.data = bytearray()
+        self._table_file = self._data_file = None
+
+    def add(self, data: bytes) -> int:
+        """Append one block, returns its end offset"""
+        self.blocks += 1
+        self.end += len(data)
+        self.data += data
+        if len(self.data) >= self.spool_bytes:
+            if self._data_file is None:
+                self._table_file = tempfile.TemporaryFile()
+                self._data_file = tempfile.TemporaryFile()
+            self._table_file.write(self.table)
+            self._data_file.write(self.data)
+            self.table.clear()
+            self.data.clear()
+        return self.end
+
+    def add_entry(self, entry: bytes):
+        """Table entry of the last block"""
+        self.table += entry
+
+    def write_to(self, out: BinaryIO) -> int:
+        """Write the list (table, then blocks; a single block has no table), returns its size"""
+        parts = [(self._table_file, self.table), (self._data_file, self.data)]
+        if self.blocks <= 1:
+            parts = parts[1:]
+        size = 0
+        for spilled, buffer in parts:
+            if spilled is not None:
+                size += spilled.tell()
+                spilled.seek(0)
+                shutil.copyfileobj(spilled, out)
+            out.write(buffer)
+            size += len(buffer)
+        for spilled in (self._table_file, self._data_file):
+            if spilled is not None:
+                spilled.close()
+        return size
+
+
+def encode_postings(postings: Sequence[int], doc_lengths: Sequence[int] = None,
+                    block_size: int = BLOCK_SIZE) -> bytes:
+    """
+    Encode interleaved (docno, tf) postings sorted by docno
+
+    Args:
+        postings: docno, tf, docno, tf, ...
+        doc_lengths: Token count per docno, for the block max tf/len
+            (without it the skip entries carry RATIO_ONE)
+        block_size: Postings per block
+    """
+    out = io.BytesIO()
+    PostingsListEncoder(doc_lengths, block_size=block_size).encode([(postings, ())], out)
+    return out.getvalue()
+
+
+def encode_positions(postings: Sequence[int], positions: Sequence[int], block_size: int = BLOCK_SIZE) -> bytes:
+    """
+    Encode the positions of interleaved (docno, tf) postings
+
+    Args:
+        postings: docno, tf, docno, tf, ...
+        positions: Every posting's tf positions (ascending), concatenated in posting order
+        block_size: Postings per block (same as the postings)
+    """
+    out = io.BytesIO()
+    PostingsListEncoder(positions=True, block_size=block_size).encode(
+        [(postings, positions)], io.BytesIO(), out)
+    return out.getvalue()
+
+
+def num_blocks(df: int, block_size: int = BLOCK_SIZE) -> int:
+    return -(-df // block_size)
+
+
+class PostingsCursor:
+    """
+    Lazy iterator over one encoded postings list
+
+    Starts before the first posting: call next() or next_geq() first.
+    `docno` is NO_MORE_DOCS once the list is exhausted. With the term's
+    encoded positions, positions() gives those of the current posting.
+    """
+
+    __slots__ = ('df', 'block_size', '_data', '_base', '_last_docnos', '_ends', '_max_tfs', '_max_ratios',
+                 '_block', '_docnos', '_tfs', '_pos', 'docno', 'tf',
+                 '_positions', '_positions_base', '_positions_ends', '_positions_block', '_positions_values',
+                 '_positions_starts')
+
+    def __init__(self, data: Buffer, df: int, block_size: int = BLOCK_SIZE, positions: Buffer = None):
+        self.df = df
+        self.block_size = block_size
+        self._data = memoryview(data)
+        blocks = num_blocks(df, block_size)
+        if blocks > 1:
+            table = self._data[:blocks * SKIP_ENTRY.size]
+            entries = list(SKIP_ENTRY.iter_unpack(table))
+            self._last_docnos = [entry[0] for entry in entries]
+            self._ends = [entry[1] for entry in entries]
+            self._max_tfs = [entry[2] for entry in entries]
+            self._max_ratios = [entry[3] for entry in entries]
+            self._base = len(table)
+        else:
+            self._last_docnos = None
+            self._ends = [len(self._data)]
+            self._max_tfs = None
+            self._max_ratios = None
+            self._base = 0
+        self._block = -1
+        self._docnos: List[int] = []
+        self._tfs: List[int] = []
+        self._pos = 0
+        self.docno = -1
+        self.tf = 0
+
+        self._positions = None if positions is None else memoryview(positions)
+        self._positions_block = -1
+        self._positions_values: List[int] = []
+        self._positions_starts: List[int] = []
+        if self._positions is None or blocks <= 1:
+            self._positions_base = 0
+            self._positions_ends = None if self._positions is None else [len(self._positions)]
+        else:
+            table = self._positions[:blocks * POSITIONS_ENTRY.size]
+            self._positions_base = len(table)
+            self._positions_ends = [entry[0] for entry in POSITIONS_ENTRY.iter_unpack(table)]
+
+    @property
+    def num_blocks(self) -> int:
+        return len(self._ends)
+
+    def _load_block(self, block: int):
+        start = self._base + (self._ends[block - 1] if block else 0)
+        values = vbyte_decode(self._data[start:self._base + self._ends[block]])
+        docno = self._last_docnos[block - 1] if block else 0
+        docnos = []
+        for gap in values[0::2]:
+            docno += gap
+            docnos.append(docno)
+        self._block = block
+        self._docnos = docnos
+        self._tfs = values[1::2]
+        self._pos = -1
+
+    def next(self) -> int:
+        """Advance to the next posting, returns its docno (NO_MORE_DOCS at the end)"""
+        if self.docno == NO_MORE_DOCS:
+            return NO_MORE_DOCS
+        self._pos += 1
+        if self._pos >= len(self._docnos):
+            if self._block + 1 >= len(self._ends):
+                self.docno, self.tf = NO_MORE_DOCS, 0
+                return NO_MORE_DOCS
+            self._load_block(self._block + 1)
+            self._pos = 0
+        self.docno = self._docnos[self._pos]
+        self.tf = self._tfs[self._pos]
+        return self.docno
+
+    def next_geq(self, target: int) -> int:
+        """Advance to the first posting with docno >= target (never moves backwards)"""
+        if self.docno >= target:
+            return self.docno
+        if self._docnos and target <= self._docnos[-1]:
+            # Inside the current block
+            pos = bisect.bisect_left(self._docnos, target, max(self._pos, 0))
+            self._pos = pos
+            self.docno = self._docnos[pos]
+            self.tf = self._tfs[pos]
+            return self.docno
+        block = self._block_for(target)
+        if block is None:
+            self.docno, self.tf = NO_MORE_DOCS, 0
+            return NO_MORE_DOCS
+        if block != self._block:
+            self._load_block(block)
+        pos = bisect.bisect_left(self._docnos, target, max(self._pos, 0))
+        self._pos = pos
+        self.docno = self._docnos[pos]
+        self.tf = self._tfs[pos]
+        return self.docno
+
+    def _block_for(self, target: int):
+        """First block (from the current one) whose last docno >= target, None if none"""
+        if self._last_docnos is None:
+            if self._block < 0:
+                self._load_block(0)
+            return 0 if self._docnos and self._docnos[-1] >= target else None
+        block = bisect.bisect_left(self._last_docnos, target, max(self._block, 0))
+        return block if block < len(self._last_docnos) else None
+
+    @property
+    def has_positions(self) -> bool:
+        return self._positions is not None
+
+    def positions(self) -> List[int]:
+        """Positions of the current posting, ascending (needs the positions stream)"""
+        if self._positions is None:
+            raise ValueError("Cursor has no positions: the index was built without them")
+        block = self._block
+        if block != self._positions_block:
+            ends = self._positions_ends
+            start = self._positions_base + (ends[block - 1] if block else 0)
+            self._positions_values = vbyte_decode(self._positions[start:self._positions_base + ends[block]])
+            self._positions_starts = [0]
+            self._positions_starts.extend(accumulate(self._tfs))
+            self._positions_block = block
+        start = self._positions_starts[self._pos]
+        return list(accumulate(self._positions_values[start:start + self.tf]))
+
+    # Block-level bounds, for block-max style skipping
+
+    def block_last_docno(self, block: int = None) -> int:
+        """Last docno of a block (default: the current one)"""
+        block = self._block if block is None else block
+        if self._last_docnos is None:
+            if self._block < 0:
+                self._load_block(0)
+            return self._docnos[-1]
+        return self._last_docnos[max(block, 0)]
+
+    def block_max_tf(self, block: int = None) -> int:
+        """Largest tf in a block (default: the current one)"""
+        block = self._block if block is None else block
+        if self._max_tfs is None:
+            if self._block < 0:
+                self._load_block(0)
+            return max(self._tfs)
+        return self._max_tfs[max(block, 0)]
+
+    def block_bounds(self, target: int) -> Tuple[int, int, int]:
+        """
+        (last docno, max tf, max tf/len ratio) of the block that would hold
+        target, without decoding it or moving the cursor; (NO_MORE_DOCS, 0, 0)
+        past the end. Single-block lists have no stored ratio: RATIO_ONE.
+        """
+        if self._last_docnos is None:
+            if self._block < 0:
+                self._load_block(0)
+            if self._docnos[-1] < target:
+                return NO_MORE_DOCS, 0, 0
+            if self._max_tfs is None:
+                self._max_tfs = [max(self._tfs)]
+            return self._docnos[-1], self._max_tfs[0], RATIO_ONE
+        block = bisect.bisect_left(self._last_docnos, target, max(self._block, 0))
+        if block >= len(self._last_docnos):
+            return NO_MORE_DOCS, 0, 0
+        return self._last_docnos[block], self._max_tfs[block], self._max_ratios[block]
+
+    def block_max_ratio(self, block: int = None) -> int:
+        """Largest tf/len of a block as a RATIO_ONE fraction (RATIO_ONE if not stored)"""
+        block = self._block if block is None else block
+        if self._max_ratios is None:
+            return RATIO_ONE
+        return self._max_ratios[max(block, 0)]
+
+    def max_tf(self) -> int:
+        """Largest tf of the whole list"""
+        if self._max_tfs is None:
+            return self.block_max_tf(0)
+        return max(self._max_tfs)
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        while self.next() != NO_MORE_DOCS:
+            yield self.docno, self.tf
+
+
+def decode_postings(data: Buffer, df: int, block_size: int = BLOCK_SIZE) -> List[Tuple[int, int]]:
+    """All (docno, tf) pairs of an encoded list"""
+    return list(PostingsCursor(data, df, block_size))
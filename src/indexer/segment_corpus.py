@@ -0,0 +1,189 @@
+"""
+Vietnamese word segmentation for the crawled corpus
+
+The crawler leaves tokenization to post-processing. This stage streams
+crawler outputs, segments one text field per document with PyVi or
+underthesea (syllables of a word joined by '_': "học sinh" ->
+"học_sinh", which the index tokenizer keeps as one term) and writes every
+document back out with `content_segmented`, in input order.
+
+Segmentation is CPU bound, so it runs on a process pool:
+- each worker loads the model once, in the pool initializer
+- documents go out in batches and only their texts are pickled, so one
+  IPC round trip covers a whole batch
+- at most `workers * 2` batches are in flight and results are taken in
+  submission order: memory stays bounded and the output keeps the input
+  order whichever batch finishes first
+
+Usage:
+    python -m src.indexer.segment_corpus data/voz_1m.jsonl data/voz_1m_segmented.jsonl
+    python -m src.indexer.segment_corpus data/voz_parquet data/segmented.parquet --backend underthesea --workers 16
+"""
+
+import importlib.util
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Deque, Iterator, List, Sequence, Tuple
+
+BACKENDS = ('pyvi', 'underthesea')
+
+_segment = None  # per-process segmentation function, see _init_worker
+
+
+def load_segmenter(backend: str) -> Callable[[str], str]:
+    """Segmentation function of a backend: text -> text with multi-syllable words joined by '_'"""
+    if backend == 'pyvi':
+        from pyvi import ViTokenizer
+        return ViTokenizer.tokenize
+    if backend == 'underthesea':
+        from underthesea import word_tokenize
+        return lambda text: word_tokenize(text, format='text')
+    raise ValueError(f"Unknown segmentation backend: {backend}")
+
+
+def _init_worker(backend: str):
+    """Pool initializer: load the model once per process"""
+    global _segment
+    _segment = load_segmenter(backend)
+
+
+def _segment_batch(texts: List[str]) -> Tuple[List[str], int]:
+    """Worker: segment a batch of texts, returns (segmented texts, failures)"""
+    segmented = []
+    failures = 0
+    for text in texts:
+        if not text:
+            segmented.append('')
+            continue
+        try:
+            segmented.append(_segment(text))
+        except Exception:
+            # Keep the document: unsegmented text still indexes syllable by syllable
+            segmented.append(text)
+            failures += 1
+    return segmented, failures
+
+
+class CorpusSegmenter:
+    """Streams crawler outputs through parallel word segmentation into a new corpus"""
+
+    def __init__(self, backend: str = 'pyvi', workers: int = None, batch_size: int = 256,
+                 field: str = 'content', output_field: str = 'content_segmented', log_every: int = 50000):
+        """
+        Args:
+            backend: 'pyvi' or 'underthesea'
+            workers: Segmentation processes (default: all cores, 0 = in this process)
+            batch_size: Documents per task sent to a worker
+            field: Document field to segment
+            output_field: Field the segmented text is written to
+            log_every: Progress line every N documents (0 = quiet)
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown segmentation backend: {backend}")
+        self.backend = backend
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.batch_size = batch_size
+        self.field = field
+        self.output_field = output_field
+        self.log_every = log_every
+        self.max_pending = max(self.workers, 1) * 2
+
+    def _batches(self, inputs: Sequence[str]) -> Iterator[List[dict]]:
+        from ..crawler.corpus_io import iter_documents
+
+        batch = []
+        for path in inputs:
+            for doc in iter_documents(path):
+                batch.append(doc)
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def run(self, inputs: Sequence[str], output: str) -> dict:
+        """Segment every document of the inputs into output (.jsonl file or .parquet directory)"""
+        # Imported here like in spimi: corpus_io loads pyarrow
+        from ..crawler.corpus_io import open_doc_writer
+
+        if importlib.util.find_spec(self.backend) is None:
+            raise ImportError(f"The {self.backend} backend is not installed: pip install {self.backend}")
+        output_format = 'parquet' if output.endswith('.parquet') else 'jsonl'
+        if os.path.dirname(output):
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+
+        self._start = time.time()
+        self._docs = 0
+        self._failures = 0
+        with open_doc_writer(output_format, output) as writer:
+            if self.workers == 0:
+                _init_worker(self.backend)
+                for docs in self._batches(inputs):
+                    self._write(docs, _segment_batch([doc.get(self.field) or '' for doc in docs]), writer)
+            else:
+                with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                         initargs=(self.backend,)) as pool:
+                    pending: Deque[Tuple[List[dict], Future]] = deque()
+                    for docs in self._batches(inputs):
+                        texts = [doc.get(self.field) or '' for doc in docs]
+                        pending.append((docs, pool.submit(_segment_batch, texts)))
+                        if len(pending) >= self.max_pending:
+                            docs, future = pending.popleft()
+                            self._write(docs, future.result(), writer)
+                    while pending:
+                        docs, future = pending.popleft()
+                        self._write(docs, future.result(), writer)
+
+        duration = max(time.time() - self._start, 1e-9)
+        return {
+            'documents': self._docs,
+            'failures': self._failures,
+            'backend': self.backend,
+            'workers': self.workers,
+            'batch_size': self.batch_size,
+            'seconds': round(duration, 1),
+            'docs_per_sec': round(self._docs / duration, 1),
+        }
+
+    def _write(self, docs: List[dict], result: Tuple[List[str], int], writer):
+        segmented, failures = result
+        for doc, text in zip(docs, segmented):
+            doc[self.output_field] = text
+            writer.write(doc)
+        self._failures += failures
+        previous = self._docs
+        self._docs += len(docs)
+        if self.log_every and self._docs // self.log_every > previous // self.log_every:
+            elapsed = max(time.time() - self._start, 1e-9)
+            print(f"✂️  {self._docs:,} docs segmented ({self._docs / elapsed:,.0f} docs/s)")
+
+
+def main():
+    import argparse
+    import glob
+
+    parser = argparse.ArgumentParser(description='Word-segment crawled documents (PyVi / underthesea) in parallel')
+    parser.add_argument('inputs', nargs='+', help='Crawler outputs: .jsonl files or .parquet directories (globs allowed)')
+    parser.add_argument('output', help='Output .jsonl file or .parquet directory')
+    parser.add_argument('--backend', choices=BACKENDS, default='pyvi')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Segmentation processes (default: all cores, 0 = no pool)')
+    parser.add_argument('--batch-size', type=int, default=256, help='Documents per worker task (default 256)')
+    parser.add_argument('--field', default='content', help='Field to segment (default content)')
+    args = parser.parse_args()
+
+    inputs: List[str] = []
+    for pattern in args.inputs:
+        inputs.extend(sorted(glob.glob(pattern)) or [pattern])
+
+    segmenter = CorpusSegmenter(args.backend, args.workers, args.batch_size, args.field)
+    report = segmenter.run(inputs, args.output)
+    print(f"✅ Segmented {report['documents']:,} docs -> {args.output} in {report['seconds']:,.1f}s "
+          f"({report['docs_per_sec']:,.0f} docs/s, {report['workers']} workers, {report['backend']}"
+          f"{', %d failed' % report['failures'] if report['failures'] else ''})")
+
+
+if __name__ == "__main__":
+    main()
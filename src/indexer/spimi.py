@@ -0,0 +1,401 @@
+"""
+SPIMI inverted index builder
+
+Single-pass in-memory indexing over the crawler output:
+
+1. Stream documents (JSONL or Parquet, see crawler.corpus_io) and give each
+   one a docno in corpus order; doc ids and lengths go straight to disk.
+   The indexed field goes through crawler.text_normalizer like queries do
+   (meta.json records the normalizer version), whatever produced it.
+2. Accumulate term -> postings (docno, tf), and with --positions the
+   term positions of every posting, in memory until the estimated size
+   reaches the memory budget, then write the block sorted by term.
+3. k-way heap merge of all blocks into the final index. Blocks hold
+   increasing docno ranges, so a term's postings are concatenated in block
+   order and stay sorted.
+
+Peak memory is bounded whatever the corpus size: inversion stays within
+the block budget (plus, with --filters, the filter columns of about 24
+bytes per document, see filters.py), and the merge streams each term
+from the blocks in MERGE_CHUNK runs, encoding postings block by block
+(postings.PostingsListEncoder; long lists spill to temporary files) with
+the doc lengths paged in from a memory map of doclens.bin.
+
+Index directory:
+    meta.json      counts, average doc length, build report
+    terms.dat      term strings (UTF-8, sorted, concatenated)
+    terms.idx      TERM_RECORD per term, same order
+    postings.bin   per term: delta + VByte encoded (docno, tf) blocks with
+                   skip entries (max tf, max tf/len), see postings.py
+    positions.bin  with --positions: per term, delta + VByte encoded token
+                   positions of every posting, blocked like the postings
+    positions.idx  uint64 offsets into positions.bin, num_terms + 1 entries
+    doclens.bin    uint32 token count per docno
+    docids.dat     external doc ids (UTF-8, concatenated)
+    docids.idx     uint64 offsets into docids.dat, num_docs + 1 entries
+    docs.*         with --store-docs: compressed documents by docno, see doc_store.py
+    filters/       with --filters: source / forum / thread / author containers
+                   and the date column, see filters.py
+
+Usage:
+    python -m src.indexer.spimi data/voz_1m.jsonl data/index --memory-mb 512
+    python -m src.indexer.spimi data/voz_1m.jsonl data/index --store-docs --positions --filters
+"""
+
+import heapq
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import time
+from array import array
+from collections import Counter
+from itertools import chain
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from ..crawler.text_normalizer import NORMALIZER_VERSION, normalize_text, term_positions
+from .doc_store import DocStoreWriter
+from .filters import FILTER_FIELDS, TIME_FIELD, FilterIndexWriter
+from .postings import BLOCK_SIZE, PostingsListEncoder, _from_le, _le
+from .tokenizer import tokenize
+
+FORMAT_VERSION = 3
+
+# term offset, term length, document frequency, postings offset, postings length (bytes)
+TERM_RECORD = struct.Struct('<QIIQQ')
+BLOCK_HEADER = struct.Struct('<HII')  # term length, number of postings, number of positions
+OFFSET = struct.Struct('<Q')
+
+# Rough CPython cost of a new dict entry (key str, array object, slot)
+# and of one posting (two uint32 plus array over-allocation), one position
+TERM_OVERHEAD_BYTES = 200
+POSTING_BYTES = 10
+POSITION_BYTES = 5
+
+# Postings of a term read from a block file at a time during the merge
+MERGE_CHUNK = BLOCK_SIZE * 64
+
+
+def write_block(path: str, block: Dict[str, array], positions: Optional[Dict[str, array]] = None):
+    """Spill an in-memory block, terms in sorted order"""
+    empty = array('I')
+    with open(path, 'wb', buffering=1024 * 1024) as f:
+        for term in sorted(block):
+            encoded = term.encode('utf-8')
+            postings = block[term]
+            term_positions = positions[term] if positions is not None else empty
+            f.write(BLOCK_HEADER.pack(len(encoded), len(postings) // 2, len(term_positions)))
+            f.write(encoded)
+            f.write(_le(postings))
+            f.write(_le(term_positions))
+
+
+def read_block(path: str) -> Iterator[Tuple[bytes, Iterator[Tuple[array, array]]]]:
+    """
+    Stream (term, runs) from a block file
+
+    runs yields the term's postings as (interleaved docno/tf postings,
+    their positions) chunks of at most MERGE_CHUNK postings; it has to be
+    consumed before the next term is read.
+    """
+    with open(path, 'rb', buffering=1024 * 1024) as f:
+        while True:
+            header = f.read(BLOCK_HEADER.size)
+            if not header:
+                return
+            term_len, count, num_positions = BLOCK_HEADER.unpack(header)
+            term = f.read(term_len)
+            start = f.tell()
+            if count <= MERGE_CHUNK:
+                yield term, iter([(_from_le(f.read(count * 8)), _from_le(f.read(num_positions * 4)))])
+            else:
+                yield term, _read_runs(f, start, count, num_positions)
+            f.seek(start + count * 8 + num_positions * 4)
+
+
+def _read_runs(f: BinaryIO, start: int, count: int, num_positions: int) -> Iterator[Tuple[array, array]]:
+    """Chunks of one long term of a block file (postings and positions are two consecutive regions)"""
+    postings_offset, positions_offset = start, start + count * 8
+    empty = array('I')
+    for first in range(0, count, MERGE_CHUNK):
+        f.seek(postings_offset)
+        postings = _from_le(f.read(min(MERGE_CHUNK, count - first) * 8))
+        postings_offset += len(postings) * 4
+        positions = empty
+        if num_positions:
+            size = sum(postings[1::2])
+            f.seek(positions_offset)
+            positions = _from_le(f.read(size * 4))
+            positions_offset += size * 4
+        yield postings, positions
+
+
+class IndexWriter:
+    """Writes terms.dat / terms.idx / postings.bin (and positions.*) for terms given in sorted order"""
+
+    def __init__(self, directory: str, doc_lengths: Sequence[int] = None, positions: bool = False):
+        self.directory = directory
+        self.doc_lengths = doc_lengths
+        self._encoder = PostingsListEncoder(doc_lengths, positions)
+        self._terms = open(os.path.join(directory, 'terms.dat'), 'wb', buffering=1024 * 1024)
+        self._index = open(os.path.join(directory, 'terms.idx'), 'wb', buffering=1024 * 1024)
+        self._postings = open(os.path.join(directory, 'postings.bin'), 'wb', buffering=4 * 1024 * 1024)
+        self._positions = None
+        if positions:
+            self._positions = open(os.path.join(directory, 'positions.bin'), 'wb', buffering=4 * 1024 * 1024)
+            self._positions_index = open(os.path.join(directory, 'positions.idx'), 'wb', buffering=1024 * 1024)
+            self._positions_index.write(OFFSET.pack(0))
+        self._term_offset = 0
+        self._postings_offset = 0
+        self._positions_offset = 0
+        self.num_terms = 0
+        self.num_postings = 0
+
+    def add(self, term: bytes, runs: Iterable[Tuple[Sequence[int], Sequence[int]]]):
+        """Append one term from runs of (interleaved docno/tf postings, their positions) in docno order"""
+        df, postings_bytes, positions_bytes = self._encoder.encode(runs, self._postings, self._positions)
+        self._terms.write(term)
+        self._index.write(TERM_RECORD.pack(self._term_offset, len(term), df, self._postings_offset, postings_bytes))
+        if self._positions is not None:
+            self._positions_offset += positions_bytes
+            self._positions_index.write(OFFSET.pack(self._positions_offset))
+        self._term_offset += len(term)
+        self._postings_offset += postings_bytes
+        self.num_terms += 1
+        self.num_postings += df
+
+    def close(self):
+        files = [self._terms, self._index, self._postings]
+        if self._positions is not None:
+            files += [self._positions, self._positions_index]
+        for f in files:
+            f.close()
+
+
+def merge_blocks(block_paths: Sequence[str], writer: IndexWriter):
+    """k-way merge of sorted blocks into the final index, streaming each term's runs"""
+    readers = [read_block(path) for path in block_paths]
+    heap: List[Tuple[bytes, int, Iterator[Tuple[array, array]]]] = []
+    for block_idx, reader in enumerate(readers):
+        entry = next(reader, None)
+        if entry is not None:
+            heap.append((entry[0], block_idx, entry[1]))
+    heapq.heapify(heap)
+
+    while heap:
+        term, block_idx, runs = heapq.heappop(heap)
+        # Same term from later blocks: heap order is (term, block), so docnos stay sorted
+        merged = [(block_idx, runs)]
+        while heap and heap[0][0] == term:
+            _, block_idx, runs = heapq.heappop(heap)
+            merged.append((block_idx, runs))
+        writer.add(term, chain.from_iterable(runs for _, runs in merged))
+        for block_idx, _ in merged:
+            entry = next(readers[block_idx], None)
+            if entry is not None:
+                heapq.heappush(heap, (entry[0], block_idx, entry[1]))
+
+
+class SpimiIndexer:
+    """Builds an on-disk inverted index from crawler outputs within a memory budget"""
+
+    def __init__(self, output_dir: str, memory_budget: int = 512 * 1024 ** 2,
+                 field: str = 'content_clean', log_every: int = 100000, store_docs: bool = False,
+                 positions: bool = False, filters: bool = False):
+        """
+        Args:
+            output_dir: Index directory (replaced if it exists)
+            memory_budget: Estimated bytes of in-memory postings before a block is spilled
+            field: Document field to index
+            log_every: Progress line every N documents (0 = quiet)
+            store_docs: Also write the document store (whole documents, see doc_store.py)
+            positions: Also index term positions (phrase and proximity queries)
+            filters: Also build the metadata filter indexes (see filters.py)
+        """
+        self.output_dir = output_dir
+        self.memory_budget = memory_budget
+        self.field = field
+        self.log_every = log_every
+        self.store_docs = store_docs
+        self.positions = positions
+        self.filters = filters
+        self.block_dir = os.path.join(output_dir, 'blocks')
+
+    def _spill(self, block: Dict[str, array], block_paths: List[str], positions: Dict[str, array] = None):
+        path = os.path.join(self.block_dir, f'block-{len(block_paths):05d}.bin')
+        write_block(path, block, positions)
+        block_paths.append(path)
+
+    def build(self, inputs: Sequence[str]) -> dict:
+        """Index every document of the inputs (in order), returns the build report"""
+        # Imported here: corpus_io loads pyarrow, which index readers
+        # importing TERM_RECORD should not pay for
+        from ..crawler.corpus_io import iter_documents
+
+        if os.path.exists(self.output_dir):
+            shutil.rmtree(self.output_dir)
+        os.makedirs(self.block_dir)
+
+        start = time.time()
+        block: Dict[str, array] = {}
+        block_positions: Optional[Dict[str, array]] = {} if self.positions else None
+        block_bytes = 0
+        block_paths: List[str] = []
+        num_docs = 0
+        total_tokens = 0
+        docid_offset = 0
+
+        doclens = open(os.path.join(self.output_dir, 'doclens.bin'), 'wb', buffering=1024 * 1024)
+        docids = open(os.path.join(self.output_dir, 'docids.dat'), 'wb', buffering=1024 * 1024)
+        docids_idx = open(os.path.join(self.output_dir, 'docids.idx'), 'wb', buffering=1024 * 1024)
+        store = DocStoreWriter(self.output_dir) if self.store_docs else None
+        filter_writer = FilterIndexWriter(self.output_dir) if self.filters else None
+        columns = None if store else ['doc_id', self.field]
+        if columns and filter_writer:
+            columns += [*FILTER_FIELDS, TIME_FIELD]
+        try:
+            docids_idx.write(struct.pack('<Q', 0))
+            for path in inputs:
+                for doc in iter_documents(path, columns=columns):
+                    docno = num_docs
+                    if store:
+                        store.add(doc)
+                    if filter_writer:
+                        filter_writer.add(doc)
+                    tokens = tokenize(normalize_text(doc.get(self.field) or ''))
+
+                    if block_positions is None:
+                        counts = Counter(tokens)
+                    else:
+                        doc_positions: Dict[str, List[int]] = {}
+                        for position, term in zip(term_positions(tokens), tokens):
+                            doc_positions.setdefault(term, []).append(position)
+                        counts = {term: len(positions) for term, positions in doc_positions.items()}
+                        block_bytes += POSITION_BYTES * len(tokens)
+
+                    for term, tf in counts.items():
+                        postings = block.get(term)
+                        if postings is None:
+                            block[term] = array('I', (docno, tf))
+                            block_bytes += TERM_OVERHEAD_BYTES + len(term)
+                            if block_positions is not None:
+                                block_positions[term] = array('I', doc_positions[term])
+                        else:
+                            postings.append(docno)
+                            postings.append(tf)
+                            if block_positions is not None:
+                                block_positions[term].extend(doc_positions[term])
+                        block_bytes += POSTING_BYTES
+
+                    doc_id = (doc.get('doc_id') or '').encode('utf-8')
+                    docids.write(doc_id)
+                    docid_offset += len(doc_id)
+                    docids_idx.write(struct.pack('<Q', docid_offset))
+                    doclens.write(struct.pack('<I', len(tokens)))
+                    total_tokens += len(tokens)
+                    num_docs += 1
+
+                    if block_bytes >= self.memory_budget:
+                        self._spill(block, block_paths, block_positions)
+                        block, block_bytes = {}, 0
+                        block_positions = {} if self.positions else None
+
+                    if self.log_every and num_docs % self.log_every == 0:
+                        elapsed = time.time() - start
+                        print(f"📥 {num_docs:,} docs, {len(block_paths)} blocks spilled "
+                              f"({num_docs / max(elapsed, 1e-9):,.0f} docs/s)")
+            if block:
+                self._spill(block, block_paths, block_positions)
+                block, block_positions = {}, None
+        finally:
+            for f in (doclens, docids, docids_idx):
+                f.close()
+            if store:
+                store.close()
+            if filter_writer:
+                filter_writer.close()
+
+        invert_seconds = time.time() - start
+        # Doc lengths (block max tf/len) are paged in from doclens.bin, not loaded
+        with open(os.path.join(self.output_dir, 'doclens.bin'), 'rb') as f:
+            if not num_docs:
+                lengths_map, lengths = None, array('I')
+            elif sys.byteorder != 'little':
+                lengths_map, lengths = None, _from_le(f.read())
+            else:
+                lengths_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                lengths = memoryview(lengths_map).cast('I')
+        writer = IndexWriter(self.output_dir, lengths, self.positions)
+        try:
+            merge_blocks(block_paths, writer)
+        finally:
+            writer.close()
+            if lengths_map is not None:
+                lengths.release()
+                lengths_map.close()
+        shutil.rmtree(self.block_dir)
+
+        duration = time.time() - start
+        report = {
+            'documents': num_docs,
+            'terms': writer.num_terms,
+            'postings': writer.num_postings,
+            'blocks': len(block_paths),
+            'memory_budget_mb': round(self.memory_budget / 1024 ** 2, 1),
+            'invert_seconds': round(invert_seconds, 1),
+            'merge_seconds': round(duration - invert_seconds, 1),
+            'docs_per_sec': round(num_docs / max(duration, 1e-9), 1),
+            'index_bytes': sum(os.path.getsize(os.path.join(root, name))
+                               for root, _, names in os.walk(self.output_dir) for name in names),
+        }
+        meta = {
+            'format_version': FORMAT_VERSION,
+            'field': self.field,
+            'normalizer': NORMALIZER_VERSION,
+            'num_docs': num_docs,
+            'num_terms': writer.num_terms,
+            'total_tokens': total_tokens,
+            'avg_doc_len': total_tokens / num_docs if num_docs else 0.0,
+            'postings': {'codec': 'delta-vbyte', 'block_size': BLOCK_SIZE},
+            'positions': self.positions,
+            'filters': self.filters,
+            'build': report,
+        }
+        with open(os.path.join(self.output_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        return report
+
+
+def main():
+    import argparse
+    import glob
+
+    parser = argparse.ArgumentParser(description='Build an inverted index (SPIMI) from crawler output')
+    parser.add_argument('inputs', nargs='+', help='Crawler outputs: .jsonl files or .parquet directories (globs allowed)')
+    parser.add_argument('output', help='Index directory')
+    parser.add_argument('--memory-mb', type=float, default=512, help='Block memory budget in MB (default 512)')
+    parser.add_argument('--field', default='content_clean', help='Document field to index (default content_clean)')
+    parser.add_argument('--store-docs', action='store_true',
+                        help='Also write the document store for result rendering (doc_store.py)')
+    parser.add_argument('--positions', action='store_true',
+                        help='Also index term positions, for phrase queries and proximity scoring')
+    parser.add_argument('--filters', action='store_true',
+                        help='Also build source/forum/thread/author/date filter indexes (filters.py)')
+    args = parser.parse_args()
+
+    inputs: List[str] = []
+    for pattern in args.inputs:
+        inputs.extend(sorted(glob.glob(pattern)) or [pattern])
+
+    indexer = SpimiIndexer(args.output, int(args.memory_mb * 1024 ** 2), args.field,
+                           store_docs=args.store_docs, positions=args.positions, filters=args.filters)
+    report = indexer.build(inputs)
+    print(f"✅ Indexed {report['documents']:,} docs -> {args.output}: {report['terms']:,} terms, "
+          f"{report['postings']:,} postings, {report['blocks']} blocks "
+          f"({report['docs_per_sec']:,.0f} docs/s, {report['index_bytes'] / 1024 ** 2:,.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
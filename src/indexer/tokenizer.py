@@ -0,0 +1,22 @@
+"""
+Index/query tokenizer
+
+One tokenizer for building the index and parsing queries, so both sides
+agree on terms: lowercase, Unicode word characters (Vietnamese syllables
+keep their diacritics), underscores kept so word-segmented text
+("học_sinh") stays one term.
+"""
+
+import re
+from typing import List
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MAX_TERM_BYTES = 64  # longer tokens (URLs, base64, keyboard mashing) are dropped
+
+
+def tokenize(text: str) -> List[str]:
+    """Terms of a text, in order"""
+    if not text:
+        return []
+    return [token for token in TOKEN_RE.findall(text.lower())
+            if len(token) <= MAX_TERM_BYTES // 4 or len(token.encode('utf-8')) <= MAX_TERM_BYTES]
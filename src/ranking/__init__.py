@@ -1,4 +1,17 @@
 """
 Milestone 2 & 3: Ranking
 BM25 and Vector Search implementations
+
+Usage:
+    # BM25 top-k with Block-Max WAND pruning over an index from src.indexer.spimi
+    python -m src.ranking.bm25 data/index "xe máy cũ" -k 10
+
+    # Phrase query (index built with --positions)
+    python -m src.ranking.bm25 data/index '"xe máy" cũ' -k 10
+
+    # Filtered search (index built with --filters)
+    python -m src.ranking.bm25 data/index "xe máy cũ" --source voz --since 2024-06-01
+
+    # Exhaustive vs WAND vs Block-Max WAND latency
+    python benchmarks/bench_bm25.py data/index --output results/bm25.json
 """
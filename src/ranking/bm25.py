@@ -0,0 +1,515 @@
+"""
+BM25 ranking over the on-disk index, with dynamic pruning
+
+Scores use the Lucene form of BM25:
+
+    idf(t)    = ln(1 + (N - df + 0.5) / (df + 0.5))
+    norm(d)   = k1 * (1 - b + b * |d| / avgdl)
+    score(d)  = sum over query terms of idf(t) * tf * (k1 + 1) / (tf + norm(d))
+
+idf is never negative, which is what makes upper-bound pruning safe, and
+norm(d) is precomputed once per ranker from doclens.bin.
+
+Top-k retrieval is document-at-a-time over the compressed postings:
+
+- 'wand': each term has an upper bound on its score, from the max tf and
+  max tf/len of its blocks (exact for single-block lists). Cursors are kept sorted by docno; the
+  pivot is the first cursor where the summed bounds exceed the current
+  k-th best score, and every document before the pivot is skipped with
+  next_geq() instead of being scored.
+- 'bmw' (Block-Max WAND, default): the same pivot, then the skip entries
+  of the blocks holding the candidate bound it more tightly. When that
+  bound cannot beat the k-th score, the cursors jump past the current
+  blocks without decoding them.
+- 'exhaustive': term-at-a-time over every posting, the baseline that the
+  pruned methods must match.
+
+Results are ordered by score, then docno, so all methods return the same
+top k.
+
+On indexes built with --positions:
+
+- Quoted phrases ('"xe máy" cũ') are required: candidates come from a
+  leapfrog intersection of the phrase terms' cursors (rarest first,
+  next_geq() past every document missing a term), and positions are only
+  decoded for documents holding all of them. The phrase check intersects
+  the start offsets each term allows, rarest first, and stops at the first
+  empty set. Matches are ranked by BM25 over every query term.
+- Queries without phrases get a proximity boost: the top rerank_depth
+  BM25 results are rescored with, for each pair of adjacent query terms,
+  proximity * min(idf) / (smallest distance between them in the document).
+
+Without positions, quotes are ignored and scores are plain BM25.
+
+Metadata filters (source, forum, thread, author, date range; indexes built
+with --filters) are applied during retrieval, not to the top k: the
+filter's DocSet gives the next allowed docno and every cursor behind it
+jumps there with next_geq(), so a selective filter skips most postings
+and whole blocks, and the top k is the top k of the matching documents.
+
+Usage:
+    with InvertedIndex('data/index') as index:
+        ranker = BM25(index)
+        for hit in ranker.search('xe máy cũ', k=10):
+            print(hit.doc_id, hit.score)
+
+    python -m src.ranking.bm25 data/index "xe máy cũ" -k 10
+    python -m src.ranking.bm25 data/index '"xe máy" cũ' -k 10
+    python -m src.ranking.bm25 data/index "xe máy cũ" --forum xe-may.175 --since 2024-06-01
+"""
+
+import heapq
+import math
+import operator
+import os
+import re
+from array import array
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from ..indexer.doc_store import DocStore, make_snippet
+from ..indexer.filters import FILTER_FIELDS, DocSet
+from ..indexer.index_reader import InvertedIndex
+from ..indexer.postings import NO_MORE_DOCS, RATIO_ONE, PostingsCursor
+
+METHODS = ('bmw', 'wand', 'exhaustive')
+
+PHRASE_RE = re.compile(r'"([^"]+)"')
+
+_by_docno = operator.attrgetter('cursor.docno')
+
+
+class Hit(NamedTuple):
+    docno: int
+    doc_id: str
+    score: float
+
+
+class QueryTerm:
+    """One query term: its postings cursor, weight and score upper bounds"""
+
+    __slots__ = ('term', 'cursor', 'weight', 'upper_bound', 'block_last', 'block_bound')
+
+    def __init__(self, term: str, cursor: PostingsCursor, weight: float, upper_bound: float):
+        self.term = term
+        self.cursor = cursor
+        self.weight = weight  # query tf * idf * (k1 + 1)
+        self.upper_bound = upper_bound
+        # Block-max bound, valid for docnos up to block_last
+        self.block_last = -1
+        self.block_bound = upper_bound
+
+
+class BM25:
+    """BM25 scorer with WAND / Block-Max WAND top-k retrieval"""
+
+    def __init__(self, index: InvertedIndex, k1: float = 1.2, b: float = 0.75,
+                 proximity: float = 0.5, rerank_depth: int = 100):
+        """
+        Args:
+            index: Open index
+            k1: Term frequency saturation
+            b: Document length normalization (0 = none, 1 = full)
+            proximity: Weight of the term proximity boost (0 = plain BM25, needs positions)
+            rerank_depth: BM25 results rescored with the proximity boost
+        """
+        self.index = index
+        self.k1 = k1
+        self.b = b
+        self.proximity = proximity if index.has_positions else 0.0
+        self.rerank_depth = rerank_depth
+        self.num_docs = index.num_docs
+
+        lengths = index.doc_lengths
+        self._base = k1 * (1 - b)
+        self._scale = k1 * b / (index.avg_doc_len or 1.0)
+        base, scale = self._base, self._scale
+        self.norms = array('d', [base + scale * length for length in lengths])
+        # Shortest document that can hold a posting, for upper bounds
+        self._min_len = min((length for length in lengths if length), default=1)
+
+    def idf(self, df: int) -> float:
+        return math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+
+    def _bound(self, weight: float, max_tf: int, max_ratio: int = RATIO_ONE) -> float:
+        """
+        Largest score a term can contribute to documents with tf <= max_tf
+        and tf/len <= max_ratio (a RATIO_ONE fraction, as in the skip entries)
+        """
+        if not max_tf:
+            return 0.0
+        # weight * tf / (tf + base + scale * len) = weight / (1 + base / tf + scale * len / tf)
+        ratio = min(max_ratio / RATIO_ONE, max_tf / self._min_len)
+        return weight / (1 + self._base / max_tf + self._scale / ratio)
+
+    def query_terms(self, query: str) -> List[QueryTerm]:
+        """Indexed terms of a query (repeated terms weigh more), fresh cursors"""
+        terms = []
+        for term, qtf in Counter(self.index.analyze(query)).items():
+            cursor = self.index.postings(term)
+            if cursor is None:
+                continue
+            weight = qtf * self.idf(cursor.df) * (self.k1 + 1)
+            terms.append(QueryTerm(term, cursor, weight, self._upper_bound(term, cursor, weight)))
+        return terms
+
+    def _upper_bound(self, term: str, cursor: PostingsCursor, weight: float) -> float:
+        if cursor.num_blocks == 1:
+            # At most one block of postings: score them (on a separate cursor)
+            norms = self.norms
+            return max(weight * tf / (tf + norms[docno]) for docno, tf in self.index.postings(term))
+        return max(self._bound(weight, cursor.block_max_tf(block), cursor.block_max_ratio(block))
+                   for block in range(cursor.num_blocks))
+
+    def search(self, query: str, k: int = 10, method: str = 'bmw', stats: Optional[dict] = None,
+               filters: Optional[dict] = None) -> List[Hit]:
+        """
+        Top k documents for a query
+
+        Args:
+            query: Query text (same tokenizer as the index), "quoted phrases" required
+            k: Number of results
+            method: 'bmw', 'wand' or 'exhaustive'
+            stats: If given, filled with 'postings' (total df of the query
+                terms) and 'scored' (documents fully scored)
+            filters: Only documents matching all of e.g. {'source': 'voz',
+                'author': ['a', 'b'], 'since': '2024-06-01', 'until': ...}
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+        docs = self.select(filters)
+        if docs is not None and docs.count == 0:
+            k = 0
+        phrases = PHRASE_RE.findall(query) if self.index.has_positions else []
+        query = query.replace('"', ' ')
+        terms = self.query_terms(query) if k > 0 else []
+
+        if phrases:
+            top, scored = self._phrase_search(terms, [self.index.analyze_phrase(phrase) for phrase in phrases],
+                                              k, docs)
+        elif self.proximity and len(terms) > 1:
+            depth = max(k, self.rerank_depth)
+            if method == 'exhaustive':
+                top, scored = self._term_at_a_time(terms, depth, docs)
+            else:
+                top, scored = self._wand(terms, depth, method == 'bmw', docs)
+            top = self._proximity_rerank(query, top, k)
+        elif method == 'exhaustive':
+            top, scored = self._term_at_a_time(terms, k, docs)
+        else:
+            top, scored = self._wand(terms, k, method == 'bmw', docs)
+        if stats is not None:
+            stats['postings'] = sum(term.cursor.df for term in terms)
+            stats['scored'] = scored
+        return [Hit(-neg_docno, self.index.doc_id(-neg_docno), score) for score, neg_docno in top]
+
+    def select(self, filters: Optional[dict]) -> Optional[DocSet]:
+        """Documents allowed by search filters, None if they filter nothing"""
+        if not filters:
+            return None
+        if self.index.filters is None:
+            raise ValueError(f"{self.index.directory} has no filter indexes: rebuild it with spimi.py --filters")
+        return self.index.filters.select(**filters)
+
+    def _term_at_a_time(self, terms: List[QueryTerm], k: int,
+                        docs: Optional[DocSet] = None) -> Tuple[List[Tuple[float, int]], int]:
+        """Score every posting (of allowed documents) into accumulators, then select the top k"""
+        norms = self.norms
+        scores = {}
+        for term in terms:
+            weight = term.weight
+            for docno, tf in term.cursor:
+                if docs is not None and docno not in docs:
+                    continue
+                scores[docno] = scores.get(docno, 0.0) + weight * tf / (tf + norms[docno])
+        top = heapq.nlargest(k, ((score, -docno) for docno, score in scores.items()))
+        return top, len(scores)
+
+    def _wand(self, terms: List[QueryTerm], k: int, block_max: bool,
+              docs: Optional[DocSet] = None) -> Tuple[List[Tuple[float, int]], int]:
+        """Document-at-a-time WAND, with block-max bounds if block_max, over allowed documents"""
+        norms = self.norms
+        bound = self._bound
+        heap: List[Tuple[float, int]] = []  # (score, -docno): heap[0] is the current k-th result
+        threshold = 0.0
+        scored = 0
+
+        for term in terms:
+            term.cursor.next()
+        active = [term for term in terms if term.cursor.docno != NO_MORE_DOCS]
+
+        while active:
+            active.sort(key=_by_docno)
+
+            # Pivot: first cursor where the summed upper bounds can beat the threshold
+            pivot = -1
+            total = 0.0
+            for i, term in enumerate(active):
+                total += term.upper_bound
+                if total > threshold:
+                    pivot = i
+                    break
+            if pivot < 0:
+                break
+            doc = active[pivot].cursor.docno
+            if docs is not None and doc not in docs:
+                # Nothing before the next allowed document can be a result
+                allowed = docs.next_geq(doc)
+                if allowed == NO_MORE_DOCS:
+                    break
+                exhausted = False
+                for term in active:
+                    if term.cursor.docno < allowed and term.cursor.next_geq(allowed) == NO_MORE_DOCS:
+                        exhausted = True
+                if exhausted:
+                    active = [term for term in active if term.cursor.docno != NO_MORE_DOCS]
+                continue
+            last = pivot
+            while last + 1 < len(active) and active[last + 1].cursor.docno == doc:
+                last += 1
+
+            if block_max and len(heap) == k:
+                # Tighter bound from the blocks holding doc; documents up to the end of
+                # the first of those blocks can only match these terms
+                block_total = 0.0
+                next_doc = active[last + 1].cursor.docno if last + 1 < len(active) else NO_MORE_DOCS
+                for term in active[:last + 1]:
+                    if term.block_last < doc:
+                        # Pivots only move forward, so the bound holds until block_last
+                        block_last, block_tf, block_ratio = term.cursor.block_bounds(doc)
+                        term.block_last = block_last
+                        term.block_bound = min(term.upper_bound, bound(term.weight, block_tf, block_ratio))
+                    block_total += term.block_bound
+                    if term.block_last + 1 < next_doc:
+                        next_doc = term.block_last + 1
+                if block_total <= threshold:
+                    exhausted = False
+                    for term in active[:last + 1]:
+                        if term.cursor.docno < next_doc and term.cursor.next_geq(next_doc) == NO_MORE_DOCS:
+                            exhausted = True
+                    if exhausted:
+                        active = [term for term in active if term.cursor.docno != NO_MORE_DOCS]
+                    continue
+
+            exhausted = False
+            if active[0].cursor.docno == doc:
+                # Sum in query order so every method adds the same floats in the same order
+                norm = norms[doc]
+                score = 0.0
+                for term in terms:
+                    if term.cursor.docno == doc:
+                        tf = term.cursor.tf
+                        score += term.weight * tf / (tf + norm)
+                scored += 1
+                if len(heap) < k:
+                    heapq.heappush(heap, (score, -doc))
+                elif score > threshold:
+                    heapq.heapreplace(heap, (score, -doc))
+                if len(heap) == k:
+                    threshold = heap[0][0]
+                for term in active[:last + 1]:
+                    if term.cursor.next() == NO_MORE_DOCS:
+                        exhausted = True
+            else:
+                # Documents before the pivot cannot make the top k
+                for term in active[:pivot]:
+                    if term.cursor.next_geq(doc) == NO_MORE_DOCS:
+                        exhausted = True
+            if exhausted:
+                active = [term for term in active if term.cursor.docno != NO_MORE_DOCS]
+
+        return sorted(heap, reverse=True), scored
+
+    def _phrase_search(self, terms: List[QueryTerm], phrases: List[List[Tuple[int, str]]], k: int,
+                       docs: Optional[DocSet] = None) -> Tuple[List[Tuple[float, int]], int]:
+        """Allowed documents containing every phrase, by BM25 over all query terms"""
+        phrases = [phrase for phrase in phrases if phrase]
+        # Phrase terms are query terms too: share their cursors, which only move forward
+        query_cursors = {term.term: term.cursor for term in terms}
+        cursors: Dict[str, PostingsCursor] = {}
+        for phrase in phrases:
+            for _, term in phrase:
+                if term not in cursors:
+                    cursor = query_cursors.get(term) or self.index.postings(term)
+                    if cursor is None:
+                        return [], 0
+                    cursors[term] = cursor
+        if not cursors or k <= 0:
+            return [], 0
+        phrase_cursors = [[(offset, cursors[term]) for offset, term in phrase] for phrase in phrases]
+
+        norms = self.norms
+        bound = self._bound
+        heap: List[Tuple[float, int]] = []
+        threshold = 0.0
+        scored = 0
+        # Block-max bounds: phrase terms must match, the other terms may
+        required = [term for term in terms if term.term in cursors]
+        optional_bound = sum(term.upper_bound for term in terms if term.term not in cursors)
+        block_total = 0.0
+        bound_until = -1  # block_total holds for docnos up to here
+
+        # Leapfrog: the rarest list proposes, the others skip to it or past it
+        ordered = sorted(cursors.values(), key=lambda cursor: cursor.df)
+        lead, others = ordered[0], ordered[1:]
+        doc = lead.next()
+        while doc != NO_MORE_DOCS:
+            if docs is not None:
+                allowed = docs.next_geq(doc)
+                if allowed != doc:
+                    doc = lead.next_geq(allowed)
+                    continue
+            if len(heap) == k:
+                if doc > bound_until:
+                    block_total = optional_bound
+                    bound_until = NO_MORE_DOCS
+                    for term in required:
+                        if term.block_last < doc:
+                            block_last, block_tf, block_ratio = term.cursor.block_bounds(doc)
+                            term.block_last = block_last
+                            term.block_bound = min(term.upper_bound, bound(term.weight, block_tf, block_ratio))
+                        block_total += term.block_bound
+                        if term.block_last < bound_until:
+                            bound_until = term.block_last
+                if block_total <= threshold:
+                    # Nothing up to the end of these blocks can enter the top k
+                    doc = lead.next_geq(bound_until + 1)
+                    continue
+            for cursor in others:
+                if cursor.docno < doc:
+                    cursor.next_geq(doc)
+                if cursor.docno != doc:
+                    doc = lead.next_geq(cursor.docno)
+                    break
+            else:
+                # Scoring is cheap next to decoding positions: only documents
+                # that would enter the top k get the phrase check
+                norm = norms[doc]
+                score = 0.0
+                for term in terms:
+                    cursor = term.cursor
+                    if cursor.docno < doc:
+                        cursor.next_geq(doc)
+                    if cursor.docno == doc:
+                        tf = cursor.tf
+                        score += term.weight * tf / (tf + norm)
+                if (len(heap) < k or score > threshold) and all(self._phrase_at(phrase) for phrase in phrase_cursors):
+                    scored += 1
+                    if len(heap) < k:
+                        heapq.heappush(heap, (score, -doc))
+                    else:
+                        heapq.heapreplace(heap, (score, -doc))
+                    if len(heap) == k:
+                        threshold = heap[0][0]
+                doc = lead.next()
+        return sorted(heap, reverse=True), scored
+
+    @staticmethod
+    def _phrase_at(phrase: List[Tuple[int, PostingsCursor]]) -> bool:
+        """Whether the cursors' current document holds the phrase (cursors at offsets 0, 1, ...)"""
+        # Rarest term first: its start offsets are the fewest candidates
+        ordered = sorted(phrase, key=lambda entry: entry[1].tf)
+        offset, cursor = ordered[0]
+        starts = {position - offset for position in cursor.positions()}
+        for offset, cursor in ordered[1:]:
+            starts.intersection_update([position - offset for position in cursor.positions()])
+            if not starts:
+                return False
+        return True
+
+    def _proximity_rerank(self, query: str, top: List[Tuple[float, int]], k: int) -> List[Tuple[float, int]]:
+        """Add the proximity boost of adjacent query terms to BM25 results, keep the best k"""
+        sequence = [term for _, term in self.index.analyze_phrase(query) if self.index.lookup(term) is not None]
+        pairs = {(a, b) for a, b in zip(sequence, sequence[1:]) if a != b}
+        if not pairs or not top:
+            return top[:k]
+        names = {term for pair in pairs for term in pair}
+        cursors = {term: self.index.postings(term) for term in names}
+        idfs = {term: self.idf(cursor.df) for term, cursor in cursors.items()}
+
+        rescored = []
+        for score, neg_docno in sorted(top, key=lambda entry: -entry[1]):
+            doc = -neg_docno
+            positions = {}
+            for term, cursor in cursors.items():
+                if cursor.docno < doc:
+                    cursor.next_geq(doc)
+                if cursor.docno == doc:
+                    positions[term] = cursor.positions()
+            for a, b in pairs:
+                if a in positions and b in positions:
+                    score += self.proximity * min(idfs[a], idfs[b]) / _min_distance(positions[a], positions[b])
+            rescored.append((score, neg_docno))
+        return heapq.nlargest(k, rescored)
+
+
+def _min_distance(a: List[int], b: List[int]) -> int:
+    """Smallest |x - y| over two ascending position lists (merge walk)"""
+    i = j = 0
+    best = abs(a[0] - b[0])
+    while i < len(a) and j < len(b):
+        gap = a[i] - b[j]
+        if gap < 0:
+            best = min(best, -gap)
+            i += 1
+        else:
+            best = min(best, gap)
+            j += 1
+    return max(best, 1)
+
+
+def main():
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='BM25 search over an on-disk index')
+    parser.add_argument('index', help='Index directory')
+    parser.add_argument('query', help='Query text')
+    parser.add_argument('-k', type=int, default=10, help='Number of results (default 10)')
+    parser.add_argument('--method', choices=METHODS, default='bmw')
+    parser.add_argument('--k1', type=float, default=1.2)
+    parser.add_argument('--b', type=float, default=0.75)
+    parser.add_argument('--proximity', type=float, default=0.5,
+                        help='Term proximity boost weight, 0 = plain BM25 (indexes built with --positions)')
+    for field in FILTER_FIELDS:
+        parser.add_argument(f"--{field.replace('_', '-')}", dest=field, action='append',
+                            help=f'Only documents with this {field} (repeat for any of several)')
+    parser.add_argument('--since', help='Only documents dated on/after, e.g. 2024-06-01')
+    parser.add_argument('--until', help='Only documents dated before')
+    args = parser.parse_args()
+    filters = {name: getattr(args, name) for name in (*FILTER_FIELDS, 'since', 'until') if getattr(args, name)}
+
+    start = time.perf_counter()
+    index = InvertedIndex(args.index)
+    ranker = BM25(index, args.k1, args.b, args.proximity)
+    print(f"📂 Loaded {args.index} ({index.num_docs:,} docs) in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    stats = {}
+    start = time.perf_counter()
+    hits = ranker.search(args.query, args.k, args.method, stats, filters)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"🔎 {len(hits)} results in {elapsed:.1f} ms ({args.method}, "
+          f"{stats['scored']:,} docs scored, {stats['postings']:,} postings"
+          f"{', filtered' if filters else ''})")
+    if not os.path.exists(os.path.join(args.index, 'docs.json')):
+        for rank, hit in enumerate(hits, 1):
+            print(f"   {rank:>3}. {hit.score:7.3f}  {hit.doc_id}")
+        index.close()
+        return
+
+    # Index built with --store-docs: render titles and snippets
+    with DocStore(args.index) as store:
+        start = time.perf_counter()
+        docs = store.get_many(hit.docno for hit in hits)
+        fetch_ms = (time.perf_counter() - start) * 1000
+        terms = index.analyze(args.query.replace('"', ' '))
+        for rank, (hit, doc) in enumerate(zip(hits, docs), 1):
+            print(f"   {rank:>3}. {hit.score:7.3f}  {doc.get('thread_title') or hit.doc_id} "
+                  f"({doc.get('author') or '?'})  {doc.get('url') or ''}")
+            print(f"        {make_snippet(doc.get('content') or '', terms)}")
+        print(f"📄 Fetched {len(docs)} docs in {fetch_ms:.1f} ms")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()